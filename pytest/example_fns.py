@@ -7,3 +7,28 @@ def one_basic_block():
 def if_else_expr(x):
     """An example "if expr1 else expr2 """
     return 1 if x else 5
+
+
+def for_break(a):
+    """An example "for" loop with a "break" """
+    for i in a:
+        if i:
+            break
+    return a
+
+
+def try_except(a):
+    """An example "try ... except" """
+    try:
+        a = a + 1
+    except ValueError:
+        a = 0
+    return a
+
+
+def nested_loops(a):
+    """An example "while" loop nested in a "for" loop"""
+    for i in a:
+        while i:
+            i -= 1
+    return a
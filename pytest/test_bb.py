@@ -1,7 +1,9 @@
 """Test python_control_flow.bb: basic blocks and basic-block management"""
 
+import pickle
+
 from python_control_flow.bb import basic_blocks, BB_ENTRY, BB_EXIT, BB_RETURN
-from example_fns import one_basic_block, if_else_expr
+from example_fns import one_basic_block, if_else_expr, for_break, try_except
 
 DEBUG = True
 if DEBUG:
@@ -50,5 +52,30 @@ def test_basic():
         check_blocks(bb_mgr.bb_list, fn_name)
 
 
+def test_block_table():
+    for fn in (if_else_expr, for_break, try_except):
+        bb_mgr = basic_blocks(fn.__code__, None, {}, more_precise_returns=True)
+        expected = [repr(bb) for bb in bb_mgr.bb_list]
+
+        columnar_mgr = basic_blocks(
+            fn.__code__, None, {}, more_precise_returns=True, columnar=True
+        )
+        table = columnar_mgr.block_table
+        assert len(table) == len(expected)
+
+        # A table survives pickling, and blocks made from it are the
+        # same as those built directly.
+        table = pickle.loads(pickle.dumps(table))
+        assert [repr(bb) for bb in table.make_blocks()] == expected
+
+        assert [repr(bb) for bb in columnar_mgr.bb_list] == expected
+        assert columnar_mgr.exit_block.has_flag(BB_EXIT)
+        assert columnar_mgr.start_block is columnar_mgr.bb_list[0]
+        assert [
+            sorted(bb.exception_offsets) for bb in columnar_mgr.bb_list
+        ] == [sorted(bb.exception_offsets) for bb in bb_mgr.bb_list]
+
+
 if __name__ == "__main__":
     test_basic()
+    test_block_table()
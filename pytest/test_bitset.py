@@ -0,0 +1,86 @@
+"""Test python_control_flow.bitset: integer-bitset block sets"""
+
+from python_control_flow.bb import basic_blocks
+from python_control_flow.bitset import BlockSet
+from python_control_flow.build_control_flow import build_and_analyze_control_flow
+from python_control_flow.cfg import ControlFlowGraph
+from python_control_flow.dominators import DominatorTree
+from example_fns import for_break, if_else_expr, one_basic_block
+
+
+class FakeBlock:
+    def __init__(self, number: int):
+        self.number = number
+
+
+def test_set_api():
+    universe = [FakeBlock(i) for i in range(100)]
+    a = BlockSet(universe, (universe[1], universe[5], universe[70]))
+    b = BlockSet(universe, (universe[5], universe[6]))
+
+    assert universe[70] in a and universe[6] not in a
+    assert FakeBlock(5) not in a, "membership is by object, not just number"
+    assert len(a) == 3
+    assert [block.number for block in a] == [1, 5, 70]
+    assert a | b == {universe[i] for i in (1, 5, 6, 70)}
+    assert a & b == {universe[5]}
+    assert a - b == {universe[1], universe[70]}
+    assert a - {universe[70]} == {universe[1], universe[5]}
+
+    c = a.copy()
+    c.add(universe[2])
+    c.discard(universe[1])
+    c |= b
+    assert sorted(block.number for block in c) == [2, 5, 6, 70]
+    assert sorted(block.number for block in a) == [1, 5, 70]
+    assert not BlockSet(universe)
+
+
+def test_cfg_with_bitsets():
+    """Analysis using bitsets should give the same results as with sets."""
+    for fn in (one_basic_block, if_else_expr):
+        results = []
+        for use_bitsets in (False, True):
+            bb_mgr = basic_blocks(fn.__code__, None, {})
+            cfg = ControlFlowGraph(bb_mgr, use_bitsets=use_bitsets)
+            dom_tree = DominatorTree(cfg)
+            results.append(
+                [
+                    (
+                        {b.number for b in bb.predecessors},
+                        {b.number for b in bb.successors},
+                        {node.number for node in bb.dom_set},
+                    )
+                    for bb in cfg.blocks
+                ]
+                + [dom_tree.idom]
+            )
+            if use_bitsets:
+                assert all(isinstance(bb.successors, BlockSet) for bb in cfg.blocks)
+        assert results[0] == results[1]
+
+
+def test_pipeline_with_bitsets():
+    """The whole analysis should give the same instructions with
+    bitsets as with sets."""
+    for fn in (if_else_expr, for_break):
+        cfg, instructions = build_and_analyze_control_flow(fn)
+        bitset_cfg, bitset_instructions = build_and_analyze_control_flow(
+            fn, use_bitsets=True
+        )
+        assert bitset_cfg.use_bitsets
+        assert all(
+            isinstance(bb.dom_set, BlockSet)
+            for bb in bitset_cfg.blocks
+            if bb.dom_set is not None
+        )
+        # Set arguments print differently, so compare just opcodes.
+        assert [(inst.opname, inst.offset) for inst in bitset_instructions] == [
+            (inst.opname, inst.offset) for inst in instructions
+        ]
+
+
+if __name__ == "__main__":
+    test_set_api()
+    test_cfg_with_bitsets()
+    test_pipeline_with_bitsets()
@@ -0,0 +1,36 @@
+"""Test python_control_flow.build_control_flow: the whole analysis"""
+
+from python_control_flow.build_control_flow import (
+    build_and_analyze_control_flow,
+    build_and_analyze_control_flows,
+)
+from example_fns import for_break, if_else_expr, one_basic_block, try_except
+
+
+def summarize(cfg):
+    """Return the parts of an analysis that should not depend on what
+    else is being analyzed at the same time."""
+    return (
+        [
+            (block.number, block.start_offset, block.end_offset, int(block.flags))
+            for block in cfg.blocks
+        ],
+        sorted(
+            (edge.id, edge.source.number, edge.dest.number) for edge in cfg.graph.edges
+        ),
+        sorted((block.number, block.dom_in, block.dom_out) for block in cfg.blocks),
+    )
+
+
+def test_batch_analysis():
+    fns = [one_basic_block, if_else_expr, for_break, try_except] * 8
+    expected = [summarize(build_and_analyze_control_flow(fn)[0]) for fn in fns]
+    results = build_and_analyze_control_flows(fns, max_workers=8)
+    assert [summarize(cfg) for cfg, _ in results] == expected
+
+    for cfg, _ in results:
+        assert [block.number for block in cfg.blocks] == list(range(len(cfg.blocks)))
+
+
+if __name__ == "__main__":
+    test_batch_analysis()
@@ -6,8 +6,9 @@ from xdis.bytecode import get_instructions_bytes
 from xdis.std import opc
 from python_control_flow.bb import basic_blocks
 from python_control_flow.cfg import ControlFlowGraph
-from python_control_flow.graph import BB_ENTRY, write_dot
-from example_fns import one_basic_block, if_else_expr
+from python_control_flow.graph import BB_ENTRY, EdgeKind, write_dot
+from python_control_flow.traversals import depth_first_orders
+from example_fns import for_break, if_else_expr, one_basic_block, try_except
 
 DEBUG = True
 if DEBUG:
@@ -40,30 +41,23 @@ def check_cfg(fn: Callable, cfg: ControlFlowGraph, check_dict: dict):
     need_new_block = False
     offset2block = cfg.offset2block
     cached_offsets = len(offset2block)
-    cache_diff = 0
-    for inst in get_instructions_bytes(code, opc):
-        offset = inst.offset
+    offsets = [inst.offset for inst in get_instructions_bytes(code, opc)]
+    expected_nodes = []
+    for offset in offsets:
         if need_new_block:
             current_block = offset2block[offset]
             end_offset = current_block.bb.end_offset
-        if offset == end_offset:
-            need_new_block = True
-        else:
-            # Increment number of entries added to cache after next cfg.get_node
-            cache_diff += 1
-            need_new_block = False
+        need_new_block = offset == end_offset
+        expected_nodes.append(current_block)
 
         assert current_block == cfg.get_node(offset)
 
-    # Next check that all cfg.offset2block is populated
-    # for all instruction offsets in bytecode as a result of
-    # asking for each offset above
-    assert all(
-        (inst.offset in offset2block for inst in get_instructions_bytes(code, opc))
-    ), (f"{prefix}" "all offsets should be covered by cfg.offset2block")
+    # The batch lookup, in offset order and out of order, gives the same nodes.
+    assert cfg.get_nodes(offsets) == expected_nodes
+    assert cfg.get_nodes(reversed(offsets)) == expected_nodes[::-1]
 
-    # Assert offset originally was in offset2block or was added in cache
-    assert len(offset2block) == cached_offsets + cache_diff
+    # Lookups do not add to offset2block.
+    assert len(offset2block) == cached_offsets
     return
 
 
@@ -98,5 +92,47 @@ def test_basic():
         check_cfg(fn, cfg, check_dict)
 
 
+def test_traversal_orders():
+    for fn in (one_basic_block, if_else_expr, for_break, try_except):
+        cfg = ControlFlowGraph(basic_blocks(fn.__code__, None, {}))
+        preorder, postorder = depth_first_orders(
+            cfg.entry_node.number, cfg.csr.forward.__getitem__
+        )
+        assert list(cfg.preorder) == preorder
+        assert list(cfg.postorder) == postorder
+        assert list(cfg.rpo) == postorder[::-1]
+        for order, number in (
+            (cfg.preorder, cfg.preorder_number),
+            (cfg.postorder, cfg.postorder_number),
+            (cfg.rpo, cfg.rpo_number),
+        ):
+            assert len(number) == len(cfg.blocks)
+            for i, block_number in enumerate(order):
+                assert number[block_number] == i
+            assert number.count(-1) == len(cfg.blocks) - len(order)
+
+        # The orders are computed once...
+        assert cfg.rpo is cfg.rpo
+
+    # ... until the graph changes. Here a new edge makes the exit block
+    # a successor of the entry block ahead of the others.
+    cfg = ControlFlowGraph(basic_blocks(for_break.__code__, None, {}))
+    rpo = cfg.rpo
+    entry, exit_block = cfg.blocks[1], cfg.blocks[0]
+    assert exit_block not in entry.successors
+    cfg.add_edge(entry, exit_block, EdgeKind.FORWARD)
+    assert cfg.rpo is not rpo
+    assert list(cfg.csr.successors(entry.number))[0] == exit_block.number
+    assert cfg.postorder[0] == exit_block.number
+    for block in cfg.blocks:
+        assert list(cfg.csr.successors(block.number)) == sorted(
+            b.number for b in block.successors
+        )
+        assert list(cfg.csr.predecessors(block.number)) == sorted(
+            b.number for b in block.predecessors
+        )
+
+
 if __name__ == "__main__":
     test_basic()
+    test_traversal_orders()
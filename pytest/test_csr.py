@@ -0,0 +1,68 @@
+"""Test python_control_flow.csr: compressed-sparse-row adjacency"""
+
+from python_control_flow.bb import basic_blocks
+from python_control_flow.cfg import ControlFlowGraph
+from python_control_flow.csr import CSRGraph
+from python_control_flow.graph import EdgeKind
+from example_fns import for_break, if_else_expr, try_except
+
+
+def test_csr_graph():
+    fallthrough = EdgeKind.FALLTHROUGH
+    looping = EdgeKind.LOOPING
+    csr = CSRGraph(4, [(2, 1, looping), (0, 2, fallthrough), (0, 1, fallthrough)])
+    assert csr.num_edges == 3
+    assert list(csr.successors(0)) == [1, 2]
+    assert list(csr.successors(3)) == []
+    assert list(csr.predecessors(1)) == [0, 2]
+    assert list(csr.reverse.kinds_of(1)) == [fallthrough, looping]
+
+    # A reversed graph is a view sharing the same arrays.
+    reverse = csr.reversed()
+    assert reverse.forward is csr.reverse
+    assert list(reverse.successors(1)) == [0, 2]
+    assert sorted(reverse.edges()) == [
+        (1, 0, fallthrough),
+        (1, 2, looping),
+        (2, 0, fallthrough),
+    ]
+
+    # Adding edges keeps rows sorted and shows through the view.
+    csr.add_edge(0, 3, looping)
+    csr.add_edge(3, 0, fallthrough)
+    csr.add_edge(2, 0, looping)
+    assert sorted(csr.edges()) == sorted(
+        CSRGraph(
+            4,
+            [
+                (2, 1, looping),
+                (0, 2, fallthrough),
+                (0, 1, fallthrough),
+                (0, 3, looping),
+                (3, 0, fallthrough),
+                (2, 0, looping),
+            ],
+        ).edges()
+    )
+    assert list(csr.successors(2)) == [0, 1]
+    assert list(csr.predecessors(0)) == [2, 3]
+    assert list(csr.reverse.kinds_of(0)) == [looping, fallthrough]
+    assert list(reverse.successors(0)) == [2, 3]
+
+
+def test_cfg_csr():
+    for fn in (if_else_expr, for_break, try_except):
+        cfg = ControlFlowGraph(basic_blocks(fn.__code__, None, {}))
+        csr = cfg.csr
+        for block in cfg.blocks:
+            assert list(csr.successors(block.number)) == sorted(
+                b.number for b in block.successors
+            )
+            assert list(csr.predecessors(block.number)) == sorted(
+                b.number for b in block.predecessors
+            )
+
+
+if __name__ == "__main__":
+    test_csr_graph()
+    test_cfg_csr()
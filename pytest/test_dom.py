@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 """Test dominiators"""
 
+import random
+
 import pytest
 
 # from xdis.bytecode import get_instructions_bytes
@@ -9,9 +11,21 @@ from xdis import IS_PYPY, PYTHON_VERSION_TRIPLE
 
 from python_control_flow.bb import basic_blocks
 from python_control_flow.cfg import ControlFlowGraph
-from python_control_flow.dominators import DominatorTree, dfs_forest, build_dom_set
+from python_control_flow.dominators import (
+    UNDEFINED,
+    DominatorTree,
+    PostDominatorTree,
+    build_dom_set,
+    compute_idoms_chk,
+    compute_idoms_snca,
+    compute_dominance_frontiers,
+    dfs_forest,
+    dominates,
+    iterated_dominance_frontier,
+)
+from python_control_flow.traversals import reverse_postorder_nodes
 from python_control_flow.graph import BB_ENTRY, write_dot
-from example_fns import if_else_expr, one_basic_block
+from example_fns import for_break, if_else_expr, one_basic_block, try_except
 
 DEBUG = True
 if DEBUG:
@@ -74,12 +88,231 @@ def test_basic():
         if DEBUG:
             write_dot(name, f"/tmp/test_dom-{version}-", cfg.graph, write_png=True)
         dom_tree = DominatorTree(cfg)
-        cfg.dom_tree = dom_tree.build_dom_tree()
-        dfs_forest(cfg.dom_tree)
-        build_dom_set(cfg.dom_tree, False)
-        write_dot(name, f"/tmp/test_dom-dom-{version}-", cfg.dom_tree, write_png=True)
+        assert cfg.dom_tree is dom_tree
+        tree = dom_tree.build_dom_tree()
+        dfs_forest(tree)
+        build_dom_set(tree, False)
+        write_dot(name, f"/tmp/test_dom-dom-{version}-", tree, write_png=True)
         check_dom(dom_tree, check_dict, fn.__name__)
 
 
+def test_idoms_chk():
+    # Block 0 is the entry. 1 and 2 form an irreducible loop entered from
+    # both 0 and 3, and 4 is not reachable:
+    #   0 -> 1, 0 -> 3, 3 -> 2, 1 <-> 2, 2 -> 5, 4 -> 5
+    predecessors = [[], [0, 2], [1, 3], [0], [], [2, 4]]
+    rpo = [0, 3, 1, 2, 5]
+    idom, passes = compute_idoms_chk(predecessors, rpo)
+    assert idom == [0, 0, 0, 0, UNDEFINED, 2]
+    assert passes >= 2
+
+    # A reducible graph takes a single pass, with or without being
+    # told it is reducible. Here 3 -> 1 is a loop back edge:
+    #   0 -> 1 -> 2 -> 3, 3 -> 1, 1 -> 4, 3 -> 4
+    predecessors = [[], [0, 3], [1], [2], [1, 3]]
+    rpo = [0, 1, 2, 3, 4]
+    for reducible in (None, True, False):
+        idom, passes = compute_idoms_chk(predecessors, rpo, reducible)
+        assert idom == [0, 0, 1, 2, 1]
+        assert passes == (2 if reducible is False else 1)
+
+
+def test_idoms_snca_matches_chk():
+    """Both dominator engines should give identical results, on
+    random graphs which are often irreducible, as well as on
+    control-flow graphs of real code.
+    """
+    rng = random.Random(2025)
+    for _ in range(500):
+        n = rng.randint(1, 30)
+        successors = [
+            sorted({rng.randrange(n) for _ in range(rng.randint(0, 3))})
+            for _ in range(n)
+        ]
+        predecessors = [[] for _ in range(n)]
+        for i, block_successors in enumerate(successors):
+            for j in block_successors:
+                predecessors[j].append(i)
+        rpo = reverse_postorder_nodes(0, successors.__getitem__)
+        chk_idom, _ = compute_idoms_chk(predecessors, rpo)
+        assert chk_idom == compute_idoms_snca(successors, predecessors, 0)
+
+    for fn in (one_basic_block, if_else_expr, test_basic):
+        idoms = []
+        for algorithm in ("chk", "snca"):
+            bb_mgr = basic_blocks(fn.__code__, None, {})
+            dom_tree = DominatorTree(ControlFlowGraph(bb_mgr), algorithm=algorithm)
+            assert dom_tree.algorithm_used == algorithm
+            idoms.append(dom_tree.idom)
+        assert idoms[0] == idoms[1], f"In {fn.__name__}: engines disagree"
+
+
+def test_dominates():
+    """dominates() and dominator sets should agree with walking
+    up the immediate-dominator chain."""
+    for fn in (one_basic_block, if_else_expr, test_basic):
+        bb_mgr = basic_blocks(fn.__code__, None, {})
+        cfg = ControlFlowGraph(bb_mgr)
+        dom_tree = DominatorTree(cfg)
+        idom = dom_tree.idom
+        for bb1 in cfg.blocks:
+            for bb2 in cfg.blocks:
+                expected = False
+                if idom[bb2.number] != UNDEFINED:
+                    # Walk up from bb2 to the root looking for bb1.
+                    i = bb2.number
+                    while True:
+                        if i == bb1.number:
+                            expected = True
+                            break
+                        if idom[i] == i:
+                            break
+                        i = idom[i]
+                assert dominates(bb1, bb2, proper=False) == expected
+                assert dominates(bb1, bb2) == (expected and bb1 is not bb2)
+            if idom[bb1.number] != UNDEFINED:
+                assert len(bb1.dom_set) == len(bb1.doms) - 1
+                assert {node.bb for node in bb1.dom_set} == {
+                    bb2 for bb2 in cfg.blocks if dominates(bb1, bb2)
+                }
+
+
+def test_dom_tree_links():
+    """Each block has one dominator-tree node, found through bb2node,
+    whose parent is the node of its immediate dominator."""
+    for fn in (one_basic_block, if_else_expr, test_basic):
+        bb_mgr = basic_blocks(fn.__code__, None, {})
+        cfg = ControlFlowGraph(bb_mgr)
+        dom_tree = DominatorTree(cfg)
+        t = dom_tree.build_dom_tree()
+        assert len(t.bb2node) == len(t.nodes)
+        for bb, node in t.bb2node.items():
+            assert node.bb is bb
+            parent_bb = dom_tree.doms[bb]
+            if parent_bb is bb:
+                assert node.parent is None
+            else:
+                assert node.parent is t.bb2node[parent_bb]
+                assert node in node.parent.children
+
+
+def test_dominance_frontiers():
+    """Check dominance frontiers against their definition on random
+    graphs: Y is in DF(X) when X dominates a predecessor of Y but does
+    not strictly dominate Y. Check iterated frontiers by iterating."""
+    rng = random.Random(2026)
+    for _ in range(300):
+        n = rng.randint(1, 25)
+        successors = [
+            sorted({rng.randrange(n) for _ in range(rng.randint(0, 3))})
+            for _ in range(n)
+        ]
+        predecessors = [[] for _ in range(n)]
+        for i, block_successors in enumerate(successors):
+            for j in block_successors:
+                predecessors[j].append(i)
+        rpo = reverse_postorder_nodes(0, successors.__getitem__)
+        idom, _ = compute_idoms_chk(predecessors, rpo)
+
+        def dom(x, y):
+            while True:
+                if x == y:
+                    return True
+                if idom[y] == y:
+                    return False
+                y = idom[y]
+
+        frontiers = compute_dominance_frontiers(predecessors, idom)
+        for x in range(n):
+            expected = []
+            if idom[x] != UNDEFINED:
+                expected = [
+                    y
+                    for y in rpo
+                    if any(idom[p] != UNDEFINED and dom(x, p) for p in predecessors[y])
+                    and not (x != y and dom(x, y))
+                ]
+            assert frontiers[x] == sorted(expected)
+
+        start = {rng.randrange(n) for _ in range(rng.randint(1, 3))}
+        expected = set()
+        while True:
+            new = set().union(*(frontiers[x] for x in start | expected))
+            if new <= expected:
+                break
+            expected |= new
+        assert iterated_dominance_frontier(frontiers, start) == sorted(expected)
+
+
+def test_cfg_dominance_frontiers():
+    for fn in (if_else_expr, for_break, try_except):
+        cfg = ControlFlowGraph(basic_blocks(fn.__code__, None, {}))
+        dom_tree = DominatorTree(cfg)
+        for block, frontier in dom_tree.df.items():
+            assert [b.number for b in frontier] == dom_tree.frontiers[block.number]
+        # The iterated frontier of a union of blocks is the union of
+        # their iterated frontiers.
+        blocks = [block for block in dom_tree.df if dom_tree.df[block]]
+        assert dom_tree.iterated_frontier(blocks) == sorted(
+            {b for block in blocks for b in dom_tree.iterated_frontier([block])},
+            key=lambda b: b.number,
+        )
+
+
+def reaches(csr, start: int, goal: int, removed: int) -> bool:
+    """Return True if `goal` can be reached from `start` in `csr`
+    without going through `removed`."""
+    seen = {start, removed}
+    stack = [start]
+    while stack:
+        i = stack.pop()
+        if i == goal:
+            return True
+        for j in csr.successors(i):
+            if j not in seen:
+                seen.add(j)
+                stack.append(j)
+    return False
+
+
+def test_post_dominators():
+    """Check post-dominators against their definition: bb1 properly
+    post-dominates bb2 when the exit can't be reached from bb2 without
+    going through bb1."""
+    for fn in (one_basic_block, if_else_expr, for_break, try_except):
+        cfg = ControlFlowGraph(basic_blocks(fn.__code__, None, {}))
+        pdom_tree = PostDominatorTree(cfg)
+        exit_number = cfg.exit_node.number
+        assert pdom_tree.idom[exit_number] == exit_number
+        csr = cfg.csr
+        for bb1 in cfg.blocks:
+            for bb2 in cfg.blocks:
+                if not reaches(csr, bb2.number, exit_number, -1):
+                    expected = False
+                else:
+                    expected = bb1 is not bb2 and not reaches(
+                        csr, bb2.number, exit_number, bb1.number
+                    )
+                assert pdom_tree.post_dominates(bb1, bb2) == expected, fn.__name__
+            if bb1.pdom_set is not None:
+                assert {node.bb for node in bb1.pdom_set} == {
+                    bb2 for bb2 in cfg.blocks if pdom_tree.post_dominates(bb1, bb2)
+                }
+
+        # cfg.pdom_tree is computed only when asked for, and then kept.
+        assert cfg._pdom_tree is None
+        assert cfg.pdom_tree is cfg.pdom_tree
+        assert cfg.pdom_tree.idom == pdom_tree.idom
+        # Dominator information on the blocks is left alone.
+        assert all(bb.dom_in == -1 for bb in cfg.blocks)
+
+
 if __name__ == "__main__":
     test_basic()
+    test_idoms_chk()
+    test_idoms_snca_matches_chk()
+    test_dominates()
+    test_dom_tree_links()
+    test_post_dominators()
+    test_dominance_frontiers()
+    test_cfg_dominance_frontiers()
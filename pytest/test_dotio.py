@@ -0,0 +1,141 @@
+"""Test python_control_flow.dotio: writing graphs in dot format"""
+
+import io
+import os.path as osp
+import re
+
+from python_control_flow.build_control_flow import (
+    build_and_analyze_control_flow,
+    nested_code_objects,
+)
+from python_control_flow.dotio import DotConverter
+from python_control_flow.graph import write_dot, write_module_dot
+from example_fns import for_break, if_else_expr, nested_loops
+
+
+def test_dot_sinks(tmp_path):
+    cfg, _ = build_and_analyze_control_flow(for_break)
+    dot_text = cfg.graph.to_dot(cfg.exit_node, True)
+    assert dot_text.startswith("digraph G {")
+    assert dot_text.endswith("}\n")
+
+    chunks = []
+    assert cfg.graph.to_dot(cfg.exit_node, True, sink=chunks) is None
+    assert len(chunks) > len(cfg.blocks)
+    assert "".join(chunks) == dot_text
+
+    text_file = io.StringIO()
+    cfg.graph.to_dot(cfg.exit_node, True, sink=text_file)
+    assert text_file.getvalue() == dot_text
+
+    received = []
+
+    def consumer():
+        while True:
+            received.append((yield))
+
+    cfg.graph.to_dot(cfg.exit_node, True, sink=consumer())
+    assert "".join(received) == dot_text
+
+    called = []
+    cfg.graph.to_dot(cfg.exit_node, True, sink=called.append)
+    assert called == chunks
+
+    write_dot(
+        "for break",
+        str(tmp_path / "flow"),
+        cfg.graph,
+        debug=False,
+        is_dominator_format=True,
+        exit_node=cfg.exit_node,
+    )
+    dot_path = tmp_path / "flow-for_break.dot"
+    assert osp.exists(dot_path)
+    assert dot_path.read_text() == dot_text
+
+
+def drawn_nodes(dot_text: str) -> list:
+    return [int(n) for n in re.findall(r"^  block_(\d+) \[", dot_text, re.M)]
+
+
+def test_collapsed_dot():
+    cfg, _ = build_and_analyze_control_flow(nested_loops)
+    dot_text = cfg.graph.to_dot(cfg.exit_node, True)
+    assert cfg.max_nesting_depth == 3
+    assert (
+        cfg.graph.to_dot(cfg.exit_node, True, collapse_depth=cfg.max_nesting_depth)
+        == dot_text
+    )
+
+    # Everything under the loop header is drawn as one node.
+    header = cfg.loops.roots[0].header
+    assert header.nesting_depth == 1
+    collapsed_text = cfg.graph.to_dot(cfg.exit_node, True, collapse_depth=1)
+    assert sorted(drawn_nodes(collapsed_text)) == [cfg.entry_node.number, header.number]
+    dominated = [block for block in cfg.blocks if block.nesting_depth >= 1]
+    assert (
+        f"{len(dominated)} blocks\\loffset: "
+        f"{min(block.start_offset for block in dominated)}.."
+        f"{max(block.end_offset for block in dominated)}"
+    ) in collapsed_text
+    edges = re.findall(r"^  (block_\d+)\S* -> (block_\d+)", collapsed_text, re.M)
+    assert edges == [(f"block_{cfg.entry_node.number}", f"block_{header.number}")]
+
+    for node_budget in range(1, len(cfg.blocks) + 1):
+        budget_text = cfg.graph.to_dot(cfg.exit_node, True, node_budget=node_budget)
+        assert len(drawn_nodes(budget_text)) <= node_budget
+
+
+def test_module_dot(tmp_path):
+    fns = (for_break, nested_loops, if_else_expr, for_break)
+    cfgs = [build_and_analyze_control_flow(fn)[0] for fn in fns]
+    graphs = [
+        (fn.__name__, cfg.graph, cfg.exit_node) for fn, cfg in zip(fns, cfgs)
+    ]
+    module_text = DotConverter.process_module(graphs, True)
+    assert module_text.startswith("digraph G {")
+    assert module_text.count("digraph") == 1
+    assert re.findall(r'subgraph "cluster_(\w+)"', module_text) == [
+        "for_break",
+        "nested_loops",
+        "if_else_expr",
+        "for_break_3",
+    ]
+
+    # Each function's nodes and edges are those it has on its own,
+    # with its own prefix.
+    node_ids = re.findall(r"^  (f\d+_block_\d+) \[", module_text, re.M)
+    assert len(node_ids) == len(set(node_ids))
+    for i, cfg in enumerate(cfgs):
+        dot_text = cfg.graph.to_dot(cfg.exit_node, True)
+        assert sorted(
+            int(n) for n in re.findall(rf"^  f{i}_block_(\d+) \[", module_text, re.M)
+        ) == sorted(drawn_nodes(dot_text))
+        edges = re.findall(rf"^  f{i}_\S+ -> f{i}_block_", module_text, re.M)
+        assert len(edges) == len(re.findall(r"^  block_\S+ -> block_", dot_text, re.M))
+
+    write_module_dot("module", str(tmp_path / "flow"), graphs, debug=False)
+    assert (tmp_path / "flow-module.dot").read_text() == DotConverter.process_module(
+        graphs, False
+    )
+
+    module_code = compile(
+        "def f():\n  def g(): pass\nclass C: pass\n", "m", "exec"
+    )
+    assert [code.co_name for code in nested_code_objects(module_code)] == [
+        "<module>",
+        "f",
+        "g",
+        "C",
+    ]
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_dot_sinks(Path(tmp_dir))
+    test_collapsed_dot()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_module_dot(Path(tmp_dir))
@@ -0,0 +1,46 @@
+"""Test python_control_flow.graph: nodes, edges and edge kinds"""
+
+from python_control_flow.bb import BasicBlock, basic_blocks
+from python_control_flow.cfg import ControlFlowGraph
+from python_control_flow.graph import DiGraph, EdgeKind
+from example_fns import if_else_expr
+
+
+def test_nodes_and_edges():
+    cfg = ControlFlowGraph(basic_blocks(if_else_expr.__code__, None, {}))
+    for node in cfg.graph.nodes:
+        assert hash(node) == node.number
+        assert not hasattr(node, "__dict__")
+    for edge in cfg.graph.edges:
+        assert hash(edge) == edge.id
+        assert not hasattr(edge, "__dict__")
+        assert isinstance(edge.kind, EdgeKind)
+        assert edge.is_conditional_jump() == (
+            edge.kind
+            in (
+                EdgeKind.JUMP_FORWARD_IF_FALSE,
+                EdgeKind.JUMP_FORWARD_IF_TRUE,
+                EdgeKind.JUMP_BACKWARD_IF_FALSE,
+                EdgeKind.JUMP_BACKWARD_IF_TRUE,
+            )
+        )
+
+    # Edge kinds print as they did when they were strings.
+    assert str(EdgeKind.NO_FALLTHROUGH) == "no fallthrough"
+    assert str(EdgeKind.DOM_EDGE) == "dom-edge"
+
+
+def test_unnumbered_blocks():
+    """Blocks not made by a BBMgr get node numbers from the graph."""
+    g = DiGraph()
+    a = g.make_add_node(BasicBlock(0, 2, 4, None))
+    b = g.make_add_node(BasicBlock(4, 6, None, None))
+    assert a.bb.number == b.bb.number == -1
+    assert a.number != b.number
+    assert a != b
+    assert len(g.nodes) == 2
+
+
+if __name__ == "__main__":
+    test_nodes_and_edges()
+    test_unnumbered_blocks()
@@ -0,0 +1,27 @@
+"""Test python_control_flow.instructions: the shared decoded-instruction store"""
+
+import pytest
+from xdis.op_imports import get_opcode_module
+from xdis.version_info import PYTHON_IMPLEMENTATION, PYTHON_VERSION_TRIPLE
+
+from python_control_flow.instructions import InstructionStore
+from example_fns import for_break
+
+
+def test_jump_targets():
+    opc = get_opcode_module(PYTHON_VERSION_TRIPLE[:2], PYTHON_IMPLEMENTATION)
+    store = InstructionStore(for_break.__code__, opc)
+    assert isinstance(store.jump_targets, frozenset)
+    assert store.jump_targets == set(store.jump_target2offsets)
+    assert store.jump_targets
+
+    # Looking up an offset that is not a jump target does not add it.
+    offset = max(store.offset2inst_index) + 2
+    with pytest.raises(KeyError):
+        store.jump_target2offsets[offset]
+    assert offset not in store.jump_targets
+    assert offset not in store.jump_target2offsets
+
+
+if __name__ == "__main__":
+    test_jump_targets()
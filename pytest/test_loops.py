@@ -0,0 +1,75 @@
+"""Test python_control_flow.loops: loop nesting forest"""
+
+from python_control_flow.bb import basic_blocks
+from python_control_flow.cfg import ControlFlowGraph
+from example_fns import for_break, if_else_expr, nested_loops
+
+
+def natural_loop(cfg, loop) -> set:
+    """Return the blocks of the natural loop of `loop`'s back edges:
+    the header and the blocks that reach a latch without going
+    through the header."""
+    body = {loop.header}
+    stack = [latch for latch in loop.latches if latch is not loop.header]
+    body.update(stack)
+    while stack:
+        block = stack.pop()
+        for predecessor in block.predecessors:
+            if predecessor not in body and cfg.rpo_number[predecessor.number] >= 0:
+                body.add(predecessor)
+                stack.append(predecessor)
+    return body
+
+
+def test_loop_forest():
+    cfg = ControlFlowGraph(basic_blocks(if_else_expr.__code__, None, {}))
+    assert cfg.loops.loops == []
+
+    cfg = ControlFlowGraph(basic_blocks(nested_loops.__code__, None, {}))
+    forest = cfg.loops
+    assert forest is cfg.loops
+    outer, inner = forest.loops
+    assert forest.roots == [outer]
+    assert inner.parent is outer and outer.children == [inner]
+    assert (outer.depth, inner.depth) == (1, 2)
+    assert set(inner.body) < set(outer.body)
+    for loop in forest.loops:
+        assert loop.is_reducible
+        assert set(loop.body) == natural_loop(cfg, loop)
+        assert loop.header.start_offset == loop.start_offset
+        for exit_block in loop.exits:
+            assert exit_block not in loop
+    for block in cfg.blocks:
+        if block in inner:
+            assert forest.innermost(block) is inner
+            assert forest.depth(block) == 2
+        elif block in outer:
+            assert forest.innermost(block) is outer
+            assert forest.depth(block) == 1
+        else:
+            assert forest.innermost(block) is None
+            assert forest.depth(block) == 0
+        assert forest.is_header(block) == (block in (outer.header, inner.header))
+
+
+def test_break_block():
+    """A block ending in "break" is an exit of its loop, but lies
+    within the loop's offsets."""
+    cfg = ControlFlowGraph(basic_blocks(for_break.__code__, None, {}))
+    (loop,) = cfg.loops.loops
+    assert set(loop.body) == natural_loop(cfg, loop)
+    inside = [
+        block
+        for block in cfg.blocks
+        if loop.start_offset <= block.start_offset <= loop.end_offset
+    ]
+    for block in inside:
+        assert cfg.loops.enclosing(block) is loop
+    break_blocks = [block for block in inside if block not in loop]
+    assert break_blocks
+    assert all(block in loop.exits for block in break_blocks)
+
+
+if __name__ == "__main__":
+    test_loop_forest()
+    test_break_block()
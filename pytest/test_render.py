@@ -0,0 +1,172 @@
+"""Test python_control_flow.render: rendering dot files off the analysis thread"""
+
+import hashlib
+import os
+import subprocess
+
+import pytest
+
+import python_control_flow.render
+from python_control_flow.build_control_flow import build_and_analyze_control_flow
+from python_control_flow.graph import write_dot
+from python_control_flow.render import RenderCache, RenderQueue
+from example_fns import for_break, if_else_expr
+
+
+def fake_dot(tmp_path) -> str:
+    """Return the path of a stand-in for dot, called as
+    ``dot -Tpng in.dot -o out.png``, which just copies its input."""
+    program = tmp_path / "fake-dot"
+    program.write_text(f'#!/bin/sh\necho "$2" >> {tmp_path}/renders\ncp "$2" "$4"\n')
+    program.chmod(0o755)
+    return str(program)
+
+
+def test_render_queue(tmp_path):
+    with RenderQueue(2, program=fake_dot(tmp_path)) as render_queue:
+        futures = []
+        for fn in (for_break, if_else_expr):
+            cfg, _ = build_and_analyze_control_flow(fn)
+            futures.append(
+                write_dot(
+                    fn.__name__,
+                    str(tmp_path / "flow"),
+                    cfg.graph,
+                    write_png=True,
+                    debug=False,
+                    exit_node=cfg.exit_node,
+                    render_queue=render_queue,
+                )
+            )
+        assert render_queue.wait() == futures
+
+    for fn, future in zip((for_break, if_else_expr), futures):
+        png_path = future.result()
+        assert png_path == str(tmp_path / f"flow-{fn.__name__}.png")
+        with open(png_path) as png_file:
+            assert png_file.read().startswith("digraph G {")
+
+    with RenderQueue(1, program="false") as render_queue:
+        dot_path = str(tmp_path / "flow-for_break.dot")
+        future = render_queue.submit(dot_path, os.devnull)
+    with pytest.raises(subprocess.CalledProcessError):
+        future.result()
+
+    with pytest.raises(ValueError):
+        RenderQueue(0)
+
+
+def test_render_cache(tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    cfg, _ = build_and_analyze_control_flow(for_break)
+    with RenderQueue(1, program=fake_dot(tmp_path)) as render_queue:
+        for prefix in ("first", "second", "third"):
+            future = write_dot(
+                "for_break",
+                str(tmp_path / prefix),
+                cfg.graph,
+                write_png=True,
+                debug=False,
+                exit_node=cfg.exit_node,
+                render_queue=render_queue,
+                render_cache=render_cache,
+            )
+            assert future.result() == str(tmp_path / f"{prefix}-for_break.png")
+
+    # Only the first graph was rendered; the others are links to it.
+    assert (tmp_path / "renders").read_text().splitlines() == [
+        str(tmp_path / "first-for_break.dot")
+    ]
+    for suffix in (".dot", ".png"):
+        first = os.stat(tmp_path / f"first-for_break{suffix}")
+        third = os.stat(tmp_path / f"third-for_break{suffix}")
+        assert first.st_ino == third.st_ino
+    assert sorted(name[-4:] for name in os.listdir(tmp_path / "cache")) == [
+        ".dot",
+        ".png",
+    ]
+
+    # Other output formats are cached apart from PNG.
+    with RenderQueue(1, "svg", program=fake_dot(tmp_path)) as render_queue:
+        future = write_dot(
+            "for_break",
+            str(tmp_path / "first"),
+            cfg.graph,
+            write_png=True,
+            debug=False,
+            exit_node=cfg.exit_node,
+            render_queue=render_queue,
+            render_cache=render_cache,
+        )
+        assert future.result() == str(tmp_path / "first-for_break.svg")
+    assert len((tmp_path / "renders").read_text().splitlines()) == 2
+    assert len(os.listdir(tmp_path / "cache")) == 3
+
+    # Text is written once, into the cache, as it is hashed.
+    chunks = []
+
+    def write_text(sink):
+        chunks.append("digraph G {}\n")
+        sink(chunks[-1])
+
+    for _ in range(2):
+        digest = render_cache.write(".dot", write_text)
+        assert digest == hashlib.sha256(b"digraph G {}\n").hexdigest()
+    assert len(chunks) == 2
+    assert os.path.exists(render_cache.path(digest, ".dot"))
+    assert len(os.listdir(tmp_path / "cache")) == 4
+
+    # Writing a file without the cache leaves the cached copy alone.
+    dot_text = (tmp_path / "first-for_break.dot").read_text()
+    write_dot(
+        "for_break",
+        str(tmp_path / "first"),
+        cfg.graph,
+        debug=False,
+        is_dominator_format=True,
+        exit_node=cfg.exit_node,
+    )
+    assert (tmp_path / "first-for_break.dot").read_text() != dot_text
+    assert (tmp_path / "third-for_break.dot").read_text() == dot_text
+
+
+def test_render_sync(tmp_path, monkeypatch, capsys):
+    """Without a RenderQueue, the dot file is rendered right away, and
+    a failure is reported rather than raised."""
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    cfg, _ = build_and_analyze_control_flow(for_break)
+
+    def failing_render_dot(dot_path, out_path):
+        raise subprocess.CalledProcessError(1, "dot", stderr="syntax error")
+
+    monkeypatch.setattr(python_control_flow.render, "render_dot", failing_render_dot)
+    write_dot(
+        "for_break",
+        str(tmp_path / "flow"),
+        cfg.graph,
+        write_png=True,
+        exit_node=cfg.exit_node,
+        render_cache=render_cache,
+    )
+    assert "syntax error" in capsys.readouterr().err
+    assert [name[-4:] for name in os.listdir(tmp_path / "cache")] == [".dot"]
+
+    rendered = []
+
+    def copying_render_dot(dot_path, out_path):
+        rendered.append(dot_path)
+        with open(dot_path) as dot_file, open(out_path, "w") as out_file:
+            out_file.write(dot_file.read())
+
+    monkeypatch.setattr(python_control_flow.render, "render_dot", copying_render_dot)
+    for _ in range(2):
+        write_dot(
+            "for_break",
+            str(tmp_path / "flow"),
+            cfg.graph,
+            write_png=True,
+            exit_node=cfg.exit_node,
+            render_cache=render_cache,
+        )
+    assert rendered == [str(tmp_path / "flow-for_break.dot")]
+    assert len(os.listdir(tmp_path / "cache")) == 2
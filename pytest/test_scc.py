@@ -0,0 +1,88 @@
+"""Test python_control_flow.scc: strongly-connected components"""
+
+import random
+
+from python_control_flow.bb import basic_blocks
+from python_control_flow.cfg import ControlFlowGraph
+from python_control_flow.csr import CSRGraph
+from python_control_flow.scc import Condensation, strongly_connected_components
+from example_fns import for_break, if_else_expr, nested_loops, try_except
+
+
+def make_csr(successors: list) -> CSRGraph:
+    return CSRGraph(
+        len(successors),
+        [(i, j, 0) for i, targets in enumerate(successors) for j in targets],
+    )
+
+
+def test_components():
+    """Components should be the sets of mutually reachable nodes, and
+    be numbered in topological order."""
+    rng = random.Random(2026)
+    for _ in range(300):
+        n = rng.randint(1, 15)
+        successors = [
+            sorted({rng.randrange(n) for _ in range(rng.randint(0, 3))})
+            for _ in range(n)
+        ]
+        reachable = []
+        for v in range(n):
+            seen = {v}
+            stack = [v]
+            while stack:
+                for w in successors[stack.pop()]:
+                    if w not in seen:
+                        seen.add(w)
+                        stack.append(w)
+            reachable.append(seen)
+        component_of, count = strongly_connected_components(
+            n, successors.__getitem__
+        )
+        assert sorted(set(component_of)) == list(range(count))
+        for u in range(n):
+            for v in range(n):
+                assert (component_of[u] == component_of[v]) == (
+                    v in reachable[u] and u in reachable[v]
+                )
+            for v in successors[u]:
+                assert component_of[u] <= component_of[v]
+
+
+def test_condensation():
+    # 0 -> 1 <-> 2 -> 3, and 0 -> 2: the cycle 1, 2 has two entries.
+    cond = Condensation(make_csr([[1, 2], [2], [1, 3], []]), 0)
+    assert cond.num_components == 3
+    assert cond.components == [[0], [1, 2], [3]]
+    assert cond.is_cyclic(1) and not cond.is_cyclic(0)
+    assert list(cond.dag.successors(0)) == [1]
+    assert list(cond.dag.successors(1)) == [2]
+    assert cond.irreducible_regions == [[1, 2]]
+
+    # Without 0 -> 2, the cycle has the single entry 1.
+    assert not Condensation(make_csr([[1], [2], [1, 3], []]), 0).is_irreducible
+
+    # A cycle with two entries nested in a loop whose header is 0.
+    cond = Condensation(make_csr([[1, 2], [2], [1, 0], []]), 0)
+    assert cond.components[cond.component_of[0]] == [0, 1, 2]
+    assert cond.irreducible_regions == [[1, 2]]
+
+    # An entry from an unreachable node doesn't count.
+    assert not Condensation(make_csr([[1], [2], [1], [2]]), 0).is_irreducible
+
+
+def test_cfg_scc():
+    for fn in (if_else_expr, for_break, try_except, nested_loops):
+        cfg = ControlFlowGraph(basic_blocks(fn.__code__, None, {}))
+        assert cfg.known_reducible is None
+        assert cfg.is_reducible
+        assert cfg.known_reducible is True
+        assert cfg.scc is cfg.scc
+        cyclic = [c for c in range(cfg.scc.num_components) if cfg.scc.is_cyclic(c)]
+        assert len(cyclic) == len(cfg.loops.roots)
+
+
+if __name__ == "__main__":
+    test_components()
+    test_condensation()
+    test_cfg_scc()
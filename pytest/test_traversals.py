@@ -0,0 +1,166 @@
+"""Test python_control_flow.traversals: depth-first orders"""
+
+import sys
+
+import pytest
+
+from python_control_flow.graph import DiGraph, EdgeKind
+from python_control_flow.traversals import (
+    BFS,
+    DFS,
+    PRUNE,
+    RPO,
+    STOP,
+    EdgeVisitor,
+    Walker,
+    depth_first_orders,
+    dfs_postorder_nodes,
+    dfs_preorder_nodes,
+    reverse_postorder_nodes,
+)
+
+
+class FakeBlock:
+    """A minimal stand-in for a basic block: just a number and successors."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.successors = []
+
+    def __repr__(self):
+        return f"FakeBlock({self.number})"
+
+
+def make_blocks(edges: dict) -> list:
+    blocks = [FakeBlock(i) for i in range(len(edges))]
+    for i, successors in edges.items():
+        blocks[i].successors = [blocks[j] for j in successors]
+    return blocks
+
+
+def numbers(blocks) -> list:
+    return [block.number for block in blocks]
+
+
+def test_orders():
+    # 0 -> 1 -> 3
+    #  \-> 2 -/
+    # and a back edge 3 -> 0
+    blocks = make_blocks({0: [1, 2], 1: [3], 2: [3], 3: [0]})
+    root = blocks[0]
+    assert numbers(dfs_preorder_nodes(root)) == [0, 1, 3, 2]
+    assert numbers(dfs_postorder_nodes(root)) == [3, 1, 2, 0]
+    assert numbers(reverse_postorder_nodes(root)) == [0, 2, 1, 3]
+
+    # Nodes already visited are not traversed.
+    assert numbers(dfs_postorder_nodes(root, visited={blocks[1]})) == [3, 2, 0]
+
+
+def test_deep_graph():
+    """A long chain would overflow a recursive traversal."""
+    recursion_limit = sys.getrecursionlimit()
+    n = 20 * recursion_limit
+    blocks = make_blocks({i: [i + 1] if i + 1 < n else [] for i in range(n)})
+    preorder, postorder = depth_first_orders(blocks[0])
+    assert numbers(preorder) == list(range(n))
+    assert numbers(postorder) == list(reversed(range(n)))
+    assert sys.getrecursionlimit() == recursion_limit
+
+
+class FakeBB:
+    """Just enough of a basic block to make graph nodes and edges."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.flags = 0
+        self.start_offset = number * 2
+        self.jump_offsets = ()
+
+
+def make_graph(edges: dict):
+    """Return a DiGraph and its nodes, with an edge from node i to
+    each node in edges[i], made in that order."""
+    g = DiGraph()
+    nodes = [g.make_add_node(FakeBB(i)) for i in range(len(edges))]
+    for i, successors in edges.items():
+        for j in successors:
+            g.make_add_edge(nodes[i], nodes[j], EdgeKind.FORWARD)
+    return g, nodes
+
+
+class RecordingVisitor(EdgeVisitor):
+    def __init__(self, actions=None):
+        super().__init__()
+        self.actions = actions or {}
+        self.edges = []
+
+    def visit(self, edge):
+        pair = (edge.source.number, edge.dest.number)
+        self.edges.append(pair)
+        return self.actions.get(pair)
+
+
+def test_walker_orders():
+    # 0 -> 1 -> 3 -> 4
+    #  \-> 2 -/
+    # and a back edge 3 -> 0
+    g, nodes = make_graph({0: [1, 2], 1: [3], 2: [3], 3: [4, 0], 4: []})
+    expected = {
+        DFS: [(0, 1), (1, 3), (3, 4), (3, 0), (0, 2), (2, 3)],
+        BFS: [(0, 1), (0, 2), (1, 3), (2, 3), (3, 4), (3, 0)],
+        RPO: [(0, 1), (0, 2), (2, 3), (1, 3), (3, 4), (3, 0)],
+    }
+    for order, walked in expected.items():
+        visitor = RecordingVisitor()
+        Walker(g, visitor, order).traverse(nodes[0])
+        assert visitor.edges == walked, order
+
+    # Nodes' in and out edges don't need to have been filled in.
+    assert nodes[0].out_edges is None
+
+    # The out edges are indexed once, until the graph changes.
+    out_edge_lists = g.out_edge_lists()
+    assert g.out_edge_lists() is out_edge_lists
+    g.make_add_edge(nodes[4], nodes[2], EdgeKind.FORWARD)
+    assert g.out_edge_lists() is not out_edge_lists
+    visitor = RecordingVisitor()
+    Walker(g, visitor, DFS).traverse(nodes[4])
+    assert visitor.edges == [(4, 2), (2, 3), (3, 4), (3, 0), (0, 1), (1, 3), (0, 2)]
+
+    with pytest.raises(ValueError):
+        Walker(g, RecordingVisitor(), "sideways")
+
+
+def test_walker_prune_and_stop():
+    g, nodes = make_graph({0: [1, 2], 1: [3], 2: [3], 3: [4, 0], 4: []})
+    for order in (DFS, BFS, RPO):
+        # Pruning at 0 -> 1 still reaches 3 through 2.
+        visitor = RecordingVisitor({(0, 1): PRUNE})
+        Walker(g, visitor, order).traverse(nodes[0])
+        assert sorted(visitor.edges) == [(0, 1), (0, 2), (2, 3), (3, 0), (3, 4)]
+
+        # Pruning both ways into 3 never walks out of it.
+        visitor = RecordingVisitor({(1, 3): PRUNE, (2, 3): PRUNE})
+        Walker(g, visitor, order).traverse(nodes[0])
+        assert sorted(visitor.edges) == [(0, 1), (0, 2), (1, 3), (2, 3)]
+
+        visitor = RecordingVisitor({(0, 1): STOP})
+        Walker(g, visitor, order).traverse(nodes[0])
+        assert visitor.edges == [(0, 1)]
+
+
+def test_walker_deep_graph():
+    n = 20 * sys.getrecursionlimit()
+    g, nodes = make_graph({i: [i + 1] if i + 1 < n else [] for i in range(n)})
+    for order in (DFS, BFS, RPO):
+        visitor = RecordingVisitor()
+        Walker(g, visitor, order).traverse(nodes[0])
+        assert visitor.edges == [(i, i + 1) for i in range(n - 1)]
+
+
+if __name__ == "__main__":
+    test_orders()
+    test_deep_graph()
+    test_walker_orders()
+    test_walker_prune_and_stop()
+    test_walker_deep_graph()
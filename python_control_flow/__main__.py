@@ -10,7 +10,11 @@ import sys
 from xdis.load import check_object_path, load_module
 from xdis.version_info import PYTHON_VERSION_TRIPLE
 
-from python_control_flow.build_control_flow import build_and_analyze_control_flow
+from python_control_flow.build_control_flow import (
+    build_and_analyze_control_flow,
+    build_and_analyze_module_control_flow,
+)
+from python_control_flow.render import RenderCache, RenderQueue
 from python_control_flow.version import __version__
 
 @click.command()
@@ -30,7 +34,49 @@ from python_control_flow.version import __version__
     default="none",
     help="Produce graphviz graph of program",
 )
-def main(import_name, member, filename, graph):
+@click.option(
+    "--render-jobs",
+    "-j",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Render graphs with up to this many dot processes in the background; "
+    "0 renders each graph as it is written",
+)
+@click.option(
+    "--render-cache",
+    type=click.Path(file_okay=False),
+    help="Directory of previously written graphs, to reuse instead of "
+    "writing and rendering them again",
+)
+@click.option(
+    "--collapse-depth",
+    type=click.IntRange(min=0),
+    help="Draw the blocks dominated by a block at this nesting depth "
+    "as a single summary node",
+)
+@click.option(
+    "--node-budget",
+    type=click.IntRange(min=1),
+    help="Collapse dominator subtrees, as with --collapse-depth, so that "
+    "at most about this many nodes are drawn",
+)
+@click.option(
+    "--module-graph/--no-module-graph",
+    default=False,
+    help="Graph the module and every function in it in a single file, "
+    "with a cluster for each",
+)
+def main(
+    import_name,
+    member,
+    filename,
+    graph,
+    render_jobs,
+    render_cache,
+    collapse_depth,
+    node_budget,
+    module_graph,
+):
     try:
         if import_name is not None:
             import_module = importlib.__import__(import_name)
@@ -91,13 +137,46 @@ def main(import_name, member, filename, graph):
     if name.endswith(">"):
         name = name[:-1]
 
-    build_and_analyze_control_flow(
-        co,
-        graph_options=graph,
-        code_version_tuple=version_tuple,
-        func_or_code_timestamp=timestamp,
-        func_or_code_name=name,
-    )
+    render_queue = RenderQueue(render_jobs) if render_jobs > 0 else None
+    if render_cache is not None:
+        render_cache = RenderCache(render_cache)
+    if module_graph:
+        build_and_analyze_module_control_flow(
+            co,
+            graph_options=graph,
+            code_version_tuple=version_tuple,
+            func_or_code_name=name,
+            render_queue=render_queue,
+            render_cache=render_cache,
+            collapse_depth=collapse_depth,
+            node_budget=node_budget,
+        )
+    else:
+        build_and_analyze_control_flow(
+            co,
+            graph_options=graph,
+            code_version_tuple=version_tuple,
+            func_or_code_timestamp=timestamp,
+            func_or_code_name=name,
+            render_queue=render_queue,
+            render_cache=render_cache,
+            collapse_depth=collapse_depth,
+            node_budget=node_budget,
+        )
+    if render_queue is not None:
+        failures = 0
+        for future in render_queue.wait():
+            e = future.exception()
+            if e is not None:
+                failures += 1
+                dot_messages = getattr(e, "stderr", None)
+                if dot_messages:
+                    print(f"rendering failed: {e}\n{dot_messages}", file=sys.stderr)
+                else:
+                    print(f"rendering failed: {e}", file=sys.stderr)
+        render_queue.shutdown()
+        if failures:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
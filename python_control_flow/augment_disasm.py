@@ -8,17 +8,17 @@ This code is ugly.
 from collections import defaultdict
 from copy import copy
 from enum import IntEnum
-from sys import maxsize
 from types import CodeType
 from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
 
-from xdis.bytecode import Bytecode
+from xdis.bytecode import get_code_object
 from xdis.codetype.base import CodeBase
 from xdis.instruction import Instruction
 
 from python_control_flow.bb import BasicBlock, BBMgr
 from python_control_flow.cfg import ControlFlowGraph
-from python_control_flow.graph import BB_FOR, BB_LOOP, BB_NOFOLLOW, Node, ScopeEdgeKind
+from python_control_flow.graph import BB_NOFOLLOW, EdgeKind, Node, ScopeEdgeKind
+from python_control_flow.instructions import InstructionStore
 
 
 class JumpTarget(IntEnum):
@@ -228,7 +228,7 @@ def format_BB_START(bb) -> str:
       Show domninator information for basic block
     """
     dom_nodes_str = ""
-    if hasattr(bb, "doms") and len(bb.doms) > 0:
+    if bb.doms is not None and len(bb.doms) > 0:
         node_number_list = sorted([node.number for node in bb.doms])
         # Format as a compact string...
         separator = ""
@@ -374,8 +374,10 @@ def post_ends(dom) -> set:
 
     """
 
-    if hasattr(dom, "pdom_set"):
-        my_dom_set = dom.pdom_set
+    # pdom_set is set by dominators.PostDominatorTree. It is a view,
+    # so copy it to a set that can be changed below.
+    if dom.pdom_set is not None:
+        my_dom_set = set(dom.pdom_set)
     else:
         my_dom_set = set()
 
@@ -393,7 +395,7 @@ def post_ends(dom) -> set:
             # opposed to a sibling kind of thing. This is I suppose
             # though a matter of taste.  Note that grammar has to
             # match what we do here in either case.
-            if BB_NOFOLLOW in prior_node.flags:
+            if prior_node.bb.has_flag(BB_NOFOLLOW):
                 my_dom_set.remove(prior_node)
             continue
         if prior_bb.dom_set - my_dom_set:
@@ -418,10 +420,8 @@ def augment_instructions(
     augment_opc(opc)
 
     # Create a mapping from a basic block, which has dominator information, to a graph node.
-    # Note: unreachable basic blocks do not have a "doms" field.
-    bb2dom_node = {
-        bb: next(iter(bb.doms - bb.dom_set)) for bb in cfg.blocks if hasattr(bb, "doms")
-    }
+    # Note: unreachable basic blocks are not in the dominator tree.
+    bb2dom_node = {node.bb: node for node in cfg.dom_tree.tree.nodes}
 
     starts = {current_block.start_offset: current_block}
     dom_reach_ends = {}
@@ -430,8 +430,15 @@ def augment_instructions(
     bb = None
     dom: Optional[Node] = None
     offset = 0
-    loop_stack = []
-    instructions = tuple(Bytecode(fn_or_code, opc).get_instructions(fn_or_code))
+
+    # The loop nesting forest, used to find jumps that break out of loops.
+    loops = cfg.loops
+
+    # Reuse the instructions decoded when basic blocks were created.
+    instruction_store = bb_mgr.instruction_store
+    if instruction_store is None:
+        instruction_store = InstructionStore(get_code_object(fn_or_code), opc)
+    instructions = instruction_store.instructions
 
     # Compute offset2dom
     offset2bb: Dict[int, Node] = {bb.start_offset: bb for bb in bb_mgr.bb_list}
@@ -443,7 +450,12 @@ def augment_instructions(
     jump_instructions = bb_mgr.JUMP_INSTRUCTIONS | bb_mgr.JUMP_UNCONDITIONAL
 
     _, jump_target_kind = find_jump_targets(
-        opc, instructions, offset2inst_index, jump_instructions, bb_mgr
+        opc,
+        instructions,
+        offset2inst_index,
+        jump_instructions,
+        bb_mgr,
+        jump_target2offsets=instruction_store.jump_target2offsets,
     )
 
     for inst in instructions:
@@ -490,13 +502,6 @@ def augment_instructions(
             reach_ends.append(dom)
             dom_reach_ends[dom.reach_offset] = reach_ends
 
-            if opcode in bb_mgr.FOR_INSTRUCTIONS or BB_LOOP in bb.flags:
-                # Use the basic block of the block loop successor,
-                # this is the main body of the loop, as the block to
-                # check for leaving the loop.
-                loop_block_dom_set = tuple(dom.bb.successors)[0].doms
-                loop_stack.append((dom, loop_block_dom_set, inst))
-
             # For now we will assume that edges are sorted so in outermost-to-innermost nesting order.
             # Add any psuedo-token join markers
             if offset in cfg.offset2edges:
@@ -505,7 +510,7 @@ def augment_instructions(
                         from_bb_number = edge.source.bb.number
                         op_name = (
                             "BLOCK_END_FALLTHROUGH_JOIN"
-                            if edge.kind == "fallthrough"
+                            if edge.kind == EdgeKind.FALLTHROUGH
                             else "BLOCK_END_JUMP_JOIN"
                         )
                         pseudo_inst = ExtendedInstruction(
@@ -558,7 +563,7 @@ def augment_instructions(
             # FIXME: this shouldn't be needed
             bb = dom.bb
 
-        if opcode in opc.JUMP_OPS:
+        if opcode in instruction_store.jump_opcodes:
             jump_target = inst.argval
             target_inst = instructions[offset2inst_index[jump_target]]
             target_bb = offset2bb[target_inst.offset]
@@ -592,44 +597,48 @@ def augment_instructions(
             else:
                 # Not backward jump, Note: if jump == offset, then we have an
                 # infinite loop. We won't check for that here though.
-                # Check for jump break out of a loop
-                if len(loop_stack) > 0:
-                    # Check for loop-related jumps such as those that
-                    # can occur from break, continue.  Note: we also
-                    # add instructions for normal loop iteration jump
-                    # and jump-termination jump
-                    loop_dom, loop_block_dom_set, loop_inst = loop_stack[-1]
-                    # SETUP_LOOP offsets in < 3.8 refer to places that
-                    # that might not be jumped to by other instructions.
-                    # The intervening instructions are stack cleanup like
-                    # POP_STACK. We extend max to cover this kind of thing.
-                    if jump_target >= max(
-                        loop_dom.bb.__dict__["jump_offsets"] | {maxsize}
-                    ):
-                        if loop_inst.opcode in bb_mgr.FOR_INSTRUCTIONS:
-                            pseudo_op_name = "BREAK_FOR"
-                        else:
-                            pseudo_op_name = "BREAK_LOOP"
-                        pseudo_inst = ExtendedInstruction(
-                            opname=pseudo_op_name,
-                            opcode=EXTENDED_OPMAP[pseudo_op_name],
-                            optype="pseudo",
-                            inst_size=0,
-                            arg=target_dom_set,
-                            argval=target_dom_set,
-                            argrepr=f"{target_dom_set}",
-                            has_arg=True,
-                            offset=offset,
-                            starts_line=None,
-                            is_jump_target=False,
-                            has_extended_arg=False,
-                            positions=None,
-                            start_offset=None,
-                            basic_block=bb,
-                            dominator=dom,
-                        )
-                        augmented_instrs.append(pseudo_inst)
-                        pass
+                # Check for a jump out of the loop it is written in,
+                # which is what "break" compiles to. Jumps like those
+                # of "continue" and of normal loop iteration go
+                # backward and were handled above. A jump out which
+                # follows a loop's latch, the block that jumps back
+                # to the loop test, is the exit of a "while" test
+                # rather than a "break".
+                loop = loops.enclosing(bb)
+                if (
+                    loop is not None
+                    and opcode in bb_mgr.JUMP_UNCONDITIONAL
+                    and jump_target > loop.end_offset
+                    and loop.latches
+                    and bb.predecessors.isdisjoint(loop.latches)
+                ):
+                    header_inst = instructions[
+                        offset2inst_index[loop.header.start_offset]
+                    ]
+                    if header_inst.opcode in bb_mgr.FOR_INSTRUCTIONS:
+                        pseudo_op_name = "BREAK_FOR"
+                    else:
+                        pseudo_op_name = "BREAK_LOOP"
+                    pseudo_inst = ExtendedInstruction(
+                        opname=pseudo_op_name,
+                        opcode=EXTENDED_OPMAP[pseudo_op_name],
+                        optype="pseudo",
+                        inst_size=0,
+                        arg=target_dom_set,
+                        argval=target_dom_set,
+                        argrepr=f"{target_dom_set}",
+                        has_arg=True,
+                        offset=offset,
+                        starts_line=None,
+                        is_jump_target=False,
+                        has_extended_arg=False,
+                        positions=None,
+                        start_offset=None,
+                        basic_block=bb,
+                        dominator=dom,
+                    )
+                    augmented_instrs.append(pseudo_inst)
+                    pass
 
         extended_inst = ExtendedInstruction(
             opname=opname,
@@ -673,8 +682,6 @@ def augment_instructions(
                 start_offset=None,
             )
             augmented_instrs.append(pseudo_inst)
-            if bb.flags in [BB_FOR, BB_LOOP]:
-                loop_stack.pop()
 
     # # We have a dummy bb at the end+1.
     # # Add the end dominator info for that which should exist
@@ -725,19 +732,26 @@ def find_jump_targets(
     jump_instructions,
     bb_mgr,
     debug=False,
+    jump_target2offsets: Optional[Dict[int, list]] = None,
 ) -> Tuple[Dict[int, list], Dict[int, int]]:
     """
     Return a dictionary mapping jump-target offsets instruction offsets that
     jump to that target or precede it. We include fallthrough instructions
     Return the list of offsets.
+
+    If `jump_target2offsets` is given, it is the jump-target index
+    previously computed in an InstructionStore, and it is used rather
+    than scanning `instructions` again.
     """
 
-    jump_target2offsets: Dict[int, list] = defaultdict(list)
-    for _, inst in enumerate(instructions):
-        offset = inst.offset
-        if inst.opcode in opc.JUMP_OPS:
-            jump_target_offset = inst.argval
-            jump_target2offsets[jump_target_offset].append(offset)
+    if jump_target2offsets is None:
+        jump_opcodes = set(opc.hasjabs) | set(opc.hasjrel)
+        jump_target2offsets = defaultdict(list)
+        for _, inst in enumerate(instructions):
+            offset = inst.offset
+            if inst.opcode in jump_opcodes:
+                jump_target_offset = inst.argval
+                jump_target2offsets[jump_target_offset].append(offset)
 
     jump_target_kind: Dict[int, int] = {}
     # Populate jump_target_kind based on the instruction and
@@ -1,9 +1,8 @@
 # Copyright (c) 2021, 2023-2026 by Rocky Bernstein <rb@dustyfeet.com>
 import sys
-from typing import Optional
+from typing import List, Optional, Set, Union
 
 from xdis import next_offset
-from xdis.bytecode import get_instructions_bytes
 from xdis.op_imports import get_opcode_module
 from xdis.version_info import IS_PYPY, PYTHON_IMPLEMENTATION, PYTHON_VERSION_TRIPLE
 
@@ -28,7 +27,11 @@ from python_control_flow.graph import (
     BB_STARTS_POP_BLOCK,
     BB_TRY,
     FLAG2NAME,
+    BBFlags,
+    flags_mask,
+    format_flags,
 )
+from python_control_flow.instructions import InstructionStore
 
 # The byte code versions we support
 PYTHON_VERSIONS = (  # 1.5,
@@ -47,13 +50,6 @@ PYTHON_VERSIONS = (  # 1.5,
     (3, 12),
 )
 
-end_bb = -1
-
-
-# FIXME: The next version of xdis should include this. Use that.
-def get_jump_val(jump_arg: int, version: tuple) -> int:
-    return jump_arg * 2 if version[:2] >= (3, 10) else jump_arg
-
 
 class BasicBlock:
     """Extended Basic block from the bytecode.
@@ -73,20 +69,47 @@ class BasicBlock:
       * predecessor and successor sets, filled in a later phase
       * some layout information for dot graphing
       * a list of jump instructions that jump outside of loops
+
+    There can be very many basic blocks, so all fields, including
+    those filled in by later phases, are declared in __slots__.
     """
 
+    __slots__ = (
+        "start_offset",
+        "end_offset",
+        "follow_offset",
+        "loop_offset",
+        "jump_offsets",
+        "exception_offsets",
+        "flags",
+        "starts_line",
+        "index",
+        "predecessors",
+        "successors",
+        "dom_set",
+        "doms",
+        "dom_in",
+        "dom_out",
+        "pdom_set",
+        "nesting_depth",
+        "reach_offset",
+        "unreachable",
+        "number",
+        "edge_count",
+        "break_instructions",
+    )
+
     def __init__(
         self,
         start_offset: int,
         end_offset: int,
         follow_offset: int,
         loop_offset: int,
-        flags=set(),
+        flags=0,
         jump_offsets=set(),
         starts_line=None,
+        number: int = -1,
     ):
-        global end_bb
-
         # The offset of the first and last instructions in the basic block.
         self.start_offset = start_offset
         self.end_offset = end_offset
@@ -111,9 +134,10 @@ class BasicBlock:
         self.jump_offsets = jump_offsets
         self.exception_offsets = set()
 
-        # "Flags" is a set of interesting bits about the basic block.
-        # Elements of the bits are BB_... constants
-        self.flags = flags
+        # "Flags" is a bitmask of interesting bits about the basic
+        # block. Bit positions are BB_... constants. `flags` can be given
+        # as an int or as an iterable of BB_... constants.
+        self.flags = BBFlags.from_flags(flags)
 
         self.starts_line = starts_line
         self.index = (start_offset, end_offset)
@@ -128,25 +152,48 @@ class BasicBlock:
         # dominators, i.e., dominators of *other* blocks.
         self.dom_set = set()
 
+        # The blocks we dominate, including ourself. This is set when
+        # dominators are computed and stays None for unreachable blocks.
+        self.doms = None
+
+        # The preorder number of this block in the dominator tree, and
+        # the largest preorder number in the subtree this block
+        # dominates. This block dominates another block exactly when
+        # the other block's dom_in lies in [dom_in, dom_out].
+        # -1 indicates the value has not been computed, or that the
+        # block is unreachable.
+        self.dom_in: int = -1
+        self.dom_out: int = -1
+
+        # The post-dominator-tree nodes of the blocks we properly
+        # post-dominate. This is set when post-dominators are computed
+        # and stays None for blocks which can't reach the exit block.
+        self.pdom_set = None
+
         # How deeply is this block nested inside other dominator
         # regions?  -1 indicates the value has not been computed. The
         # dominator region of the entry node is at nesting_depth 0.
         # Blocks directly nested inside this are at nesting depth 1.
         self.nesting_depth: int = -1
 
+        # The largest end offset of any block we dominate. None
+        # indicates the value has not been computed.
+        self.reach_offset: Optional[int] = None
+
         # Set True if this is dead code, or unreachable.
         self.unreachable = False
-        self.number = end_bb
+
+        # Blocks are numbered by the BBMgr that creates them, in the
+        # order they are created. Other blocks are numbered -1.
+        self.number = number
         self.edge_count = len(jump_offsets)
-        if follow_offset is not None and BB_NOFOLLOW not in self.flags:
+        if follow_offset is not None and not self.has_flag(BB_NOFOLLOW):
             self.edge_count += 1
 
         # List of instructions that break out of loops.
         # Of course, this is non-empty only when the basic block is inside a loop
         self.break_instructions = []
 
-        end_bb += 1
-
     # A nice print routine for a Basic block
     def __repr__(self):
         if len(self.jump_offsets) > 0:
@@ -157,8 +204,8 @@ class BasicBlock:
             exception_text = f", exceptions={sorted(self.exception_offsets)}"
         else:
             exception_text = ""
-        if len(self.flags) > 0:
-            flag_str = ",".join(FLAG2NAME[flag] for flag in sorted(self.flags))
+        if self.flags:
+            flag_str = ",".join(FLAG2NAME[flag] for flag in self.flags)
             flag_text = ", flags={%s}" % flag_str
         else:
             flag_text = ""
@@ -192,6 +239,22 @@ class BasicBlock:
             line_text,
         )
 
+    def has_flag(self, flag: int) -> bool:
+        """Return True if BB_... `flag` is set for this block."""
+        return (self.flags >> flag) & 1 == 1
+
+    def add_flag(self, flag: int):
+        """Set BB_... `flag` for this block."""
+        self.flags = BBFlags(self.flags | (1 << flag))
+
+    def remove_flag(self, flag: int):
+        """Clear BB_... `flag` for this block."""
+        self.flags = BBFlags(self.flags & ~(1 << flag))
+
+    def format_flags(self) -> str:
+        """Return the names of the block's flags as a comma-separated string."""
+        return format_flags(self.flags)
+
     # Define "<" so we can compare and sort basic blocks.
     # Define 0 (the exit block) as the largest/last block
     def __lt__(self, other):
@@ -200,10 +263,21 @@ class BasicBlock:
 
 class BBMgr(object):
     def __init__(self, version=PYTHON_VERSION_TRIPLE, is_pypy=IS_PYPY):
-        global end_bb
-        end_bb = 0
-        self.bb_list = []
-        self.exit_block = None
+        # All state, including the numbering of basic blocks, is kept
+        # here rather than in globals, so that several code objects
+        # can be analyzed at the same time in different threads.
+        self._bb_list: Optional[List[BasicBlock]] = []
+        self._exit_block: Optional[BasicBlock] = None
+        self._start_block: Optional[BasicBlock] = None
+
+        # When set, the blocks are stored in this columnar table, and
+        # BasicBlock objects are created from it only when they are
+        # asked for. See to_block_table().
+        self.block_table = None
+
+        # Decoded instructions shared by all stages of the analysis.
+        # This is set in basic_blocks().
+        self.instruction_store: Optional[InstructionStore] = None
 
         version = tuple(version[:2])
 
@@ -291,19 +365,77 @@ class BBMgr(object):
             if opname in opcode.opmap:
                 self.JUMP_UNCONDITIONAL.add(opcode.opmap[opname])
 
+    @property
+    def bb_list(self) -> List[BasicBlock]:
+        """The basic blocks, in block-number order."""
+        if self._bb_list is None:
+            self._materialize_blocks()
+        return self._bb_list
+
+    @property
+    def exit_block(self) -> Optional[BasicBlock]:
+        if self._bb_list is None:
+            self._materialize_blocks()
+        return self._exit_block
+
+    @exit_block.setter
+    def exit_block(self, block: Optional[BasicBlock]):
+        self._exit_block = block
+
+    @property
+    def start_block(self) -> Optional[BasicBlock]:
+        if self._bb_list is None:
+            self._materialize_blocks()
+        return self._start_block
+
+    @start_block.setter
+    def start_block(self, block: Optional[BasicBlock]):
+        self._start_block = block
+
+    def to_block_table(self):
+        """Move the basic blocks into a columnar BlockTable and drop
+        the BasicBlock objects. They are created again from the table
+        the next time `bb_list` is accessed.
+
+        This is useful when many code objects are analyzed and their
+        blocks kept around: a table is much smaller than the list of
+        objects, and it can be pickled cheaply.
+        """
+        from python_control_flow.block_table import BlockTable
+
+        self.block_table = BlockTable.from_blocks(self.bb_list)
+        self._bb_list = None
+        self._exit_block = None
+        self._start_block = None
+        return self.block_table
+
+    def _materialize_blocks(self):
+        table = self.block_table
+        self._bb_list = blocks = table.make_blocks()
+        if table.exit_number >= 0:
+            self._exit_block = blocks[table.exit_number]
+        # basic_blocks() sets the start block to the first block.
+        if blocks:
+            self._start_block = blocks[0]
+
     def add_bb(
         self,
         start_offset: int,
         end_offset: int,
         loop_offset: int,
         follow_offset: int,
-        flags: int,
+        flags: Union[BBFlags, Set[int]],
         jump_offsets: set,
         starts_line: Optional[int] = None,
     ):
+        # `flags` is a BBFlags bitmask, or a set of BB_... flags as
+        # basic_blocks() collects them.
+        flags = BBFlags.from_flags(flags)
         if BB_STARTS_POP_BLOCK in flags and start_offset == end_offset:
-            flags.remove(BB_STARTS_POP_BLOCK)
-            flags.add(BB_SINGLE_POP_BLOCK)
+            flags = BBFlags(
+                flags & ~flags_mask(BB_STARTS_POP_BLOCK)
+                | flags_mask(BB_SINGLE_POP_BLOCK)
+            )
 
         block = BasicBlock(
             start_offset,
@@ -313,6 +445,7 @@ class BBMgr(object):
             jump_offsets=jump_offsets,
             loop_offset=loop_offset,
             starts_line=starts_line,
+            number=len(self.bb_list),
         )
         self.bb_list.append(block)
 
@@ -334,40 +467,35 @@ def basic_blocks(
     is_pypy=IS_PYPY,
     more_precise_returns=False,
     print_instructions=False,
+    instruction_store: Optional[InstructionStore] = None,
+    columnar=False,
 ):
     """Create a list of basic blocks found in a code object.
     `more_precise_returns` indicates whether the RETURN_VALUE
     should be modeled as a jump to the end of the enclosing function
     or not. See comment in code as to why this might be useful.
+
+    If `columnar` is True, the blocks of the returned manager are
+    kept in a columnar BlockTable rather than as BasicBlock objects.
+    See BBMgr.to_block_table().
+
+    If `instruction_store` is given, its already-decoded instructions
+    and jump targets are used. Otherwise `code` is decoded here. Either
+    way, the store is saved in the returned manager so that later
+    stages don't have to decode `code` again.
     """
 
     bb = BBMgr(version_tuple, is_pypy)
 
+    if instruction_store is None:
+        instruction_store = InstructionStore(code, bb.opcode)
+    bb.instruction_store = instruction_store
+
     # Get jump targets
-    jump_targets = set()
-    loop_targets = set()
-    instructions = list(
-        get_instructions_bytes(code, opc=bb.opcode)
-    )
-    for i, inst in enumerate(instructions):
-        offset2inst_index[inst.offset] = i
-        op = inst.opcode
-        offset = inst.offset
-        follow_offset = next_offset(op, bb.opcode, offset)
-        if op in bb.JUMP_INSTRUCTIONS:
-            jump_value = get_jump_val(inst.arg, version_tuple)
-            if op in bb.JABS_INSTRUCTIONS:
-                jump_offset = jump_value
-            else:
-                jump_offset = follow_offset + jump_value
-
-            # For Python so far, a loop jump always goes from a
-            # larger offset to a smaller one
-            is_loop = jump_offset <= inst.offset
-            if is_loop:
-                loop_targets.add(jump_offset)
-            jump_targets.add(jump_offset)
-            pass
+    jump_targets = instruction_store.jump_targets
+    loop_targets = instruction_store.loop_targets
+    instructions = instruction_store.instructions
+    offset2inst_index.update(instruction_store.offset2inst_index)
 
     # Add an artificial block where we can link the exits of other blocks
     # to. This helps when there is a "raise" not in any try block and
@@ -431,7 +559,7 @@ def basic_blocks(
                 last_line_number,
             )
             loop_offset = None
-            if BB_TRY in block.flags:
+            if block.has_flag(BB_TRY):
                 try_stack.append(block)
             start_offset = follow_offset
 
@@ -450,7 +578,7 @@ def basic_blocks(
                     last_line_number,
                 )
                 loop_offset = None
-                if BB_TRY in block.flags:
+                if block.has_flag(BB_TRY):
                     try_stack.append(block)
                     pass
 
@@ -551,7 +679,7 @@ def basic_blocks(
                     last_line_number,
                 )
                 loop_offset = None
-                if BB_TRY in block.flags:
+                if block.has_flag(BB_TRY):
                     try_stack.append(block)
                     pass
 
@@ -570,7 +698,7 @@ def basic_blocks(
                     last_line_number,
                 )
                 loop_offset = None
-                if BB_TRY in block.flags:
+                if block.has_flag(BB_TRY):
                     try_stack.append(block)
                 start_offset = follow_offset
             pass
@@ -624,11 +752,15 @@ def basic_blocks(
                 None,
                 flags=flags,
                 jump_offsets=jump_offsets,
+                number=len(bb.bb_list),
             )
         )
         loop_offset = None
         pass
 
+    if columnar:
+        bb.to_block_table()
+
     return bb
 
 
@@ -0,0 +1,155 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+Sets of basic blocks, or of graph nodes, represented as integer bitsets.
+
+Block numbers are small dense integers, so a set of blocks can be stored as a
+Python int with bit `n` set when block number `n` is in the set. Union,
+intersection and difference are then single big-int operations instead of
+hashing each element.
+"""
+
+from collections.abc import MutableSet
+from typing import Iterable, Sequence
+
+
+class BlockSet(MutableSet):
+    """A set of objects which have a dense integer ``number``
+    attribute, like basic blocks or graph nodes, stored as a bitset.
+
+    `universe` is a sequence which maps a number back to its object;
+    ``universe[obj.number]`` must be ``obj``. It is needed to iterate
+    over the set. Sets that are combined should share the same universe.
+
+    The set supports the usual set API: ``in``, iteration, ``len``,
+    ``add``, ``discard``, ``remove``, and the set operators. Iteration
+    is in increasing number order.
+    """
+
+    __slots__ = ("universe", "bits")
+
+    def __init__(self, universe: Sequence, iterable: Iterable = (), bits: int = 0):
+        self.universe = universe
+        for item in iterable:
+            bits |= 1 << item.number
+        self.bits = bits
+
+    def _from_iterable(self, iterable) -> "BlockSet":
+        # Used by the MutableSet mixin methods when the other operand
+        # is not a BlockSet.
+        return BlockSet(self.universe, iterable)
+
+    def _other_bits(self, other):
+        """Return the bitset of `other`, or None if we can't
+        compute it cheaply."""
+        if isinstance(other, BlockSet) and other.universe is self.universe:
+            return other.bits
+        return None
+
+    def __contains__(self, item) -> bool:
+        number = getattr(item, "number", None)
+        if number is None or number < 0 or not (self.bits >> number) & 1:
+            return False
+        return self.universe[number] == item
+
+    def __iter__(self):
+        bits = self.bits
+        universe = self.universe
+        while bits:
+            low_bit = bits & -bits
+            yield universe[low_bit.bit_length() - 1]
+            bits ^= low_bit
+
+    def __len__(self) -> int:
+        return bin(self.bits).count("1")
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
+
+    def add(self, item):
+        self.bits |= 1 << item.number
+
+    def discard(self, item):
+        if item in self:
+            self.bits &= ~(1 << item.number)
+
+    def copy(self) -> "BlockSet":
+        return BlockSet(self.universe, bits=self.bits)
+
+    def __or__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__or__(other)
+        return BlockSet(self.universe, bits=self.bits | other_bits)
+
+    def __and__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__and__(other)
+        return BlockSet(self.universe, bits=self.bits & other_bits)
+
+    def __sub__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__sub__(other)
+        return BlockSet(self.universe, bits=self.bits & ~other_bits)
+
+    def __xor__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__xor__(other)
+        return BlockSet(self.universe, bits=self.bits ^ other_bits)
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __ior__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__ior__(other)
+        self.bits |= other_bits
+        return self
+
+    def __iand__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__iand__(other)
+        self.bits &= other_bits
+        return self
+
+    def __isub__(self, other):
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__isub__(other)
+        self.bits &= ~other_bits
+        return self
+
+    def __eq__(self, other) -> bool:
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__eq__(other)
+        return self.bits == other_bits
+
+    def __le__(self, other) -> bool:
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__le__(other)
+        return self.bits & ~other_bits == 0
+
+    def __ge__(self, other) -> bool:
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().__ge__(other)
+        return other_bits & ~self.bits == 0
+
+    def isdisjoint(self, other) -> bool:
+        other_bits = self._other_bits(other)
+        if other_bits is None:
+            return super().isdisjoint(other)
+        return self.bits & other_bits == 0
+
+    # MutableSet defines __eq__, so it would otherwise be unhashable anyway.
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"BlockSet({sorted(item.number for item in self)})"
@@ -0,0 +1,123 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+A columnar, struct-of-arrays, representation of a list of basic blocks.
+
+When analyzing all the functions in a module, or in many modules, holding
+on to a BasicBlock object per block, each with its own sets, adds up. A
+BlockTable holds the same information as parallel integer arrays: one
+array per field, indexed by block number. Jump and exception targets,
+whose number varies per block, are stored as "ragged" arrays: the targets
+of all blocks concatenated, plus an index array giving where each block's
+targets start.
+
+A BlockTable contains only arrays, so it is compact and trivially
+picklable. BasicBlock objects are created from it only when asked for.
+"""
+
+from array import array
+from typing import List, Optional, Sequence
+
+from python_control_flow.bb import BasicBlock
+from python_control_flow.graph import BB_EXIT
+
+# How None is stored in an integer column
+NONE = -1
+
+
+def _to_int(value: Optional[int]) -> int:
+    return NONE if value is None else value
+
+
+def _from_int(value: int) -> Optional[int]:
+    return None if value == NONE else value
+
+
+class BlockTable:
+    """Basic-block information for a code object, stored in columns.
+
+    Row `i` describes the basic block numbered `i`. The columns are
+    `start_offset`, `end_offset`, `follow_offset`, `loop_offset`,
+    `flags`, `starts_line` and `edge_count`. None is stored as -1.
+
+    The jump targets of block `i` are
+    ``jump_targets[jump_index[i]:jump_index[i + 1]]``, and similarly for
+    exception targets with `exception_index` and `exception_targets`.
+    """
+
+    def __init__(self):
+        self.start_offset = array("i")
+        self.end_offset = array("i")
+        self.follow_offset = array("i")
+        self.loop_offset = array("i")
+        self.flags = array("i")
+        self.starts_line = array("i")
+        self.edge_count = array("i")
+
+        self.jump_index = array("i", [0])
+        self.jump_targets = array("i")
+        self.exception_index = array("i", [0])
+        self.exception_targets = array("i")
+
+        # Row number of the artificial exit block, or NONE.
+        self.exit_number = NONE
+
+    @classmethod
+    def from_blocks(cls, blocks: Sequence[BasicBlock]) -> "BlockTable":
+        """Return a table holding `blocks`. `blocks[i]` must be the
+        block numbered `i`."""
+        table = cls()
+        for block in blocks:
+            table.append(block)
+        return table
+
+    def append(self, block: BasicBlock):
+        """Add `block` as the next row of the table."""
+        assert block.number == len(self), "blocks must be added in number order"
+        self.start_offset.append(block.start_offset)
+        self.end_offset.append(block.end_offset)
+        self.follow_offset.append(_to_int(block.follow_offset))
+        self.loop_offset.append(_to_int(block.loop_offset))
+        self.flags.append(block.flags)
+        self.starts_line.append(_to_int(block.starts_line))
+        self.edge_count.append(block.edge_count)
+
+        self.jump_targets.extend(sorted(block.jump_offsets))
+        self.jump_index.append(len(self.jump_targets))
+        self.exception_targets.extend(sorted(block.exception_offsets))
+        self.exception_index.append(len(self.exception_targets))
+
+        if block.has_flag(BB_EXIT):
+            self.exit_number = block.number
+
+    def __len__(self) -> int:
+        return len(self.start_offset)
+
+    def jump_offsets(self, number: int) -> array:
+        """Return the jump targets of block `number`."""
+        return self.jump_targets[self.jump_index[number] : self.jump_index[number + 1]]
+
+    def exception_offsets(self, number: int) -> array:
+        """Return the exception targets of block `number`."""
+        return self.exception_targets[
+            self.exception_index[number] : self.exception_index[number + 1]
+        ]
+
+    def make_block(self, number: int) -> BasicBlock:
+        """Create the BasicBlock for row `number`."""
+        block = BasicBlock(
+            self.start_offset[number],
+            self.end_offset[number],
+            _from_int(self.follow_offset[number]),
+            _from_int(self.loop_offset[number]),
+            flags=self.flags[number],
+            jump_offsets=set(self.jump_offsets(number)),
+            starts_line=_from_int(self.starts_line[number]),
+            number=number,
+        )
+        block.edge_count = self.edge_count[number]
+        block.exception_offsets = set(self.exception_offsets(number))
+        return block
+
+    def make_blocks(self) -> List[BasicBlock]:
+        """Create the BasicBlocks for all rows, in number order."""
+        return [self.make_block(number) for number in range(len(self))]
@@ -1,6 +1,8 @@
 # Copyright (c) 2021-2026 by Rocky Bernstein <rb@dustyfeet.com>
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
 
 from xdis.codetype.base import iscode
 from xdis.op_imports import get_opcode_module
@@ -10,7 +12,15 @@ from python_control_flow.augment_disasm import augment_instructions
 from python_control_flow.bb import BB_JUMP_UNCONDITIONAL, BB_NOFOLLOW, basic_blocks
 from python_control_flow.cfg import ControlFlowGraph
 from python_control_flow.dominators import DominatorTree
-from python_control_flow.graph import BB_DEAD_CODE, write_dot
+from python_control_flow.graph import (
+    BB_DEAD_CODE,
+    EdgeKind,
+    flags_mask,
+    write_dot,
+    write_module_dot,
+)
+from python_control_flow.instructions import InstructionStore
+
 
 def build_and_analyze_control_flow(
     func_or_code,
@@ -21,11 +31,26 @@ def build_and_analyze_control_flow(
     func_or_code_name: str = "",
     debug: dict = {},
     file_part: str = "",
+    render_queue=None,
+    render_cache=None,
+    collapse_depth: Optional[int] = None,
+    node_budget: Optional[int] = None,
+    use_bitsets: bool = False,
 ):
     """
     Compute control-flow graph, dominator information, and
     assembly instructions augmented with control flow for
     function "func".
+
+    If `use_bitsets` is True, sets of basic blocks are integer
+    bitsets; see ControlFlowGraph.
+
+    Graphs asked for in `graph_options` are rendered to PNG files
+    before returning, unless a render.RenderQueue is given in
+    `render_queue`; then they are rendered there, while analysis goes
+    on. Graphs already in `render_cache`, a render.RenderCache, are
+    not written or rendered again. `collapse_depth` and `node_budget`
+    limit the detail drawn for big functions; see dotio.DotConverter.
     """
 
     debug_dict: dict = {}
@@ -65,14 +90,22 @@ def build_and_analyze_control_flow(
     if opc is None:
         opc = get_opcode_module(code_version_tuple, PYTHON_IMPLEMENTATION)
 
-    offset2inst_index = {}
-    linestarts = dict(opc.findlinestarts(code, dup_lines=True))
-    bb_mgr = basic_blocks(code, linestarts, offset2inst_index, code_version_tuple)
+    # Decode instructions once. Every later stage uses this.
+    instruction_store = InstructionStore(code, opc)
+    offset2inst_index = instruction_store.offset2inst_index
+    linestarts = instruction_store.linestarts
+    bb_mgr = basic_blocks(
+        code,
+        linestarts,
+        offset2inst_index,
+        code_version_tuple,
+        instruction_store=instruction_store,
+    )
 
     # for bb in bb_mgr.bb_list:
     #     print("\t", bb)
 
-    cfg = ControlFlowGraph(bb_mgr)
+    cfg = ControlFlowGraph(bb_mgr, use_bitsets=use_bitsets)
     assert cfg.graph is not None, "Failed to build graph"
 
     version = ".".join((str(n) for n in code_version_tuple[:2]))
@@ -82,6 +115,10 @@ def build_and_analyze_control_flow(
             f"/tmp/flow-{version}",
             cfg.graph,
             write_png=True,
+            render_queue=render_queue,
+            render_cache=render_cache,
+            collapse_depth=collapse_depth,
+            node_budget=node_budget,
             exit_node=cfg.exit_node,
         )
 
@@ -93,7 +130,7 @@ def build_and_analyze_control_flow(
         for node in cfg.graph.nodes:
             if node.bb.nesting_depth < 0:
                 node.is_dead_code = True
-                node.bb.flags.add(BB_DEAD_CODE)
+                node.bb.add_flag(BB_DEAD_CODE)
             else:
                 node.is_dead_code = False
 
@@ -105,6 +142,10 @@ def build_and_analyze_control_flow(
                 f"/tmp/flow-dom-{version}",
                 cfg.dom_forest,
                 write_png=True,
+                render_queue=render_queue,
+                render_cache=render_cache,
+                collapse_depth=collapse_depth,
+                node_budget=node_budget,
                 exit_node=cfg.exit_node,
             )
 
@@ -115,6 +156,10 @@ def build_and_analyze_control_flow(
                 f"/tmp/flow+dom-{version}",
                 cfg.graph,
                 write_png=True,
+                render_queue=render_queue,
+                render_cache=render_cache,
+                collapse_depth=collapse_depth,
+                node_budget=node_budget,
                 is_dominator_format=True,
                 exit_node=cfg.exit_node,
             )
@@ -148,6 +193,110 @@ def build_and_analyze_control_flow(
     return cfg, augmented_instrs
 
 
+def build_and_analyze_control_flows(
+    funcs_or_codes: Iterable,
+    max_workers: Optional[int] = None,
+    opc=None,
+    code_version_tuple=PYTHON_VERSION_TRIPLE[:2],
+    **kwargs,
+) -> List[Tuple[ControlFlowGraph, list]]:
+    """
+    Run build_and_analyze_control_flow() on each function or code
+    object in `funcs_or_codes` using a pool of at most `max_workers`
+    threads, and return the list of (cfg, augmented instructions)
+    results in the same order as `funcs_or_codes`.
+
+    All of the state of an analysis, including the numbering of basic
+    blocks, graph nodes and edges, belongs to that analysis, so analyses
+    can run at the same time. The opcode module is looked up once and
+    shared by all of them. Any remaining keyword arguments are passed on
+    to build_and_analyze_control_flow(). If graphs are written, give
+    each function a distinct name so that their files don't collide.
+    A `render_queue` or `render_cache` passed this way is shared by all
+    of the analyses.
+    """
+    if opc is None:
+        opc = get_opcode_module(code_version_tuple, PYTHON_IMPLEMENTATION)
+
+    def analyze(func_or_code):
+        return build_and_analyze_control_flow(
+            func_or_code, opc=opc, code_version_tuple=code_version_tuple, **kwargs
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(analyze, funcs_or_codes))
+
+
+def nested_code_objects(code) -> list:
+    """Return code object `code` followed by the code objects nested
+    in it, like functions, classes and comprehensions, depth first."""
+    codes = []
+    stack = [code]
+    while stack:
+        code = stack.pop()
+        codes.append(code)
+        stack.extend(reversed([const for const in code.co_consts if iscode(const)]))
+    return codes
+
+
+def build_and_analyze_module_control_flow(
+    code,
+    graph_options: str = "all",
+    max_workers: Optional[int] = None,
+    opc=None,
+    code_version_tuple=PYTHON_VERSION_TRIPLE[:2],
+    func_or_code_name: str = "",
+    render_queue=None,
+    render_cache=None,
+    collapse_depth: Optional[int] = None,
+    node_budget: Optional[int] = None,
+) -> List[Tuple[ControlFlowGraph, list]]:
+    """
+    Analyze module code object `code` and all of the code objects
+    nested in it, as build_and_analyze_control_flows() does, and
+    return the results in the order of nested_code_objects().
+
+    Instead of a graph file for each code object, a single file
+    is written for the module, named after `func_or_code_name`, with a
+    cluster subgraph for each code object, and it is rendered with a
+    single run of dot. `graph_options` "control-flow" draws the
+    control-flow graphs, and "all" or "dominators" draws them in
+    dominator format. Code objects whose analysis failed are left out.
+    """
+    codes = nested_code_objects(code)
+    results = build_and_analyze_control_flows(
+        codes,
+        max_workers=max_workers,
+        opc=opc,
+        code_version_tuple=code_version_tuple,
+    )
+    if graph_options not in ("all", "control-flow", "dominators"):
+        return results
+
+    graphs = [
+        (getattr(code, "co_qualname", code.co_name), cfg.graph, cfg.exit_node)
+        for code, (cfg, augmented_instrs) in zip(codes, results)
+        if augmented_instrs
+    ]
+    version = ".".join((str(n) for n in code_version_tuple[:2]))
+    is_dominator_format = graph_options != "control-flow"
+    write_module_dot(
+        func_or_code_name or code.co_name,
+        f"/tmp/flow+dom-{version}" if is_dominator_format else f"/tmp/flow-{version}",
+        graphs,
+        write_png=True,
+        is_dominator_format=is_dominator_format,
+        render_queue=render_queue,
+        render_cache=render_cache,
+        collapse_depth=collapse_depth,
+        node_budget=node_budget,
+    )
+    return results
+
+
+nofollow_or_jump_flags = flags_mask(BB_NOFOLLOW, BB_JUMP_UNCONDITIONAL)
+
+
 def classify_join_nodes_and_edges(cfg: ControlFlowGraph):
     """
     Classify basic blocks as whether the first instruction
@@ -172,10 +321,10 @@ def classify_join_nodes_and_edges(cfg: ControlFlowGraph):
                 source_nesting_depth >= node_nesting_depth
                 and edge.kind
                 not in (
-                    "self-loop",
-                    "looping",
+                    EdgeKind.SELF_LOOP,
+                    EdgeKind.LOOPING,
                 )
-                and not (edge.source.flags & {BB_NOFOLLOW, BB_JUMP_UNCONDITIONAL})
+                and not (edge.source.flags & nofollow_or_jump_flags)
             ):
                 node.is_join_node = True
                 edge.is_join = True
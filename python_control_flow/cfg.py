@@ -1,8 +1,13 @@
 # Copyright (c) 2021, 2024-2025 by Rocky Bernstein <rb@dustyfeet.com>
 #
+from array import array
+from bisect import bisect_right
+from itertools import count
 from operator import attrgetter
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from python_control_flow.bitset import BlockSet
+from python_control_flow.csr import CSRGraph
 from python_control_flow.graph import (
     BB_ENTRY,
     BB_EXIT,
@@ -15,11 +20,14 @@ from python_control_flow.graph import (
     BB_NOFOLLOW,
     DiGraph,
     Edge,
+    EdgeKind,
     Node,
     ScopeEdgeKind,
     TreeGraph,
+    flags_mask,
     jump_flags,
 )
+from python_control_flow.traversals import depth_first_orders
 
 
 class ControlFlowGraph:
@@ -28,9 +36,28 @@ class ControlFlowGraph:
     iterates over its bytecode and builds basic blocks with flag
     annotations. The final representation leverages the ``DiGraph``
     structure, and contains an instance of the ``DominatorTree``.
+
+    If `use_bitsets` is True, the sets of basic blocks and of
+    dominator-tree nodes attached to each basic block: `predecessors`,
+    `successors`, `doms` and `dom_set`, are integer-bitset ``BlockSet``s
+    rather than Python sets.
+
+    The depth-first preorder, postorder and reverse postorder of the
+    blocks reachable from the entry block are available as integer
+    arrays of block numbers, `preorder`, `postorder` and `rpo`, and
+    the position of each block in these as `preorder_number`,
+    `postorder_number` and `rpo_number`, which are -1 for an
+    unreachable block. These are computed on first use and recomputed
+    after the graph changes.
+
+    `loops` is the loop nesting forest, a ``loops.LoopForest``, and
+    `scc` the strongly-connected components of the CSR successor
+    relation, an ``scc.Condensation``. These too are computed on first
+    use and recomputed after the graph changes.
     """
 
-    def __init__(self, bb_mgr):
+    def __init__(self, bb_mgr, use_bitsets: bool = False):
+        self.use_bitsets = use_bitsets
         self.block_offsets = {}
         self.seen_blocks = set()
         self.blocks = bb_mgr.bb_list
@@ -39,6 +66,7 @@ class ControlFlowGraph:
         self.offset2edges: Dict[int, List[Edge]] = {}
         self.block_nodes = {}
         self.graph = None
+        self.csr: Optional[CSRGraph] = None
         self.entry_node = None
         self.exit_node = bb_mgr.exit_block
 
@@ -51,8 +79,32 @@ class ControlFlowGraph:
         # FIXME: organize this better.
         self.dom_forest: Optional[TreeGraph] = None
 
+        # The dominators.DominatorTree, once dominators have been
+        # computed. Its `tree` is the dominator tree as a TreeGraph.
+        self.dom_tree = None
+
         self.max_nesting_depth: int = -1
 
+        # Traversal orders, and the graph generation they were
+        # computed for. See traversal_orders().
+        self._orders: Optional[Tuple[array, ...]] = None
+        self._orders_generation: int = -1
+
+        # Loop nesting forest, and the graph generation it was
+        # computed for. See the `loops` property.
+        self._loops = None
+        self._loops_generation: int = -1
+
+        # Strongly-connected components, and the graph generation they
+        # were computed for. See the `scc` property.
+        self._scc = None
+        self._scc_generation: int = -1
+
+        # Post-dominators, and the graph generation they were computed
+        # for. See the `pdom_tree` property.
+        self._pdom_tree = None
+        self._pdom_tree_generation: int = -1
+
         self.analyze(self.blocks, bb_mgr.exit_block)
 
     def analyze(self, blocks, exit_block):
@@ -70,35 +122,38 @@ class ControlFlowGraph:
         """
         Build a control-flow graph from basic blocks `blocks`.
         The exit block is `exit_block`.
+
+        A single pass over the blocks in offset order fills in each
+        block's successors and predecessors, creates the typed graph
+        edges, indexes them in `self.offset2edges` and collects the
+        edges of the CSR adjacency.
         """
 
         g = DiGraph()
-
-        def add_edge(source_node, dest_node, edge_kind: str) -> Edge:
-            new_edge = g.make_add_edge(source_node, dest_node, edge_kind)
-            target_offset = new_edge.dest.bb.start_offset
-            if target_offset not in self.offset2edges:
-                self.offset2edges[target_offset] = [new_edge]
-            else:
-                self.offset2edges[target_offset].append(new_edge)
-            return new_edge
-
-        self.block_nodes = {}
-
-        # Add nodes
+        self.block_nodes = block_nodes = {}
+        block_offsets = self.block_offsets
+        nofollow_mask = flags_mask(BB_NOFOLLOW)
+        exit_mask = flags_mask(BB_EXIT)
+
+        # Add nodes. Each node takes the number of its block, so the
+        # nodes are made here directly and put in the graph at once,
+        # rather than with g.make_add_node().
         exit_block = None
         offset2block = self.offset2block
-        for block in self.blocks:
-            self.block_offsets[block.start_offset] = block
-            block_node = g.make_add_node(block)
-            self.block_nodes[block] = block_node
+        nodes = [Node(block) for block in self.blocks]
+        for block, block_node in zip(self.blocks, nodes):
+            block_offsets[block.start_offset] = block
+            block_nodes[block] = block_node
             offset2block[block.index[0]] = block_node
 
-            if BB_EXIT in block.flags:
+            if block.flags & exit_mask:
                 assert exit_block is None, f"Already saw exit block at: {exit_block}"
                 exit_block = block
                 self.exit_block = block_node
             pass
+        g.nodes.update(nodes)
+        g.node_counter = count(len(nodes) + 1)
+        g.generation += len(nodes)
 
         # List of instruction offset to dominator information, sorted
         # by offset.  The only offsets here are the ones that start a
@@ -108,10 +163,72 @@ class ControlFlowGraph:
             (offset, offset2block[offset]) for offset in sorted(offset2block.keys())
         )
 
-        # Compute a block's immediate predecessors and successors
+        # An interval index over the above for get_node() and
+        # get_nodes(): the block start offsets in increasing order, and
+        # the node starting at each of these.
+        self.block_starts = tuple(offset for offset, _ in self.offset2block_sorted)
+        self.block_start_nodes = tuple(node for _, node in self.offset2block_sorted)
 
-        for block in self.blocks:
-            for jump_offset in set(block.jump_offsets) | block.exception_offsets:
+        if self.use_bitsets:
+            # Block numbers index self.blocks.
+            for block in self.blocks:
+                block.predecessors = BlockSet(self.blocks, block.predecessors)
+                block.successors = BlockSet(self.blocks, block.successors)
+
+        assert (
+            len(self.blocks) > 1
+        ), "There should be at least a start and exception exit block"
+        assert self.blocks[1].has_flag(BB_ENTRY), "We assume block 1 is the entry block"
+        self.entry_node = self.blocks[1]
+
+        # The nodes are all in the graph already, so rather than adding
+        # edges one at a time with g.make_add_edge(), the (source node,
+        # destination node, kind) of each edge is collected here, and
+        # the edges are made and put in the graph after the pass.
+        edge_ends: List[Tuple[Node, Node, EdgeKind]] = []
+        add_edge = edge_ends.append
+        exit_node = self.exit_block
+        EXIT_EDGE = EdgeKind.EXIT_EDGE
+        EXCEPTION = EdgeKind.EXCEPTION
+        FALLTHROUGH = EdgeKind.FALLTHROUGH
+        NO_FALLTHROUGH = EdgeKind.NO_FALLTHROUGH
+        jump_edge_kind = self.jump_edge_kind
+
+        # For each block number, the (successor number, kind code)
+        # pairs of its successors, used to build the CSR adjacency
+        # below.
+        successor_rows = [()] * len(self.blocks)
+
+        for block in sorted(self.blocks, key=attrgetter("index")):
+            block_node = block_nodes[block]
+            flags = block.flags
+            successors = block.successors
+
+            # Successor block number to the kind of edge to it. A
+            # successor can be reached in more than one way; a jump or
+            # exception is preferred over the fall-through or exit.
+            successor_kinds: Dict[int, EdgeKind] = {}
+            follow_successor = None
+
+            # Fall-through and exit edges.
+            follow_offset = block.follow_offset
+            no_follow = flags & nofollow_mask
+            if follow_offset:
+                follow_block = block_offsets[follow_offset]
+                if no_follow:
+                    add_edge((block_node, exit_node, EXIT_EDGE))
+                    add_edge((block_node, block_nodes[follow_block], NO_FALLTHROUGH))
+                else:
+                    add_edge((block_node, block_nodes[follow_block], FALLTHROUGH))
+                    if not (jump_flags & flags):
+                        follow_successor = (follow_block, FALLTHROUGH)
+            elif not flags & exit_mask:
+                add_edge((block_node, exit_node, EXIT_EDGE))
+            if no_follow:
+                follow_successor = (exit_block, EXIT_EDGE)
+
+            # Connect the current block to its jump targets
+            for jump_offset in block.jump_offsets:
                 # We need to guard against jumps to wild offsets.
                 # This was seen in
                 # fontTools/ttLib/tables/ttProgram.cpython-310.pyc
@@ -129,101 +246,232 @@ class ControlFlowGraph:
                 #
                 # The presumption is that some sort of optimization is
                 # munging instructions above in code that is now dead.
-
-                if jump_offset not in self.block_offsets:
+                target_block = block_offsets.get(jump_offset)
+                if target_block is None:
                     continue
-                successor_block = self.block_offsets[jump_offset]
-                successor_block.predecessors.add(block)
-                block.successors.add(successor_block)
-            if BB_NOFOLLOW in block.flags:
-                exit_block.predecessors.add(block)
-                block.successors.add(exit_block)
+                edge_kind = jump_edge_kind(block, target_block)
+                add_edge((block_node, block_nodes[target_block], edge_kind))
+                target_block.predecessors.add(block)
+                successors.add(target_block)
+                successor_kinds.setdefault(target_block.number, edge_kind)
                 pass
-            elif block.follow_offset and (not (jump_flags & block.flags)):
-                assert block.follow_offset in self.block_offsets
-                successor_block = self.block_offsets[block.follow_offset]
+
+            # Exception edges. In the graph these go from the handler
+            # back to the block, but the handler is a successor of the
+            # block.
+            for jump_offset in block.exception_offsets:
+                handler_block = block_offsets[jump_offset]
+                add_edge((block_nodes[handler_block], block_node, EXCEPTION))
+                handler_block.predecessors.add(block)
+                successors.add(handler_block)
+                successor_kinds.setdefault(handler_block.number, EXCEPTION)
+                pass
+
+            if follow_successor is not None:
+                successor_block, edge_kind = follow_successor
                 successor_block.predecessors.add(block)
-                block.successors.add(successor_block)
+                successors.add(successor_block)
+                successor_kinds.setdefault(successor_block.number, edge_kind)
+
+            if len(successor_kinds) > 1:
+                successor_rows[block.number] = sorted(successor_kinds.items())
+            else:
+                successor_rows[block.number] = successor_kinds.items()
             pass
 
-        assert (
-            len(self.blocks) > 1
-        ), "There should be at least a start and exception exit block"
-        assert BB_ENTRY in self.blocks[1].flags, "We assume block 1 is the entry block"
-        self.entry_node = self.blocks[1]
+        # Edges are numbered in the order they were found, as
+        # g.make_edge() would number them.
+        new_edges = [
+            Edge(source_node, dest_node, edge_kind, None, edge_id)
+            for (source_node, dest_node, edge_kind), edge_id in zip(
+                edge_ends, g.edge_counter
+            )
+        ]
+        g.edges.update(new_edges)
+        g.generation += len(new_edges)
+        offset2edges = self.offset2edges
+        for edge in new_edges:
+            target_offset = edge.dest.bb.start_offset
+            target_edges = offset2edges.get(target_offset)
+            if target_edges is None:
+                offset2edges[target_offset] = [edge]
+            else:
+                target_edges.append(edge)
 
-        sorted_blocks = sorted(self.blocks, key=attrgetter("index"))
-        for i, block in enumerate(sorted_blocks):
-            # Is this dead code? (Remove self loops in calculation)
-            # Entry node, blocks[0] is never unreachable
+        # Is this dead code? (Remove self loops in calculation)
+        # Entry node, blocks[0] is never unreachable
+        entry_mask = flags_mask(BB_ENTRY)
+        for block in self.blocks:
+            predecessors = block.predecessors
+            has_other_predecessor = len(predecessors) > 1 or (
+                len(predecessors) == 1 and block not in predecessors
+            )
             if not (
-                block.predecessors - {block}
-                and block != blocks[0]
-                or BB_ENTRY in block.flags
+                has_other_predecessor
+                and block is not blocks[0]
+                or block.flags & entry_mask
             ):
                 block.unreachable = True
 
-            block = sorted_blocks[i]
-            if block.follow_offset:
-                if BB_NOFOLLOW in block.flags:
-                    kind = "no fallthrough"
-                    add_edge(self.block_nodes[block], self.exit_block, "exit edge")
-                else:
-                    kind = "fallthrough"
-                add_edge(
-                    self.block_nodes[block],
-                    self.block_nodes[self.block_offsets[block.follow_offset]],
-                    kind,
-                )
-            elif BB_EXIT not in block.flags:
-                add_edge(self.block_nodes[block], self.exit_block, "exit edge")
-
-            # Connect the current block to its jump targets
-            for jump_index in block.jump_offsets:
-                # We need to guard against jumps to wild offsets. See
-                # comment about this above.
-                if jump_index in self.block_offsets:
-                    target_block = self.block_offsets[jump_index]
-                    if jump_index > block.start_offset:
-                        if BB_LOOP in block.flags:
-                            edge_kind = "for-finish"
-                        elif BB_JUMP_BACKWARD_IF_FALSE in self.block_nodes[block].flags:
-                            edge_kind = "jump-backward-if-false"
-                        elif BB_JUMP_BACKWARD_IF_TRUE in self.block_nodes[block].flags:
-                            edge_kind = "jump-backward-if-true"
-                        elif BB_JUMP_FORWARD_IF_FALSE in self.block_nodes[block].flags:
-                            edge_kind = "jump-forward-if-false"
-                        elif BB_JUMP_FORWARD_IF_TRUE in self.block_nodes[block].flags:
-                            edge_kind = "jump-forward-if-true"
-                        else:
-                            edge_kind = "forward"
-                    else:
-                        edge_kind = "looping"
-                        pass
-
-                    if self.block_nodes[target_block] == self.block_nodes[block]:
-                        edge_kind = "self-loop"
-
-                    add_edge(
-                        self.block_nodes[block],
-                        self.block_nodes[target_block],
-                        edge_kind,
-                    )
-                    pass
-                pass
-            for jump_index in block.exception_offsets:
-                source_block = self.block_offsets[jump_index]
-                assert jump_index <= source_block.start_offset
-                edge_kind = "exception"
-                add_edge(
-                    self.block_nodes[source_block], self.block_nodes[block], edge_kind
-                )
-                pass
-            pass
+        # The successor relation as compressed-sparse-row arrays, with
+        # edge kinds. This is what dominators and traversals use.
+        self.csr = CSRGraph.from_rows(successor_rows)
 
         self.graph = g
         return
 
+    def add_edge(self, block, target_block, kind: EdgeKind) -> Edge:
+        """Add an edge of kind `kind` from basic block `block` to basic
+        block `target_block`, making `target_block` a successor of
+        `block`, and return the new graph edge.
+
+        As in build_flowgraph(), an exception edge is made from
+        `target_block`, the handler, back to `block` in the graph.
+        Traversal orders are recomputed on next use.
+        """
+        source_node = self.block_nodes[block]
+        dest_node = self.block_nodes[target_block]
+        if kind == EdgeKind.EXCEPTION:
+            source_node, dest_node = dest_node, source_node
+        edge = self.graph.make_add_edge(source_node, dest_node, kind)
+        self.offset2edges.setdefault(dest_node.bb.start_offset, []).append(edge)
+
+        if target_block not in block.successors:
+            block.successors.add(target_block)
+            target_block.predecessors.add(block)
+            self.csr.add_edge(block.number, target_block.number, kind)
+        return edge
+
+    def traversal_orders(self) -> Tuple[array, ...]:
+        """Return the arrays `preorder`, `postorder`, `rpo`,
+        `preorder_number`, `postorder_number` and `rpo_number`
+        described in the class docstring.
+
+        These come from a single depth-first traversal of the CSR
+        successor rows, from the entry block. The result is kept until
+        the graph's generation changes.
+        """
+        generation = self.graph.generation
+        if self._orders is None or self._orders_generation != generation:
+            num_blocks = len(self.blocks)
+            preorder_list, postorder_list = depth_first_orders(
+                self.entry_node.number, self.csr.forward.__getitem__
+            )
+            preorder = array("i", preorder_list)
+            postorder = array("i", postorder_list)
+            rpo = array("i", reversed(postorder_list))
+            numbers = []
+            for order in (preorder, postorder, rpo):
+                number = array("i", [-1]) * num_blocks
+                for i, block_number in enumerate(order):
+                    number[block_number] = i
+                numbers.append(number)
+            self._orders = (preorder, postorder, rpo, *numbers)
+            self._orders_generation = generation
+        return self._orders
+
+    def invalidate_orders(self):
+        """Throw away the cached traversal orders, loop nesting forest
+        (`_loops`), strongly-connected components (`_scc`) and
+        post-dominators (`_pdom_tree`), for use after changing block
+        successors without going through add_edge()."""
+        self._orders = None
+        self._loops = None
+        self._scc = None
+        self._pdom_tree = None
+
+    @property
+    def loops(self):
+        generation = self.graph.generation
+        if self._loops is None or self._loops_generation != generation:
+            from python_control_flow.loops import LoopForest
+
+            self._loops = LoopForest(self)
+            self._loops_generation = generation
+        return self._loops
+
+    @property
+    def scc(self):
+        generation = self.graph.generation
+        if self._scc is None or self._scc_generation != generation:
+            from python_control_flow.scc import Condensation
+
+            self._scc = Condensation(self.csr, self.entry_node.number)
+            self._scc_generation = generation
+        return self._scc
+
+    @property
+    def pdom_tree(self):
+        """The dominators.PostDominatorTree of the graph, computed the
+        first time it is asked for."""
+        generation = self.graph.generation
+        if self._pdom_tree is None or self._pdom_tree_generation != generation:
+            from python_control_flow.dominators import PostDominatorTree
+
+            self._pdom_tree = PostDominatorTree(self)
+            self._pdom_tree_generation = generation
+        return self._pdom_tree
+
+    @property
+    def is_reducible(self) -> bool:
+        """True if every loop in the graph has a single entry."""
+        return not self.scc.is_irreducible
+
+    @property
+    def known_reducible(self) -> Optional[bool]:
+        """is_reducible, if that has already been computed for the
+        graph as it is now, or else None."""
+        if self._scc is None or self._scc_generation != self.graph.generation:
+            return None
+        return not self._scc.is_irreducible
+
+    @property
+    def preorder(self) -> array:
+        return self.traversal_orders()[0]
+
+    @property
+    def postorder(self) -> array:
+        return self.traversal_orders()[1]
+
+    @property
+    def rpo(self) -> array:
+        return self.traversal_orders()[2]
+
+    @property
+    def preorder_number(self) -> array:
+        return self.traversal_orders()[3]
+
+    @property
+    def postorder_number(self) -> array:
+        return self.traversal_orders()[4]
+
+    @property
+    def rpo_number(self) -> array:
+        return self.traversal_orders()[5]
+
+    @staticmethod
+    def jump_edge_kind(block, target_block) -> EdgeKind:
+        """Return the kind of the edge for a jump from basic block
+        `block` to basic block `target_block`."""
+        if target_block is block:
+            return EdgeKind.SELF_LOOP
+        if target_block.start_offset <= block.start_offset:
+            return EdgeKind.LOOPING
+        # This is called for every jump when building the graph, so
+        # the flag bits are tested here rather than with has_flag().
+        flags = block.flags
+        if (flags >> BB_LOOP) & 1:
+            return EdgeKind.FOR_FINISH
+        elif (flags >> BB_JUMP_BACKWARD_IF_FALSE) & 1:
+            return EdgeKind.JUMP_BACKWARD_IF_FALSE
+        elif (flags >> BB_JUMP_BACKWARD_IF_TRUE) & 1:
+            return EdgeKind.JUMP_BACKWARD_IF_TRUE
+        elif (flags >> BB_JUMP_FORWARD_IF_FALSE) & 1:
+            return EdgeKind.JUMP_FORWARD_IF_FALSE
+        elif (flags >> BB_JUMP_FORWARD_IF_TRUE) & 1:
+            return EdgeKind.JUMP_FORWARD_IF_TRUE
+        return EdgeKind.FORWARD
+
     def classify_edges(self):
         """
         Classify edges into alternate edges, looping edges, or join edges.
@@ -231,7 +479,7 @@ class ControlFlowGraph:
         """
 
         for edge in self.graph.edges:
-            if edge.kind == "no fallthrough":
+            if edge.kind == EdgeKind.NO_FALLTHROUGH:
                 # Edge is not to be followed.
                 continue
 
@@ -243,7 +491,7 @@ class ControlFlowGraph:
 
             # Looping edges have already been classified, so use those when
             # we can.
-            if edge.kind in ("looping", "self-loop"):
+            if edge.kind in (EdgeKind.LOOPING, EdgeKind.SELF_LOOP):
                 edge.scoping_kind = ScopeEdgeKind.Looping
                 continue
             source_block = edge.source.bb
@@ -272,22 +520,40 @@ class ControlFlowGraph:
                 # "if ... <falltrough after end> end" or
                 # "while ... break <jump to end> ... end
                 edge.scoping_kind = ScopeEdgeKind.Join
-                target_block.flags.add(BB_JOIN_POINT)
+                target_block.add_flag(BB_JOIN_POINT)
             pass
         return
 
     def get_node(self, offset: int) -> Node:
+        """Return the node of the basic block containing instruction
+        `offset`."""
         block = self.offset2block.get(offset, None)
         if block is not None:
             return block
 
-        block = self.offset2block_sorted[0]
+        # The block containing `offset` is the last one that starts at
+        # or before it.
+        i = bisect_right(self.block_starts, offset) - 1
+        return self.block_start_nodes[max(i, 0)]
 
-        # FIXME: use binary search
-        for _, block in self.offset2block_sorted:
-            if block.bb.start_offset <= offset <= block.bb.end_offset:
-                break
-            pass
-        # Cache result computed
-        self.offset2block[offset] = block
-        return block
+    def get_nodes(self, offsets: Iterable[int]) -> List[Node]:
+        """Return the list of nodes of the basic blocks containing
+        each of the instruction offsets in `offsets`.
+
+        When `offsets` is in increasing order, as when asking about
+        every instruction of a code object, this is done in a single
+        merge pass over the block start offsets.
+        """
+        starts = self.block_starts
+        start_nodes = self.block_start_nodes
+        last = len(starts) - 1
+        i = 0
+        nodes = []
+        for offset in offsets:
+            if offset < starts[i]:
+                # Out of order. Look it up from scratch.
+                i = max(bisect_right(starts, offset) - 1, 0)
+            while i < last and starts[i + 1] <= offset:
+                i += 1
+            nodes.append(start_nodes[i])
+        return nodes
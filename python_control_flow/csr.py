@@ -0,0 +1,183 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+Compressed-sparse-row (CSR) adjacency for a control-flow graph.
+
+Nodes are dense integer ids, which for a control-flow graph are
+basic-block numbers. The successors of all nodes are stored in one
+integer array, ordered by source node, and an index array gives where
+each node's successors start. Predecessors are stored the same way.
+Alongside each target array there is a parallel array of edge-kind
+codes, which are graph.EdgeKind values.
+
+Graph algorithms like dominators and traversals only need to ask for
+the successors or predecessors of a node id. Those are then slices of
+a contiguous array, rather than Python sets of objects.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, chain, repeat
+from operator import sub
+from typing import Iterable, Sequence, Tuple
+
+
+class CSRRows:
+    """One direction of a CSR adjacency: row `i` is
+    ``targets[index[i]:index[i + 1]]``, and the kinds of those edges
+    are ``kinds[index[i]:index[i + 1]]``.
+
+    ``rows[i]`` is row `i`, so a CSRRows can be used wherever a list of
+    per-node target lists is expected.
+    """
+
+    __slots__ = ("index", "targets", "kinds")
+
+    def __init__(self, index: array, targets: array, kinds: array):
+        self.index = index
+        self.targets = targets
+        self.kinds = kinds
+
+    def __getitem__(self, i: int) -> array:
+        return self.targets[self.index[i] : self.index[i + 1]]
+
+    def __len__(self) -> int:
+        return len(self.index) - 1
+
+    def kinds_of(self, i: int) -> array:
+        """Return the edge-kind codes of row `i`."""
+        return self.kinds[self.index[i] : self.index[i + 1]]
+
+    def insert(self, i: int, target: int, kind: int):
+        """Add `target`, with edge-kind code `kind`, to row `i`, keeping
+        the row in increasing order. Only the entries after row `i`
+        move, and only the row boundaries after it change."""
+        index = self.index
+        j = bisect_left(self.targets, target, index[i], index[i + 1])
+        self.targets.insert(j, target)
+        self.kinds.insert(j, kind)
+        for k in range(i + 1, len(index)):
+            index[k] += 1
+
+
+class CSRGraph:
+    """A directed graph on nodes 0..`num_nodes`-1 in CSR form, with
+    both forward (successor) and reverse (predecessor) rows.
+
+    `edges` is an iterable of (source, dest, kind code) triples. Within
+    a row, targets are in increasing order.
+    """
+
+    __slots__ = ("num_nodes", "forward", "reverse")
+
+    def __init__(self, num_nodes: int, edges: Iterable[Tuple[int, int, int]] = ()):
+        self.num_nodes = num_nodes
+        edges = sorted(edges)
+        self.forward = _build_rows(num_nodes, edges, 0, 1)
+        # `edges` is sorted by source, so each reverse row is too.
+        self.reverse = _build_rows(num_nodes, edges, 1, 0)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Tuple[int, int]]]) -> "CSRGraph":
+        """Return the graph whose node `i` has the successors given in
+        `rows[i]` as (dest, kind code) pairs in increasing dest order.
+
+        This avoids the sort that the constructor does, so it is the
+        cheaper way to build a graph when the successors of each node
+        are already known.
+        """
+        num_nodes = len(rows)
+        graph = cls.__new__(cls)
+        graph.num_nodes = num_nodes
+        index = array("i", [0])
+        index.extend(accumulate(map(len, rows)))
+        targets = array("i", [dest for row in rows for dest, _ in row])
+        kinds = array("b", [kind for row in rows for _, kind in row])
+        graph.forward = forward = CSRRows(index, targets, kinds)
+        graph.reverse = _reverse_rows(num_nodes, forward)
+        return graph
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.forward.targets)
+
+    def add_edge(self, source: int, dest: int, kind: int):
+        """Add an edge from `source` to `dest` with edge-kind code
+        `kind`. This changes the graph in place, along with any
+        reversed() view of it; nothing else is rebuilt."""
+        self.forward.insert(source, dest, kind)
+        self.reverse.insert(dest, source, kind)
+
+    def successors(self, i: int) -> array:
+        return self.forward[i]
+
+    def predecessors(self, i: int) -> array:
+        return self.reverse[i]
+
+    def reversed(self) -> "CSRGraph":
+        """Return the graph with all edges reversed. This is a view
+        sharing this graph's arrays; nothing is copied."""
+        view = CSRGraph.__new__(CSRGraph)
+        view.num_nodes = self.num_nodes
+        view.forward = self.reverse
+        view.reverse = self.forward
+        return view
+
+    def edges(self) -> Iterable[Tuple[int, int, int]]:
+        """Yield all (source, dest, kind code) triples in source order."""
+        forward = self.forward
+        targets, kinds = forward.targets, forward.kinds
+        for source in range(self.num_nodes):
+            for j in range(forward.index[source], forward.index[source + 1]):
+                yield source, targets[j], kinds[j]
+
+
+def _build_rows(
+    num_nodes: int, edges: list, from_field: int, to_field: int
+) -> CSRRows:
+    """Build CSR rows keyed by field `from_field` of each edge triple
+    with targets from field `to_field`, using a counting sort."""
+    index = array("i", [0]) * (num_nodes + 1)
+    for edge in edges:
+        index[edge[from_field] + 1] += 1
+    for i in range(num_nodes):
+        index[i + 1] += index[i]
+
+    targets = array("i", [0]) * len(edges)
+    kinds = array("b", [0]) * len(edges)
+    fill = array("i", index[:num_nodes])
+    for edge in edges:
+        row = edge[from_field]
+        j = fill[row]
+        targets[j] = edge[to_field]
+        kinds[j] = edge[2]
+        fill[row] = j + 1
+    return CSRRows(index, targets, kinds)
+
+
+def _reverse_rows(num_nodes: int, forward: CSRRows) -> CSRRows:
+    """Build the reverse rows of `forward` with a counting sort. Since
+    `forward` is in source order, each reverse row is too."""
+    forward_index, forward_targets, forward_kinds = (
+        forward.index,
+        forward.targets,
+        forward.kinds,
+    )
+    index = array("i", [0]) * (num_nodes + 1)
+    for dest in forward_targets:
+        index[dest + 1] += 1
+    index = array("i", accumulate(index))
+
+    targets = array("i", [0]) * len(forward_targets)
+    kinds = array("b", [0]) * len(forward_targets)
+    fill = index[:num_nodes]
+    # The source of each forward edge: each node, repeated for as many
+    # successors as it has.
+    sources = chain.from_iterable(
+        map(repeat, range(num_nodes), map(sub, forward_index[1:], forward_index[:-1]))
+    )
+    for source, dest, kind in zip(sources, forward_targets, forward_kinds):
+        k = fill[dest]
+        targets[k] = source
+        kinds[k] = kind
+        fill[dest] = k + 1
+    return CSRRows(index, targets, kinds)
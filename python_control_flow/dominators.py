@@ -7,16 +7,58 @@ Copyright (c) 2017-2018, 2021, 2023-2025 by Rocky Bernstein
 Copyright (c) 2014 by Romain Gaucher (@rgaucher)
 """
 
+from array import array
+from collections.abc import Set as AbstractSet
+from typing import Iterable, List, Optional, Tuple
+
 from python_control_flow.bb import BasicBlock
-from python_control_flow.graph import TreeGraph
-from python_control_flow.traversals import dfs_postorder_nodes
+from python_control_flow.bitset import BlockSet
+from python_control_flow.graph import EdgeKind, Node, TreeGraph
+from python_control_flow.traversals import reverse_postorder_nodes
+
+
+class DominatorSet(AbstractSet):
+    """The set of dominator-tree nodes in a subtree of a dominator
+    tree, possibly excluding the subtree root.
+
+    This is a view: nothing is materialized when it is created. In a
+    preorder numbering of the tree, the nodes of a subtree have
+    consecutive numbers, so the set is just the range of preorder
+    numbers [start, stop) in the tree. Membership is a couple of
+    integer comparisons. Set operations like "-" and "|" return a
+    plain ``set``.
+    """
+
+    __slots__ = ("tree", "start", "stop")
+
+    def __init__(self, tree: TreeGraph, start: int, stop: int):
+        self.tree = tree
+        self.start = start
+        self.stop = stop
+
+    @classmethod
+    def _from_iterable(cls, iterable) -> set:
+        return set(iterable)
+
+    def __contains__(self, node) -> bool:
+        if not isinstance(node, Node):
+            return False
+        dom_in = self.tree.number2dom_in.get(node.number, UNDEFINED)
+        return self.start <= dom_in < self.stop
 
+    def __iter__(self):
+        preorder = self.tree.preorder
+        return (preorder[i] for i in range(self.start, self.stop))
+
+    def __len__(self) -> int:
+        return self.stop - self.start
 
-class DominatorSet(set):
     def __str__(self) -> str:
-        sorted_set = {dom.bb.number for dom in sorted(self)}
+        sorted_set = {dom.bb.number for dom in self}
         return f"DominatorSet<{sorted_set}>"
 
+    __repr__ = __str__
+
 
 class DominatorTree:
     """Handles the dominator trees, dominator, post-dominator
@@ -24,20 +66,28 @@ class DominatorTree:
     frontier.
     """
 
-    def __init__(self, cfg, debug=False):
+    def __init__(self, cfg, debug=False, algorithm: str = "auto"):
+        if algorithm not in DOMINATOR_ALGORITHMS:
+            raise ValueError(
+                f"Unknown dominator algorithm {algorithm!r}; "
+                f"expecting one of {', '.join(DOMINATOR_ALGORITHMS)}"
+            )
         self.cfg = cfg
         self.debug = debug
+        self.algorithm = algorithm
         self.root = cfg.entry_node
         self.max_nesting_depth = -1
         self.build()
-        cfg.dom_tree = self.build_dom_tree()
-        dfs_forest(cfg.dom_tree)
-        cfg.graph.max_nesting = cfg.max_nesting_depth = cfg.dom_tree.max_nesting
-        build_dom_set(cfg.dom_tree, debug)
+        # The dominator tree as a graph of nodes.
+        self.tree = self.build_dom_tree()
+        cfg.dom_tree = self
+        dfs_forest(self.tree)
+        cfg.graph.max_nesting = cfg.max_nesting_depth = self.tree.max_nesting
+        build_dom_set(self.tree, debug, cfg.use_bitsets)
 
     @classmethod
-    def compute_dominators_in_cfg(cls, cfg, debug):
-        return DominatorTree(cfg, debug)
+    def compute_dominators_in_cfg(cls, cfg, debug, algorithm: str = "auto"):
+        return DominatorTree(cfg, debug, algorithm)
 
     def build(self):
         entry = self.cfg.entry_node
@@ -46,127 +96,80 @@ class DominatorTree:
         self.df = {}  # dominator frontier
 
         self.build_dominators(entry)
+        self.build_dominance_frontiers()
 
     def build_dominators(self, entry):
         """
         Builds the dominator tree based on:
           http://www.cs.rice.edu/~keith/Embed/dom.pdf
 
-        """
-        doms = self.doms
-        doms[entry] = entry
-        post_order = dfs_postorder_nodes(entry)
-
-        post_order_number = {}
-        for i, n in enumerate(post_order):
-            post_order_number[n] = i
-
-        def intersec(b1, b2):
-            finger1 = b1
-            finger2 = b2
-            po_finger1 = post_order_number[finger1]
-            # FIXME: if finger2 isn't in post_order_number, why not?
-            if finger2 in post_order_number:
-                po_finger2 = post_order_number[finger2]
-                while po_finger1 != po_finger2:
-                    no_solution = False
-                    while po_finger1 < po_finger2:
-                        finger1 = doms.get(finger1, None)
-                        if finger1 is None:
-                            no_solution = True
-                            break
-                        po_finger1 = post_order_number[finger1]
-                        pass
-                    while po_finger2 < po_finger1:
-                        finger2 = doms.get(finger2, None)
-                        try:
-                            po_finger2 = post_order_number[finger2]
-                        except Exception:
-                            no_solution = True
-                            break
-                        if finger2 is None:
-                            no_solution = True
-                            break
-                        pass
-                    if no_solution:
-                        break
-
-            return finger1
-
-        changed = True
-
-        while changed:
-            changed = False
-            order = post_order if reversed(post_order) else post_order
-            for b in order:
-                # Skip start node which doesn't have a predecessor
-                # and was initialized above.
-                if b == entry:
-                    continue
+        The computation is done on dense integer block ids, which are
+        basic-block numbers. The immediate dominator of block number
+        `i` is stored in `self.idom[i]`. From that we fill out
+        `self.doms`, the map from a basic block to its immediate
+        dominator.
 
-                new_idom = None
-                # Find a processed predecessor.
-                # We want to order predecessors by closeness to
-                # "b" the node we are computing a dominator from.
-                # For dominators this is the number that is closest
-                # and less than b.number.
-                # For post dominators  it is the number that is closest
-                # and greater than b.number.
-                # Sorting also gives deterministic results.
-                predecessors = sorted(
-                    [
-                        p
-                        for p in b.predecessors
-                        if post_order_number.get(p, -1) > post_order_number[b]
-                    ],
-                    key=lambda p: p.number,
-                    reverse=True,
-                )
+        Successors and predecessors come from the CFG's CSR adjacency,
+        whose rows are sorted, which gives deterministic results.
+        The reverse postorder is the one cached on the CFG.
+        """
+        cfg = self.cfg
+        blocks = cfg.blocks
+        csr = cfg.csr
+        successors = csr.forward
+        predecessors = csr.reverse
+        if entry is cfg.entry_node:
+            rpo = cfg.rpo
+        else:
+            rpo = reverse_postorder_nodes(entry.number, successors.__getitem__)
+
+        # The number of passes is kept so that it can be reported.
+        self.idom, self.passes, self.algorithm_used = compute_idoms(
+            successors,
+            predecessors,
+            entry.number,
+            rpo,
+            self.algorithm,
+            cfg.known_reducible if entry is cfg.entry_node else None,
+        )
 
-                # If no predecessors, then nothing to do here.
-                if len(predecessors) == 0:
-                    continue
+        doms = self.doms
+        idom = self.idom
+        for i in rpo:
+            doms[blocks[i]] = blocks[idom[i]]
+        return
 
-                new_idom = next(iter(predecessors))
-                for p in predecessors:
-                    if p == new_idom:
-                        continue
-                    if p in doms:
-                        new_idom = intersec(p, new_idom)
-                        if new_idom is not None:
-                            # We found the closest predecessor
-                            break
-                    pass
-
-                if b not in doms or doms[b] != new_idom:
-                    if b in doms:
-                        b_number = doms[b].number
-                        new_idom_number = new_idom.number
-                        do_update = b_number > new_idom_number
-                    else:
-                        do_update = True
-                    if do_update:
-                        # if self.debug:
-                        #     name = "dominator"
-                        #     print(
-                        #         f"debug: {name}[{b.number}] is "
-                        #         "{None if new_idom is None else new_idom.number}"
-                        #     )
-
-                        doms[b] = new_idom
-                        changed = True
-                        pass
-                    pass
-                pass
-            pass
+    def build_dominance_frontiers(self):
+        """Fill in `self.frontiers`, the dominance frontier of each
+        block number as a list of block numbers, and `self.df`, the map
+        from a reachable basic block to the list of basic blocks in its
+        dominance frontier. See compute_dominance_frontiers().
+        """
+        blocks = self.cfg.blocks
+        self.frontiers = compute_dominance_frontiers(self.cfg.csr.reverse, self.idom)
+        df = self.df
+        for block in self.doms:
+            df[block] = [blocks[i] for i in self.frontiers[block.number]]
         return
 
+    def iterated_frontier(self, blocks: Iterable[BasicBlock]) -> List[BasicBlock]:
+        """Return the iterated dominance frontier of basic blocks
+        `blocks`, in block-number order. For a variable assigned in
+        `blocks`, these are the blocks where its versions merge.
+        """
+        cfg_blocks = self.cfg.blocks
+        return [
+            cfg_blocks[i]
+            for i in iterated_dominance_frontier(
+                self.frontiers, (block.number for block in blocks)
+            )
+        ]
+
     def build_dom_tree(self) -> TreeGraph:
         """Computes and return a dominator tree"""
-        t_nodes = {}
 
         # We sort dominators to give deterministic results.
-        edge_type = "dom-edge"
+        edge_type = EdgeKind.DOM_EDGE
         doms_list = sorted(self.doms, key=lambda x: x.number, reverse=True)
         doms = self.doms
 
@@ -174,52 +177,475 @@ class DominatorTree:
         t = TreeGraph(root)
 
         for node in doms_list:
-            if node not in t_nodes:
-                cur_node = t.make_add_node(node)
-                t_nodes[node] = cur_node
-            cur_node = t_nodes[node]
+            cur_node = t.make_add_node(node)
 
             parent = doms.get(node, None)
             if parent is not None and parent != node:
-                if parent not in t_nodes:
-                    parent_node = t.make_add_node(parent)
-                    t_nodes[parent] = parent_node
-                parent_node = t_nodes[parent]
+                parent_node = t.make_add_node(parent)
                 t.make_add_edge(parent_node, cur_node, edge_type)
                 pass
             pass
         return t
 
-    def offset_dominates(self, start_offset: int) -> bool:
+    def offset_dominates(self, start_offset: int, end_offset: int) -> bool:
+        """Return True if the basic block containing `start_offset`
+        dominates the basic block containing `end_offset`.
+        """
         cfg = self.cfg
-        start_block = cfg.get_block(start_offset)
-        end_block = cfg.get_block(start_offset)
-        # FIXME: is this right
-        return start_block in end_block.doms
+        start_block = cfg.get_node(start_offset).bb
+        end_block = cfg.get_node(end_offset).bb
+        return dominates(start_block, end_block, proper=False)
 
 
-def build_dom_set(t, debug=False):
-    """Makes the dominator set for each node in the tree"""
-    seen = DominatorSet()
-    for node in t.nodes:
-        if node not in seen:
-            seen.add(node)
-            build_dom_set1(node, debug)
-            pass
-        pass
+class PostDominatorTree:
+    """Immediate post-dominators and the post-dominator tree of a
+    control-flow graph.
 
+    Post-dominators are the dominators of the reversed graph, rooted at
+    the exit block. They are computed with the same engines as
+    DominatorTree, on ``cfg.csr.reversed()``, which is a view of the
+    CFG's CSR adjacency, not a copy.
 
-def build_dom_set1(node, debug=False):
-    """Build dominator sets from dominator node"""
+    The immediate post-dominator of block number `i` is `self.idom[i]`,
+    an ``array("i")``; it is UNDEFINED for a block that can't reach
+    the exit block. Each block that can gets a `pdom_set`: the nodes
+    of the post-dominator tree of the blocks it properly
+    post-dominates.
+    """
 
-    node.bb.dom_set = DominatorSet(node.bb.doms)
+    def __init__(self, cfg, debug=False, algorithm: str = "auto"):
+        if algorithm not in DOMINATOR_ALGORITHMS:
+            raise ValueError(
+                f"Unknown dominator algorithm {algorithm!r}; "
+                f"expecting one of {', '.join(DOMINATOR_ALGORITHMS)}"
+            )
+        self.cfg = cfg
+        self.debug = debug
+        self.algorithm = algorithm
+        self.root = cfg.exit_node
+        self.pdoms = {}  # map of a basic block to its immediate post-dominator
+        self.build_post_dominators()
+        # The post-dominator tree as a graph of nodes.
+        self.tree = self.build_pdom_tree()
+        self.build_pdom_set()
+
+    def build_post_dominators(self):
+        """Compute `self.idom` and `self.pdoms`. The successors of the
+        reversed graph are the CFG's predecessors, and the other way
+        around."""
+        blocks = self.cfg.blocks
+        reverse = self.cfg.csr.reversed()
+        successors = reverse.forward
+        exit_number = self.root.number
+        rpo = reverse_postorder_nodes(exit_number, successors.__getitem__)
+        idom, self.passes, self.algorithm_used = compute_idoms(
+            successors, reverse.reverse, exit_number, rpo, self.algorithm
+        )
+        self.idom = array("i", idom)
+
+        pdoms = self.pdoms
+        for i in rpo:
+            pdoms[blocks[i]] = blocks[idom[i]]
+        return
+
+    def build_pdom_tree(self) -> TreeGraph:
+        """Computes and return a post-dominator tree"""
+        edge_type = EdgeKind.PDOM_EDGE
+        pdoms = self.pdoms
+        t = TreeGraph(self.root)
+        for block in sorted(pdoms, key=lambda x: x.number, reverse=True):
+            cur_node = t.make_add_node(block)
+            parent = pdoms[block]
+            if parent is not block:
+                t.make_add_edge(t.make_add_node(parent), cur_node, edge_type)
+        return t
 
-    for child in node.children:
-        build_dom_set1(child, debug)
-        node.bb.dom_set |= child.bb.dom_set
-    # We want only proper/non-trivial dominators, so remove `node` from the
-    # set.
-    node.bb.dom_set.remove(node)
+    def build_pdom_set(self):
+        """Number the post-dominator tree in preorder, and set the
+        `pdom_set` view of each block and tree node.
+
+        Unlike dfs_forest(), this leaves the dominator information on
+        the basic blocks alone: the preorder intervals are kept in
+        `self.pdom_in` and `self.pdom_out`, indexed by block number.
+        """
+        t = self.tree
+        num_blocks = len(self.cfg.blocks)
+        self.pdom_in = pdom_in = array("i", [UNDEFINED]) * num_blocks
+        self.pdom_out = pdom_out = array("i", [UNDEFINED]) * num_blocks
+        preorder = t.preorder = []
+        number2dom_in = t.number2dom_in = {}
+
+        root_node = t.bb2node.get(t.root)
+        if root_node is None:
+            return
+
+        def enter(node):
+            node.dom_in = pdom_in[node.bb.number] = len(preorder)
+            number2dom_in[node.number] = node.dom_in
+            preorder.append(node)
+
+        enter(root_node)
+        stack = [(root_node, iter(sorted(root_node.children)))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                enter(child)
+                stack.append((child, iter(sorted(child.children))))
+                break
+            else:
+                stack.pop()
+                node.dom_out = pdom_out[node.bb.number] = len(preorder) - 1
+                # Only proper post-dominators, as with dom_set.
+                node.bb.pdom_set = node.pdom_set = DominatorSet(
+                    t, node.dom_in + 1, node.dom_out + 1
+                )
+        return
+
+    def post_dominates(self, bb1: BasicBlock, bb2: BasicBlock, proper=True) -> bool:
+        """Return true if bb1 post-dominates bb2: every path from bb2
+        to the exit block goes through bb1."""
+        pdom_in = self.pdom_in
+        in2 = pdom_in[bb2.number]
+        in1 = pdom_in[bb1.number]
+        if in1 == UNDEFINED or in2 == UNDEFINED:
+            return False
+        if proper and bb1 is bb2:
+            return False
+        return in1 <= in2 <= self.pdom_out[bb1.number]
+
+
+# Value in an immediate-dominator array for a block that is not
+# reachable from the entry, and so has no dominator.
+UNDEFINED = -1
+
+# Dominator algorithms that can be selected in DominatorTree.
+# "auto" selects "snca" for graphs with at least SNCA_BLOCK_THRESHOLD
+# reachable blocks, and "chk" otherwise.
+DOMINATOR_ALGORITHMS = ("auto", "chk", "snca")
+
+# The iterative algorithm is simple and fast on small, reducible
+# graphs. On larger graphs, and on irreducible ones which
+# need more passes, semi-NCA is faster.
+SNCA_BLOCK_THRESHOLD = 500
+
+
+def compute_idoms(
+    successors,
+    predecessors,
+    entry: int,
+    rpo,
+    algorithm: str = "auto",
+    reducible: Optional[bool] = None,
+) -> Tuple[List[int], int, str]:
+    """Compute the immediate-dominator array of the graph given by
+    `successors` and `predecessors` from block `entry`, whose reverse
+    postorder is `rpo`, with dominator algorithm `algorithm`.
+    `reducible` is passed on to compute_idoms_chk().
+
+    The return value is the immediate-dominator array, the number of
+    passes made, and the algorithm used, which is "auto" resolved.
+    """
+    if algorithm == "auto":
+        algorithm = "snca" if len(rpo) >= SNCA_BLOCK_THRESHOLD else "chk"
+    if algorithm == "snca":
+        return compute_idoms_snca(successors, predecessors, entry), 1, algorithm
+    idom, passes = compute_idoms_chk(predecessors, rpo, reducible)
+    return idom, passes, algorithm
+
+
+def compute_idoms_chk(
+    predecessors: list, rpo: list, reducible: Optional[bool] = None
+) -> Tuple[List[int], int]:
+    """Compute immediate dominators using the Cooper, Harvey and
+    Kennedy iterative algorithm, "A Simple, Fast Dominance Algorithm".
+
+    Blocks are dense integer ids. `predecessors[i]` is the list of
+    predecessors of block `i`, and `rpo` lists the blocks reachable from
+    the entry block in reverse postorder. The entry block is `rpo[0]`.
+
+    The return value is the immediate-dominator array, `idom`, and the
+    number of passes made over the blocks. `idom[entry]` is `entry`
+    and `idom[i]` is UNDEFINED for a block `i` that is not reachable.
+
+    The first pass, in reverse postorder, sees only the edges that go
+    forward in that order. When the graph is reducible, the target of
+    every other edge dominates its source, and those edges don't change
+    any dominators, so the first pass gets the final result.
+    `reducible` says whether the graph is known to be reducible; the
+    other passes are then skipped when it is True, and made when it is
+    False. When it is None, the edges are checked after the first pass,
+    which takes much less time than a pass.
+    """
+    n = len(predecessors)
+    idom = [UNDEFINED] * n
+    if not rpo:
+        return idom, 0
+
+    rpo_number = [UNDEFINED] * n
+    for i, b in enumerate(rpo):
+        rpo_number[b] = i
+
+    # Order each block's reachable predecessors once, up front, by
+    # reverse-postorder number. The first predecessor is then always
+    # processed before the block is, even on the first pass.
+    ordered_predecessors = [
+        sorted(
+            (p for p in predecessors[b] if rpo_number[p] != UNDEFINED),
+            key=rpo_number.__getitem__,
+        )
+        for b in rpo
+    ]
+
+    entry = rpo[0]
+    idom[entry] = entry
+    passes = 0
+    changed = True
+    while changed:
+        changed = False
+        passes += 1
+        for i in range(1, len(rpo)):
+            b = rpo[i]
+            new_idom = UNDEFINED
+            for p in ordered_predecessors[i]:
+                if idom[p] == UNDEFINED:
+                    # Not processed yet.
+                    continue
+                if new_idom == UNDEFINED:
+                    new_idom = p
+                    continue
+                # Intersect: walk up the dominator tree from both
+                # fingers until they meet.
+                finger1, finger2 = p, new_idom
+                while finger1 != finger2:
+                    while rpo_number[finger1] > rpo_number[finger2]:
+                        finger1 = idom[finger1]
+                    while rpo_number[finger2] > rpo_number[finger1]:
+                        finger2 = idom[finger2]
+                new_idom = finger1
+            if idom[b] != new_idom:
+                idom[b] = new_idom
+                changed = True
+        if passes == 1 and (
+            reducible
+            or reducible is None
+            and _retreating_edges_dominated(predecessors, rpo, rpo_number, idom)
+        ):
+            break
+    return idom, passes
+
+
+def _retreating_edges_dominated(predecessors, rpo, rpo_number, idom) -> bool:
+    """Return True if, for each edge going backward in reverse postorder
+    `rpo`, the target dominates the source according to `idom`."""
+    for b in rpo:
+        b_number = rpo_number[b]
+        for p in predecessors[b]:
+            p_number = rpo_number[p]
+            if p_number < b_number:
+                # A forward edge, or p is not reachable
+                continue
+            # Walk up the dominator tree from p to the depth of b.
+            while p_number > b_number:
+                p = idom[p]
+                p_number = rpo_number[p]
+            if p != b:
+                return False
+    return True
+
+
+def compute_idoms_snca(successors: list, predecessors: list, entry: int) -> List[int]:
+    """Compute immediate dominators using the semi-NCA algorithm
+    described in Georgiadis, Tarjan and Werneck, "Finding Dominators in
+    Practice". It is a variant of Lengauer-Tarjan that computes
+    semidominators the same way, and then finds each immediate
+    dominator as a nearest common ancestor in the depth-first spanning
+    tree. It runs in near-linear time regardless of graph shape.
+
+    Blocks are dense integer ids; `successors[i]` and
+    `predecessors[i]` are the successors and predecessors of block `i`.
+    The return value is the immediate-dominator array, in the same form
+    as compute_idoms_chk() returns.
+    """
+    n = len(successors)
+    idom_result = [UNDEFINED] * n
+
+    # Depth-first spanning tree. Below, blocks are referred to by their
+    # preorder number, and `vertex` maps a preorder number back to a
+    # block.
+    dfnum = [UNDEFINED] * n
+    vertex = [entry]
+    parent = [UNDEFINED]
+    dfnum[entry] = 0
+    stack = [(0, iter(successors[entry]))]
+    while stack:
+        v, children = stack[-1]
+        for child in children:
+            if dfnum[child] == UNDEFINED:
+                w = len(vertex)
+                dfnum[child] = w
+                vertex.append(child)
+                parent.append(v)
+                stack.append((w, iter(successors[child])))
+                break
+        else:
+            stack.pop()
+
+    count = len(vertex)
+    semi = list(range(count))
+    label = list(range(count))
+    ancestor = [UNDEFINED] * count
+
+    # Compute semidominators in reverse preorder. `ancestor` is the
+    # forest of already processed vertices; eval, below, finds the
+    # vertex with the smallest semidominator on a forest path, with
+    # path compression done using an explicit path list rather
+    # than recursion.
+    for w in range(count - 1, 0, -1):
+        semi_w = semi[w]
+        for p in predecessors[vertex[w]]:
+            v = dfnum[p]
+            if v == UNDEFINED:
+                # Not reachable from the entry
+                continue
+            if ancestor[v] != UNDEFINED:
+                # eval(v)
+                path = []
+                u = v
+                while ancestor[ancestor[u]] != UNDEFINED:
+                    path.append(u)
+                    u = ancestor[u]
+                for u in reversed(path):
+                    a = ancestor[u]
+                    if semi[label[a]] < semi[label[u]]:
+                        label[u] = label[a]
+                    ancestor[u] = ancestor[a]
+                v = label[v]
+            if semi[v] < semi_w:
+                semi_w = semi[v]
+        semi[w] = semi_w
+        ancestor[w] = parent[w]
+
+    # The immediate dominator of w is the nearest common ancestor of
+    # w's parent and semidominator in the dominator tree built so far.
+    # Processing vertices in preorder ensures all of w's ancestors
+    # have their final immediate dominator.
+    idom = parent[:]
+    idom[0] = 0
+    for w in range(1, count):
+        x = idom[w]
+        while x > semi[w]:
+            x = idom[x]
+        idom[w] = x
+
+    for w in range(count):
+        idom_result[vertex[w]] = vertex[idom[w]]
+    return idom_result
+
+
+def compute_dominance_frontiers(predecessors, idom) -> List[List[int]]:
+    """Compute the dominance frontier of each block from the
+    immediate-dominator array `idom`, by the walk from Cooper, Harvey
+    and Kennedy, "A Simple, Fast Dominance Algorithm", which gives the
+    same result as Cytron et al.
+
+    `predecessors[i]` are the predecessors of block `i`. For each block
+    `b`, the walk goes up the dominator tree from each predecessor of
+    `b` until reaching `idom[b]`, adding `b` to the frontier of each
+    block passed. The time taken is linear in the size of the
+    frontiers.
+
+    The return value lists the frontier of each block in increasing
+    block order. It is empty for unreachable blocks.
+    """
+    n = len(idom)
+    frontiers: List[List[int]] = [[] for _ in range(n)]
+    for b in range(n):
+        b_idom = idom[b]
+        if b_idom == UNDEFINED:
+            continue
+        for runner in predecessors[b]:
+            if idom[runner] == UNDEFINED:
+                # Not reachable from the entry
+                continue
+            while runner != b_idom or runner == b:
+                frontier = frontiers[runner]
+                # Blocks are added in increasing order, so a block
+                # already added is the last one.
+                if frontier and frontier[-1] == b:
+                    break
+                frontier.append(b)
+                if idom[runner] == runner:
+                    # The entry block
+                    break
+                runner = idom[runner]
+    return frontiers
+
+
+def iterated_dominance_frontier(frontiers: list, blocks: Iterable[int]) -> List[int]:
+    """Return the iterated dominance frontier of the block numbers
+    `blocks`, in increasing order, given the dominance `frontiers` of
+    each block as computed by compute_dominance_frontiers().
+
+    This is the limit of DF(S), DF(S | DF(S)), ... and the standard
+    placement of phi functions for a variable assigned in `blocks`.
+    """
+    in_result = bytearray(len(frontiers))
+    worklist = list(blocks)
+    result = []
+    while worklist:
+        for y in frontiers[worklist.pop()]:
+            if not in_result[y]:
+                in_result[y] = 1
+                result.append(y)
+                worklist.append(y)
+    result.sort()
+    return result
+
+
+def build_dom_set(t, debug=False, use_bitsets: bool = False):
+    """Makes the dominator set for each node in the tree.
+
+    The dominator sets are views over the preorder numbering computed
+    in dfs_forest(), so this takes constant time per node.
+
+    If `use_bitsets` is True, the dominator sets, and the `doms` sets
+    computed in dfs_forest(), are instead replaced by ``BlockSet``
+    bitsets indexed by node number.
+    """
+    if use_bitsets:
+        build_dom_bitsets(t)
+        return
+
+    for node in t.nodes:
+        dom_in = node.bb.dom_in
+        if dom_in == UNDEFINED:
+            continue
+        # We want only proper/non-trivial dominators, so leave `node`
+        # out of the set.
+        node.bb.dom_set = DominatorSet(t, dom_in + 1, node.bb.dom_out + 1)
+        pass
+    return
+
+
+def build_dom_bitsets(t):
+    """Makes `doms` and `dom_set` bitsets for each node in the
+    tree. A node's `doms` bitset is its own bit or'd with those of its
+    children, which are computed first by going through the tree in
+    reverse preorder.
+    """
+    preorder = t.preorder
+    if not preorder:
+        return
+    universe = [None] * (max(node.number for node in preorder) + 1)
+    for node in preorder:
+        universe[node.number] = node
+
+    for node in reversed(preorder):
+        bits = 1 << node.number
+        for child in node.children:
+            bits |= child.doms.bits
+        node.bb.doms = node.doms = BlockSet(universe, bits=bits)
+        node.bb.dom_set = BlockSet(universe, bits=bits & ~(1 << node.number))
     return
 
 
@@ -227,54 +653,84 @@ def build_dom_set1(node, debug=False):
 # which builds the dominator tree.
 def dfs_forest(t):
     """
-    Builds data flow graph using Depth-First search.
+    Walks the dominator tree depth first, computing for each node its
+    nesting depth, its reach offset, and the interval of preorder
+    numbers of its subtree. A node with preorder number `dom_in`
+    dominates exactly the nodes whose preorder numbers are in
+    [dom_in, dom_out]; `dom_out` is the largest preorder number in
+    the subtree.
     """
 
-    def dfs(seen, node, nesting_depth: int):
-        # print("XXX", node, nesting_depth)
-        if node in seen:
-            return
+    preorder = t.preorder = []
+    number2dom_in = t.number2dom_in = {}
+
+    def enter(node, nesting_depth: int):
         if nesting_depth > t.max_nesting:
             t.max_nesting = nesting_depth
         node.bb.nesting_depth = nesting_depth
-        seen.add(node)
-        node.bb.doms = node.doms = DominatorSet([node])
+        node.bb.dom_in = node.dom_in = len(preorder)
+        number2dom_in[node.number] = node.dom_in
+        preorder.append(node)
         node.bb.reach_offset = node.reach_offset = node.bb.end_offset
-        # print(f"XXX1: {node.bb} reach_offset set to {node.bb.end_offset}")
-
-        for n in node.children:
-            dfs(seen, n, nesting_depth + 1)
-            node.doms |= n.doms
-            node.bb.doms |= node.doms
-            if node.reach_offset < n.reach_offset:
-                # print(f"XXX1: {node.bb} reach_offset set to {n.reach_offset}")
-                node.bb.reach_offset = node.reach_offset = n.reach_offset
-                pass
+
+    def leave(node):
+        node.bb.dom_out = node.dom_out = len(preorder) - 1
+        node.bb.doms = node.doms = DominatorSet(t, node.dom_in, node.dom_out + 1)
+
+    def leave_child(node, child):
+        if node.reach_offset < child.reach_offset:
+            node.bb.reach_offset = node.reach_offset = child.reach_offset
             pass
-        # print("node %d has children %s" %
-        #       (node.number, [n.number for n in node.children]))
+
+    def dfs(seen, root):
+        # An explicit stack of (node, children iterator) is used
+        # rather than recursion. The nesting depth of a node is
+        # the number of its ancestors on the stack.
+        if root in seen:
+            return
+        seen.add(root)
+        enter(root, 0)
+        stack = [(root, iter(root.children))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in seen:
+                    seen.add(child)
+                    enter(child, len(stack))
+                    stack.append((child, iter(child.children)))
+                    break
+            else:
+                stack.pop()
+                leave(node)
+                if stack:
+                    leave_child(stack[-1][0], node)
+        return
 
     seen = set([])
-    for node in t.nodes:
-        if node.bb == t.root:
-            root_node = node
-            break
-    else:
+    root_node = t.bb2node.get(t.root)
+    if root_node is None:
         raise RuntimeError("Root node not found in dominator tree")
 
-    dfs(seen, root_node, 0)
+    dfs(seen, root_node)
 
     for node in t.nodes:
         if node not in seen:
-            dfs(seen, node.bb, 0)
+            dfs(seen, node)
     return
 
 
 def dominates(bb1: BasicBlock, bb2: BasicBlock, proper=True) -> bool:
     """Return true if bb1 dominates bb2. In other words,
     bb2 is in bb1's dominator set.
+
+    This uses the preorder numbering of the dominator tree computed in
+    dfs_forest(), so it is just two integer comparisons.
     """
-    if proper:
-        return bb2 in bb1.dom_set
-    else:
-        return bb2 == bb1 or bb2 in bb1.dom_set
+    dom_in = bb2.dom_in
+    if dom_in == UNDEFINED or bb1.dom_in == UNDEFINED:
+        # Blocks not reachable from the entry dominate nothing
+        # and are dominated by nothing.
+        return False
+    if proper and bb1 is bb2:
+        return False
+    return bb1.dom_in <= dom_in <= bb1.dom_out
@@ -7,8 +7,11 @@
   :copyright: (c) 2014 by Romain Gaucher (@rgaucher)
 """
 
-from typing import Final, Optional, Tuple
+from bisect import bisect_right
+from types import GeneratorType
+from typing import Callable, Dict, Final, List, Optional, Sequence, Tuple
 from python_control_flow.bb import BasicBlock
+from python_control_flow.dominators import dominates
 from python_control_flow.graph import (
     DiGraph,
     BB_ENTRY,
@@ -18,6 +21,7 @@ from python_control_flow.graph import (
     BB_JUMP_TO_FALLTHROUGH,
     BB_JUMP_UNCONDITIONAL,
     BB_NOFOLLOW,
+    EdgeKind,
     ScopeEdgeKind,
     format_flags_with_width,
 )
@@ -57,12 +61,65 @@ flags_prefix: Final = "flags={"
 FEL: Final = len(flags_prefix)
 NODE_TEXT_WIDTH = 26 + FEL
 
+
+def sink_writer(sink) -> Callable[[str], object]:
+    """Return a function which sends a chunk of text to `sink`. A
+    sink can be anything with a ``write()`` method, like an open text
+    file; a list, to which chunks are appended; a generator, which is
+    started and then sent each chunk; or a function which is called
+    with each chunk.
+    """
+    if hasattr(sink, "write"):
+        return sink.write
+    if isinstance(sink, list):
+        return sink.append
+    if isinstance(sink, GeneratorType):
+        next(sink)
+        return sink.send
+    if callable(sink):
+        return sink
+    raise TypeError(f"cannot write DOT text to {type(sink).__name__}")
+
+
 class DotConverter:
-    def __init__(self, graph):
+    """Converts `graph` to dot format. The text is written a node or
+    edge at a time to `sink`; see sink_writer() for the kinds of sink
+    accepted. Without a sink, chunks are collected in a list and
+    process() joins them.
+
+    Graphs of thousands of blocks can take Graphviz a very long time
+    to lay out. To draw less, give `collapse_depth`, `node_budget` or
+    both. Then each dominator subtree rooted at a nesting depth is
+    drawn as a single summary node, where the depth is
+    `collapse_depth`, or the largest depth which keeps the number of
+    nodes drawn within `node_budget`, whichever is less. See
+    collapse().
+
+    Node ids start with `id_prefix`, so that the graphs of several
+    functions can go in one file; see process_module().
+    """
+
+    def __init__(
+        self,
+        graph,
+        sink=None,
+        collapse_depth: Optional[int] = None,
+        node_budget: Optional[int] = None,
+        id_prefix: str = "",
+    ):
         self.g = graph
         self.exit_node = graph
-        self.buffer = ""
+        self.chunks: List[str] = []
+        self.write = sink_writer(self.chunks if sink is None else sink)
         self.node_ids = {}
+        self.id_prefix = id_prefix
+        self.collapse_depth = collapse_depth
+        self.node_budget = node_budget
+        # Map from a node drawn as part of a summary node to the
+        # summary node, and from a summary node to its block count and
+        # offset range.
+        self.summary_of: Dict = {}
+        self.summaries: Dict = {}
 
     def get_node_colors(self, nesting_depth: int) -> Tuple[str, str]:
         if self.g.max_nesting < 0 or nesting_depth == -1:
@@ -78,24 +135,100 @@ class DotConverter:
         return color_info["hex"], color_info["bg"]
 
     @staticmethod
-    def process(graph, exit_node: BasicBlock, is_dominator_format: bool):
-        converter = DotConverter(graph)
+    def process(
+        graph,
+        exit_node: BasicBlock,
+        is_dominator_format: bool,
+        sink=None,
+        collapse_depth: Optional[int] = None,
+        node_budget: Optional[int] = None,
+    ) -> Optional[str]:
+        """Convert `graph` to dot format. If `sink` is given the text
+        is written to it and None is returned; otherwise the text is
+        returned as a string."""
+        converter = DotConverter(graph, sink, collapse_depth, node_budget)
         converter.run(exit_node, is_dominator_format)
-        return converter.buffer
+        if sink is None:
+            return "".join(converter.chunks)
+        return None
+
+    @staticmethod
+    def process_module(
+        graphs: Sequence[Tuple[str, DiGraph, Optional[BasicBlock]]],
+        is_dominator_format: bool,
+        sink=None,
+        collapse_depth: Optional[int] = None,
+        node_budget: Optional[int] = None,
+    ) -> Optional[str]:
+        """Convert the graphs of the functions of a module to a single
+        graph in dot format, with a cluster subgraph for each.
+        `graphs` lists (function name, graph, exit node) triples. Node
+        ids are prefixed with the function's position in `graphs`, so
+        they don't collide. The text is returned or written to `sink`
+        as in process()."""
+        chunks: List[str] = []
+        write = sink_writer(chunks if sink is None else sink)
+        write("digraph G {")
+        write(DOT_STYLE)
+        seen_names = set()
+        for i, (name, graph, exit_node) in enumerate(graphs):
+            if name in seen_names:
+                name = f"{name}_{i}"
+            seen_names.add(name)
+            converter = DotConverter(
+                graph, write, collapse_depth, node_budget, id_prefix=f"f{i}_"
+            )
+            converter.add_cluster(name, exit_node, is_dominator_format)
+        write("}\n")
+        if sink is None:
+            return "".join(chunks)
+        return None
 
     # See Stackoverflow link below for information on how improve
     # layout of graph. It's a mess and not very well understood.
     def run(self, exit_node: BasicBlock, is_dominator_format: bool):
-        self.buffer += "digraph G {"
-        self.buffer += DOT_STYLE
-
+        write = self.write
+        write("digraph G {")
+        write(DOT_STYLE)
+        self.add_graph(exit_node, is_dominator_format)
+        write("}\n")
+
+    def add_cluster(
+        self, name: str, exit_node: Optional[BasicBlock], is_dominator_format: bool
+    ):
+        """Write the graph as a cluster subgraph labeled `name`."""
+        name = name.replace('"', '\\"')
+        self.write(f'\n  subgraph "cluster_{name}" {{\n  label="{name}";\n')
+        self.add_graph(exit_node, is_dominator_format, comments=False)
+        self.write("  }\n")
+
+    def add_graph(
+        self,
+        exit_node: Optional[BasicBlock],
+        is_dominator_format: bool,
+        comments: bool = True,
+    ):
+        """Write the nodes and then the edges of the graph."""
+        write = self.write
         if isinstance(self.g, DiGraph):
-            self.buffer += "\n  # basic blocks:\n"
+            if self.collapse_depth is not None or self.node_budget is not None:
+                self.collapse()
+            summary_of = self.summary_of
+            block_id = self.id_prefix + "block_%d"
+            write("\n  # basic blocks:\n")
             for node in sorted(self.g.nodes, key=lambda n: n.number):
-                self.node_ids[node] = "block_%d" % node.number
-                self.add_node(node, exit_node, is_dominator_format)
+                if node in summary_of:
+                    self.node_ids[node] = block_id % summary_of[node].number
+                    continue
+                self.node_ids[node] = block_id % node.number
+                if node in self.summaries:
+                    self.add_summary_node(node)
+                else:
+                    self.add_node(node, exit_node, is_dominator_format)
 
-            self.buffer += """
+            if comments:
+                write(
+                    """
   # Edges should be ordered from innermost block edges to outmost.
   # If layout gives ugly edge crossing, change the order or the edges
   # and/or add port directions on nodes For example:
@@ -104,19 +237,106 @@ class DotConverter:
   # See https://stackoverflow.com/questions/53468814/how-can-i-influence-graphviz-dot-to-prefer-which-edges-can-cross/53472852#53472852
 
 """
+                )
+            else:
+                write("\n")
             # FIXME: We really want in reverse dominiator order but I think this is
             # close approximation.
             seen_edge = set()
+            seen_summary_edge = set()
             for edge in sorted(
                 self.g.edges,
                 reverse=True,
                 key=lambda n: (n.source.number, -n.dest.number),
             ):
+                if summary_of:
+                    # Draw an edge into, out of, or between summary
+                    # nodes once, and not at all inside one.
+                    source = summary_of.get(edge.source, edge.source)
+                    dest = summary_of.get(edge.dest, edge.dest)
+                    if source in self.summaries or dest in self.summaries:
+                        if source is dest or (source, dest) in seen_summary_edge:
+                            continue
+                        seen_summary_edge.add((source, dest))
                 edge_pair = (edge.source.number, edge.dest.number)
                 self.add_edge(edge, exit_node, edge_pair in seen_edge)
                 seen_edge.add(edge_pair)
 
-        self.buffer += "}\n"
+    def collapse(self):
+        """Choose the dominator subtrees to draw as summary nodes,
+        filling in `self.summary_of` and `self.summaries`.
+
+        Nesting depths and the preorder intervals [dom_in, dom_out] of
+        dominator subtrees were computed in dominators.dfs_forest().
+        Blocks below the collapse depth are drawn as part of the
+        summary node of their dominator at that depth. Blocks not
+        reachable from the entry have no nesting depth and are always
+        drawn.
+        """
+        nodes = [node for node in self.g.nodes if node.bb.nesting_depth >= 0]
+        if not nodes:
+            return
+        depth = max(node.bb.nesting_depth for node in nodes)
+        if self.collapse_depth is not None:
+            depth = min(depth, self.collapse_depth)
+        if self.node_budget is not None:
+            # Nodes drawn when collapsing at depth d are the unreachable
+            # nodes and those at depths 0 to d.
+            depth_counts = [0] * (depth + 1)
+            for node in nodes:
+                if node.bb.nesting_depth <= depth:
+                    depth_counts[node.bb.nesting_depth] += 1
+            drawn = len(self.g.nodes) - len(nodes) + depth_counts[0]
+            for d in range(1, depth + 1):
+                drawn += depth_counts[d]
+                if drawn > self.node_budget:
+                    depth = d - 1
+                    break
+
+        # The dominator subtrees to collapse, in preorder, so that the
+        # one holding a node can be found by its dom_in.
+        heads = sorted(
+            (node.bb.dom_in, node)
+            for node in nodes
+            if node.bb.nesting_depth == depth and node.bb.dom_out > node.bb.dom_in
+        )
+        head_dom_ins = [dom_in for dom_in, _ in heads]
+        summaries = self.summaries
+        for _, head in heads:
+            summaries[head] = [1, head.bb.start_offset, head.bb.end_offset]
+        summary_of = self.summary_of
+        for node in nodes:
+            if node.bb.nesting_depth <= depth:
+                continue
+            head = heads[bisect_right(head_dom_ins, node.bb.dom_in) - 1][1]
+            summary_of[node] = head
+            summary = summaries[head]
+            summary[0] += 1
+            if summary[1] > node.bb.start_offset:
+                summary[1] = node.bb.start_offset
+            if summary[2] < node.bb.end_offset:
+                summary[2] = node.bb.end_offset
+        return
+
+    def add_summary_node(self, node):
+        """Draw `node` as the summary of the dominator subtree under it."""
+        block_count, start_offset, end_offset = self.summaries[node]
+        fillcolor, fontcolor = self.get_node_colors(node.bb.nesting_depth)
+        self.write(
+            '  %s [shape = "box3d"]'
+            '[fontcolor = "%s", fillcolor = "%s"]'
+            '[label="Basic Block %d (%d)\\l%d blocks\\loffset: %d..%d\\l"];\n'
+            % (
+                self.node_ids[node],
+                fontcolor,
+                fillcolor,
+                node.number,
+                node.bb.nesting_depth,
+                block_count,
+                start_offset,
+                end_offset,
+            )
+        )
 
     def add_edge(self, edge, exit_node: BasicBlock, edge_seen):
         # labels = ''
@@ -126,7 +346,7 @@ class DotConverter:
 
         # color="black:invis:black"]
 
-        if exit_node is not None and BB_EXIT in edge.dest.bb.flags:
+        if exit_node is not None and edge.dest.bb.has_flag(BB_EXIT):
             return
 
         style = ""
@@ -143,28 +363,28 @@ class DotConverter:
         color = f'[color="blue{arrow_color}"]' if edge.is_conditional_jump() else ""
 
         if edge.kind in (
-            "fallthrough",
-            "no fallthrough",
-            "exit edge",
-            "dom-edge",
-            "pdom-edge",
+            EdgeKind.FALLTHROUGH,
+            EdgeKind.NO_FALLTHROUGH,
+            EdgeKind.EXIT_EDGE,
+            EdgeKind.DOM_EDGE,
+            EdgeKind.PDOM_EDGE,
         ):
-            if edge.kind == "no fallthrough":
+            if edge.kind == EdgeKind.NO_FALLTHROUGH:
                 style = '[style="dashed"] [arrowhead="none"]'
-            elif edge.kind == "fallthrough":
+            elif edge.kind == EdgeKind.FALLTHROUGH:
                 color = f'[color="red{arrow_color}"]'
-                if BB_NOFOLLOW in edge.source.flags:
+                if edge.source.bb.has_flag(BB_NOFOLLOW):
                     style = '[style="dashed"] [arrowhead="none"]'
                 pass
-            if edge.kind != "exit edge":
+            if edge.kind != EdgeKind.EXIT_EDGE:
                 weight = 10
-        elif edge.kind == "exception":
+        elif edge.kind == EdgeKind.EXCEPTION:
             style = f'[color="red{arrow_color}"]'
             if edge.source.bb.number + 1 == edge.dest.bb.number:
                 weight = 10
             else:
                 weight = 1
-                if BB_END_FINALLY in edge.dest.bb.flags:
+                if edge.dest.bb.has_flag(BB_END_FINALLY):
                     source_port = ":e"
                 else:
                     source_port = ":se"
@@ -172,7 +392,7 @@ class DotConverter:
             # edge_port = '[headport=nw] [tailport=sw]';
             # edge_port = '[headport=_] [tailport=_]';
         else:
-            if edge.kind == "for-finish":
+            if edge.kind == EdgeKind.FOR_FINISH:
                 style = '[style="dotted"]'
                 color = '[color="MediumBlue"]'
                 if edge.source.bb.number + 1 == edge.dest.bb.number:
@@ -184,10 +404,10 @@ class DotConverter:
                     source_port = ":se"
                     dest_port = ":ne"
                 pass
-            elif edge.kind == "self-loop":
+            elif edge.kind == EdgeKind.SELF_LOOP:
                 edge_port = f"[headport=ne, tailport=se, color='{DARK_GREEN}{arrow_color}']"
                 pass
-            elif edge.kind == "looping":
+            elif edge.kind == EdgeKind.LOOPING:
                 color = f'[color="{DARK_GREEN}{arrow_color}"]'
                 if edge.dest.bb.number + 1 == edge.source.bb.number:
                     # For a loop to the immediate predecessor we use
@@ -199,18 +419,18 @@ class DotConverter:
                     dest_port = ":sw"
                     pass
             # FIXME: these edges need to come earlier
-            # elif BB_JUMP_UNCONDITIONAL in edge.source.flags:
+            # elif edge.source.bb.has_flag(BB_JUMP_UNCONDITIONAL):
             #     source_port =':sw'
             #     dest_port =':nw'
             #     pass
 
-            elif BB_JUMP_TO_FALLTHROUGH in edge.source.flags:
+            elif edge.source.bb.has_flag(BB_JUMP_TO_FALLTHROUGH):
                 weight = 10
             else:
                 weight = 1
             pass
 
-        if BB_EXIT in edge.dest.flags:
+        if edge.dest.bb.has_flag(BB_EXIT):
             style = '[style="dotted"] [arrowhead="none"]'
             if edge.source.bb.number + 1 == edge.dest.bb.number:
                 weight = 10
@@ -229,8 +449,8 @@ class DotConverter:
             style = '[style="dashed"] [arrowhead="empty"]'
             pass
 
-        if edge.kind == "fallthrough":
-            if BB_JUMP_UNCONDITIONAL in edge.source.flags:
+        if edge.kind == EdgeKind.FALLTHROUGH:
+            if edge.source.bb.has_flag(BB_JUMP_UNCONDITIONAL):
                 # style = '[color="black:invis:black"]'
                 # style = '[style="dotted"] [arrowhead="empty"]'
                 if edge_seen:
@@ -238,23 +458,32 @@ class DotConverter:
                 style = '[style="invis"]'
             else:
                 style = '[style="dashed"]'
-        elif edge.kind in ("jump-backward-if-true", "jump-forward-if-true"):
+        elif edge.kind in (
+            EdgeKind.JUMP_BACKWARD_IF_TRUE,
+            EdgeKind.JUMP_FORWARD_IF_TRUE,
+        ):
             style = '[style="dotted,bold"]'
-        elif edge.kind in ("jump-backward-if-false", "jump-forward-if-false"):
+        elif edge.kind in (
+            EdgeKind.JUMP_BACKWARD_IF_FALSE,
+            EdgeKind.JUMP_FORWARD_IF_FALSE,
+        ):
             style = '[style="dotted"]'
 
         nid1 = self.node_ids[edge.source]
         nid2 = self.node_ids[edge.dest]
 
-        self.buffer += "  %s%s -> %s%s [weight=%d]%s%s%s;\n" % (
-            nid1,
-            source_port,
-            nid2,
-            dest_port,
-            weight,
-            color,
-            style,
-            edge_port,
+        self.write(
+            "  %s%s -> %s%s [weight=%d]%s%s%s;\n"
+            % (
+                nid1,
+                source_port,
+                nid2,
+                dest_port,
+                weight,
+                color,
+                style,
+                edge_port,
+            )
         )
 
     def node_repr(self, node, align, is_exit):
@@ -279,7 +508,7 @@ class DotConverter:
             flag_text = ""
             pass
 
-        if hasattr(node, "reach_offset"):
+        if node.reach_offset is not None:
             reach_offset_text = "\\lreach_offset=%d" % node.reach_offset
             pass
         pass
@@ -298,7 +527,7 @@ class DotConverter:
         self, node, exit_node: Optional[BasicBlock], is_dominator_format: bool
     ):
 
-        if exit_node is not None and BB_EXIT in node.bb.flags:
+        if exit_node is not None and node.bb.has_flag(BB_EXIT):
             return
 
         label = ""
@@ -307,11 +536,11 @@ class DotConverter:
 
         is_exit = False
         dom_set_len = len(node.bb.dom_set)
-        if exit_node in {node.bb for node in node.bb.dom_set}:
+        if exit_node is not None and dominates(node.bb, exit_node):
             dom_set_len -= 1
-        if BB_ENTRY in node.bb.flags or dom_set_len > 0:
+        if node.bb.has_flag(BB_ENTRY) or dom_set_len > 0:
             style = '[shape = "box", peripheries=2]'
-        elif BB_EXIT in node.bb.flags:
+        elif node.bb.has_flag(BB_EXIT):
             style = '[style = "rounded"]'
             align = "\n"
             is_exit = True
@@ -322,7 +551,7 @@ class DotConverter:
         if is_dominator_format:
             fillcolor, fontcolor = self.get_node_colors(node.bb.nesting_depth)
             # print("XXX", node.bb, node.bb.nesting_depth, fillcolor, fontcolor)
-            color = 'color=brown, ' if BB_JOIN_POINT in node.bb.flags else ""
+            color = 'color=brown, ' if node.bb.has_flag(BB_JOIN_POINT) else ""
             style += f'[{color}fontcolor = "{fontcolor}", fillcolor = "{fillcolor}"]'
 
         level = " (%d)" % (node.bb.nesting_depth) if node.bb.nesting_depth >= 0 else ""
@@ -337,4 +566,4 @@ class DotConverter:
             self.node_repr(node.bb, align, is_exit),
             align,
         )
-        self.buffer += "  block_%d %s%s;\n" % (node.number, style, label)
+        self.write("  %s %s%s;\n" % (self.node_ids[node], style, label))
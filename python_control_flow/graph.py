@@ -7,8 +7,10 @@
   :copyright: (c) 2014 by Romain Gaucher (@rgaucher)
 """
 
-from typing import Optional, Set
-from enum import Enum
+from itertools import count
+from operator import attrgetter
+from typing import Dict, Optional, Set
+from enum import Enum, IntEnum
 
 # First or Basic block that we entered on. Usually
 # at offset 0.
@@ -141,7 +143,110 @@ ScopeEdgeKind = Enum(
     ],
 )
 
-jump_flags = set([BB_JUMP_UNCONDITIONAL, BB_BREAK])
+
+class EdgeKind(IntEnum):
+    """The low-level kind of a graph edge: how control gets from the
+    source to the destination. The kinds of control-flow edges come
+    first. These are also the kind codes stored in a CSR adjacency."""
+
+    # Fall through to the next block in offset order.
+    FALLTHROUGH = 0
+    # The next block in offset order, which isn't reached because the
+    # source ends in a return, raise or unconditional jump.
+    NO_FALLTHROUGH = 1
+    # To the artificial exit block.
+    EXIT_EDGE = 2
+    FORWARD = 3
+    LOOPING = 4
+    SELF_LOOP = 5
+    FOR_FINISH = 6
+    JUMP_BACKWARD_IF_FALSE = 7
+    JUMP_BACKWARD_IF_TRUE = 8
+    JUMP_FORWARD_IF_FALSE = 9
+    JUMP_FORWARD_IF_TRUE = 10
+    EXCEPTION = 11
+    # Dominator-tree and post-dominator-tree edges.
+    DOM_EDGE = 12
+    PDOM_EDGE = 13
+
+    def __str__(self) -> str:
+        return EDGE_KIND2NAME[self]
+
+
+EDGE_KIND2NAME = {
+    EdgeKind.FALLTHROUGH: "fallthrough",
+    EdgeKind.NO_FALLTHROUGH: "no fallthrough",
+    EdgeKind.EXIT_EDGE: "exit edge",
+    EdgeKind.FORWARD: "forward",
+    EdgeKind.LOOPING: "looping",
+    EdgeKind.SELF_LOOP: "self-loop",
+    EdgeKind.FOR_FINISH: "for-finish",
+    EdgeKind.JUMP_BACKWARD_IF_FALSE: "jump-backward-if-false",
+    EdgeKind.JUMP_BACKWARD_IF_TRUE: "jump-backward-if-true",
+    EdgeKind.JUMP_FORWARD_IF_FALSE: "jump-forward-if-false",
+    EdgeKind.JUMP_FORWARD_IF_TRUE: "jump-forward-if-true",
+    EdgeKind.EXCEPTION: "exception",
+    EdgeKind.DOM_EDGE: "dom-edge",
+    EdgeKind.PDOM_EDGE: "pdom-edge",
+}
+
+
+def flags_mask(*flags: int) -> int:
+    """Return the bitmask with the bit for each of the BB_... `flags` set."""
+    mask = 0
+    for flag in flags:
+        mask |= 1 << flag
+    return mask
+
+
+class BBFlags(int):
+    """
+    Basic-block flags stored as an integer bitmask: bit `n` is set
+    when BB_... flag `n` is set.
+
+    So that flags read like the set of BB_... constants they replace,
+    ``in``, iteration (in increasing flag order) and ``len`` work as
+    they would on a set. For example: ``BB_ENTRY in block.flags``.
+    Since ints are immutable, a flag is added by assigning a new value,
+    e.g. with ``BasicBlock.add_flag()``.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_flags(cls, flags) -> "BBFlags":
+        """Return a BBFlags from an int bitmask or an iterable of BB_... flags."""
+        if isinstance(flags, int):
+            return cls(flags)
+        return cls(flags_mask(*flags))
+
+    def __contains__(self, flag: int) -> bool:
+        return (self >> flag) & 1 == 1
+
+    def __iter__(self):
+        mask = int(self)
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1
+            mask ^= low_bit
+
+    def __len__(self) -> int:
+        return bin(self).count("1")
+
+    def __repr__(self) -> str:
+        return "BBFlags{%s}" % format_flags(self)
+
+    __str__ = __repr__
+
+
+jump_flags = flags_mask(BB_JUMP_UNCONDITIONAL, BB_BREAK)
+
+conditional_jump_flags = flags_mask(
+    BB_JUMP_FORWARD_IF_TRUE,
+    BB_JUMP_FORWARD_IF_FALSE,
+    BB_JUMP_BACKWARD_IF_TRUE,
+    BB_JUMP_BACKWARD_IF_FALSE,
+)
 
 
 def format_flags(flags):
@@ -175,34 +280,73 @@ def format_flags_with_width(flags, max_width, newline):
 
 
 class Node:
-    GLOBAL_COUNTER = 0
+    """A graph node for a basic block. Nodes are hashed and compared by
+    their number, which is the number of their basic block.
 
-    def __init__(self, bb):
-        Node.GLOBAL_COUNTER += 1
-        if bb.number is None:
-            self.number = Node.GLOBAL_COUNTER
+    There can be very many nodes, so all fields, including those
+    filled in when a node is put in a dominator tree, are declared in
+    __slots__.
+    """
+
+    __slots__ = (
+        "number",
+        "bb",
+        "in_edges",
+        "out_edges",
+        "is_dead_code",
+        "is_join_node",
+        "children",
+        "parent",
+        "doms",
+        "dom_in",
+        "dom_out",
+        "pdom_set",
+        "reach_offset",
+    )
+
+    def __init__(self, bb, number: Optional[int] = None):
+        # A node takes the number of its basic block. `number` is used
+        # only when the basic block doesn't have one: blocks not made
+        # by a BBMgr are numbered -1.
+        if bb.number is None or bb.number < 0:
+            self.number = number
         else:
             self.number = bb.number
-        self.flags = bb.flags
         self.bb = bb
 
         # After the graph is built, a later pass
         # fills out the in edges and the out edges,
         # and whether the Node is a join Node.
-        self.in_edges: Optional[Set[Node]] = None
-        self.out_edges: Optional[Set[Node]] = None
+        self.in_edges: Optional[Set[Edge]] = None
+        self.out_edges: Optional[Set[Edge]] = None
         self.is_dead_code: Optional[bool] = None
         self.is_join_node: Optional[bool] = None
 
-    @classmethod
-    def reset(cls):
-        cls.GLOBAL_COUNTER = 0
+        # Set when the node is added to a TreeGraph.
+        self.children: Optional[set] = None
+        self.parent: Optional[Node] = None
+
+        # Set when dominator information is computed on a dominator
+        # tree. See dominators.dfs_forest().
+        self.doms = None
+        self.dom_in: int = -1
+        self.dom_out: int = -1
+        self.reach_offset: Optional[int] = None
+
+        # Set on post-dominator tree nodes. See
+        # dominators.PostDominatorTree.
+        self.pdom_set = None
+
+    @property
+    def flags(self) -> BBFlags:
+        """The flags of the node's basic block."""
+        return self.bb.flags
 
     def __eq__(self, obj) -> bool:
         return isinstance(obj, Node) and obj.number == self.number
 
     def __hash__(self) -> int:
-        return hash("node-" + str(self.number))
+        return self.number
 
     def __lt__(self, obj) -> bool:
         return not self.number < obj.number
@@ -227,21 +371,31 @@ class Node:
 
 
 class Edge:
-    GLOBAL_COUNTER = 0
-
-    def __init__(self, source, dest, kind, data):
-        Edge.GLOBAL_COUNTER += 1
-        self.id = Edge.GLOBAL_COUNTER
+    """A directed graph edge of kind `kind`, an EdgeKind. Edges are
+    hashed and compared by their id, which the graph that creates them
+    assigns."""
+
+    __slots__ = (
+        "id",
+        "source",
+        "dest",
+        "kind",
+        "scoping_kind",
+        "flags",
+        "data",
+        "is_join",
+    )
+
+    def __init__(self, source, dest, kind: EdgeKind, data, edge_id: int = 0):
+        # Edges are numbered by the graph that creates them.
+        self.id = edge_id
         self.source = source
         self.dest = dest
         self.kind = kind
         self.scoping_kind = ScopeEdgeKind.Unknown
-        self.flags = set()
+        self.flags = None
         self.data = data
-
-    @classmethod
-    def reset(self):
-        self.GLOBAL_COUNTER = 0
+        self.is_join = False
 
     def __ne__(self, obj):
         return not self == obj
@@ -250,7 +404,7 @@ class Edge:
         return isinstance(obj, Edge) and obj.id == self.id
 
     def __hash__(self):
-        return hash("edge-" + str(self.id))
+        return self.id
 
     def __str__(self):
         return "Edge%d(source=%s, dest=%s, kind=%s, data=%s)" % (
@@ -272,16 +426,16 @@ class Edge:
 
     def is_conditional_jump(self) -> bool:
         """Return True is edge is attached to a conditional jump
-        instruction at its source.
+        instruction at its source. This is worked out when asked for,
+        rather than for every edge as it is made.
         """
-        return {
-            BB_JUMP_FORWARD_IF_TRUE,
-            BB_JUMP_FORWARD_IF_FALSE,
-            BB_JUMP_BACKWARD_IF_TRUE,
-            BB_JUMP_BACKWARD_IF_FALSE,
-        }.intersection(
-            self.source.flags
-        ) and self.dest.bb.start_offset in self.source.bb.jump_offsets
+        source, dest = self.source, self.dest
+        return (
+            source is not None
+            and dest is not None
+            and source.bb.flags & conditional_jump_flags != 0
+            and dest.bb.start_offset in source.bb.jump_offsets
+        )
 
 
 class DiGraph:
@@ -290,31 +444,62 @@ class DiGraph:
     """
 
     def __init__(self):
-        Node.reset()
-        Edge.reset()
         self.nodes = set()
         self.edges = set()
 
+        # Counters for numbering the nodes and edges this graph
+        # creates. These are per graph, not global, so that graphs can
+        # be built at the same time in different threads.
+        self.node_counter = count(1)
+        self.edge_counter = count(1)
+
         # Maximum nesting of graph. -1 means this hasn't been
         # computed.
         self.max_nesting: int = -1
 
+        # Incremented whenever a node or edge is added, so that
+        # information computed from the graph, like traversal orders,
+        # can tell when it is out of date. Code that changes `nodes` or
+        # `edges` directly should increment this too.
+        self.generation: int = 0
+
+        # Out edges of each node, and the generation they were computed
+        # for. See out_edge_lists().
+        self._out_edge_lists: Optional[Dict] = None
+        self._out_edge_lists_generation: int = -1
+
     def add_edge(self, edge):
         if edge in self.edges:
             raise Exception("Edge already present")
         source_node, dest_node = edge.source, edge.dest
 
         self.edges.add(edge)
+        self.generation += 1
         self.add_node(source_node)
         self.add_node(dest_node)
 
     def add_node(self, node):
-        self.nodes.add(node)
-
-    def to_dot(self, exit_node, is_dominator_format: bool = False):
+        if node not in self.nodes:
+            self.nodes.add(node)
+            self.generation += 1
+
+    def to_dot(
+        self,
+        exit_node,
+        is_dominator_format: bool = False,
+        sink=None,
+        collapse_depth: Optional[int] = None,
+        node_budget: Optional[int] = None,
+    ):
+        """Return the graph in dot format, or if `sink` is given, write
+        it there a chunk at a time; see dotio.sink_writer().
+        `collapse_depth` and `node_budget` limit how much of the graph
+        is drawn; see dotio.DotConverter."""
         from python_control_flow.dotio import DotConverter
 
-        return DotConverter.process(self, exit_node, is_dominator_format)
+        return DotConverter.process(
+            self, exit_node, is_dominator_format, sink, collapse_depth, node_budget
+        )
 
     def add_edge_info_to_nodes(self):
         """
@@ -328,22 +513,42 @@ class DiGraph:
             edge.source.out_edges.add(edge)
             edge.dest.in_edges.add(edge)
 
-    @staticmethod
-    def make_node(bb):
-        return Node(bb)
-
-    @staticmethod
-    def make_edge(source=None, dest=None, kind=None, data=None):
-        return Edge(source=source, dest=dest, kind=kind, data=data)
+    def out_edge_lists(self) -> Dict:
+        """Return a dictionary from node to the list of its out edges,
+        in the order they were made. Unlike the nodes' `out_edges`,
+        this doesn't need filling in first. It is computed once for
+        each generation of the graph."""
+        if (
+            self._out_edge_lists is None
+            or self._out_edge_lists_generation != self.generation
+        ):
+            out_edge_lists: Dict = {}
+            for edge in sorted(self.edges, key=attrgetter("id")):
+                out_edge_lists.setdefault(edge.source, []).append(edge)
+            self._out_edge_lists = out_edge_lists
+            self._out_edge_lists_generation = self.generation
+        return self._out_edge_lists
+
+    def make_node(self, bb):
+        return Node(bb, number=next(self.node_counter))
+
+    def make_edge(self, source=None, dest=None, kind=None, data=None):
+        return Edge(
+            source=source,
+            dest=dest,
+            kind=kind,
+            data=data,
+            edge_id=next(self.edge_counter),
+        )
 
     # Some helpers
     def make_add_node(self, bb):
-        node = DiGraph.make_node(bb)
+        node = self.make_node(bb)
         self.add_node(node)
         return node
 
     def make_add_edge(self, source=None, dest=None, kind=None, data=None) -> Edge:
-        edge = DiGraph.make_edge(source=source, dest=dest, kind=kind, data=data)
+        edge = self.make_edge(source=source, dest=dest, kind=kind, data=data)
         self.add_edge(edge)
         return edge
 
@@ -351,13 +556,19 @@ class DiGraph:
 class TreeGraph(DiGraph):
     """
     A simple tree structure for basic blocks.
+
+    There is at most one node per basic block. `bb2node` maps a basic
+    block to its node, so adding nodes and edges takes constant time.
+    Each node has a `parent` node, None for a root, and a set of
+    `children` nodes.
     """
 
     def __init__(self, root):
-        Edge.reset()
-        Node.reset()
         self.edges = set()
+        self.node_counter = count(1)
+        self.edge_counter = count(1)
         self.nodes = []
+        self.bb2node: Dict = {}
         self.root = root
         self.root_node = None
 
@@ -365,6 +576,17 @@ class TreeGraph(DiGraph):
         # computed.
         self.max_nesting: int = -1
 
+        # As in DiGraph.
+        self.generation: int = 0
+        self._out_edge_lists: Optional[Dict] = None
+        self._out_edge_lists_generation: int = -1
+
+        # Nodes in depth-first preorder, and a map from a node number
+        # to its position in that list. These are filled in when
+        # dominator information is computed on the tree.
+        self.preorder: list = []
+        self.number2dom_in: Dict[int, int] = {}
+
     def add_edge(self, edge):
         if edge in self.edges:
             raise Exception("Edge already present")
@@ -373,26 +595,35 @@ class TreeGraph(DiGraph):
         self.add_node(source_node)
         self.add_node(dest_node)
         self.edges.add(edge)
-        source_node.children |= set([dest_node])
-        dest_node.parent = set([source_node])
+        source_node.children.add(dest_node)
+        dest_node.parent = source_node
+        self.generation += 1
 
     def add_node(self, node):
-        if node.bb not in [n.bb for n in self.nodes]:
-            node.children = set([])
+        if node.bb not in self.bb2node:
+            node.children = set()
             node.parent = None
             self.nodes.append(node)
+            self.bb2node[node.bb] = node
+            self.generation += 1
+
+    def make_add_node(self, bb):
+        """Return the node for basic block `bb`, adding a new one if
+        there isn't one yet."""
+        node = self.bb2node.get(bb)
+        if node is None:
+            node = self.make_node(bb)
+            self.add_node(node)
+        return node
 
     def postorder_traverse(self):
-        """Traverse the tree in preorder"""
+        """Traverse the tree in postorder"""
         if self.nodes:
-            return self.postorder_traverse1(self.nodes[0])
+            from python_control_flow.traversals import dfs_postorder_nodes
 
-    def postorder_traverse1(self, node):
-        """Traverse the tree in preorder"""
-        for child in node.children:
-            self.postorder_traverse1(child)
-            yield child
-        yield node
+            return iter(
+                dfs_postorder_nodes(self.nodes[0], lambda node: node.children)
+            )
 
 
 def write_dot(
@@ -403,25 +634,141 @@ def write_dot(
     debug=True,
     is_dominator_format: bool = False,
     exit_node=None,
+    render_queue=None,
+    render_cache=None,
+    collapse_depth: Optional[int] = None,
+    node_budget: Optional[int] = None,
 ):
     """Produce and write dot and png files for control-flow graph
     `cfg`; `func_or_code_name` is the func_or_code_name of the
     code and `prefix` indicates the file prefix to use.
     dot is converted to PNG and dumped if `write_bool` is True.
+
+    If `render_queue`, a render.RenderQueue, is given, the graph is
+    rendered there, in its output format, rather than here, and the
+    future for the rendered file is returned.
+
+    If `render_cache`, a render.RenderCache, is given, files that it
+    has for the same dot text are linked into place instead of being
+    written or rendered again.
+
+    For big graphs, `collapse_depth` and `node_budget` draw dominator
+    subtrees as summary nodes; see dotio.DotConverter.
     """
 
     if graph is None:
-        return
+        return None
+
+    def write_text(sink):
+        graph.to_dot(
+            exit_node, is_dominator_format, sink, collapse_depth, node_budget
+        )
+
+    return write_and_render(
+        name, prefix, write_text, write_png, debug, render_queue, render_cache
+    )
+
+
+def write_module_dot(
+    name: str,
+    prefix: str,
+    graphs: list,
+    write_png: bool = False,
+    debug=True,
+    is_dominator_format: bool = False,
+    render_queue=None,
+    render_cache=None,
+    collapse_depth: Optional[int] = None,
+    node_budget: Optional[int] = None,
+):
+    """Like write_dot(), but write the graphs of all of the functions
+    of module `name` into one dot file, so that dot is run once for the
+    module rather than once per function. `graphs` lists (function
+    name, graph, exit node) triples, and each function is drawn as a
+    cluster subgraph; see dotio.DotConverter.process_module().
+    """
+
+    def write_text(sink):
+        from python_control_flow.dotio import DotConverter
+
+        DotConverter.process_module(
+            graphs, is_dominator_format, sink, collapse_depth, node_budget
+        )
+
+    return write_and_render(
+        name, prefix, write_text, write_png, debug, render_queue, render_cache
+    )
+
+
+def write_and_render(
+    name: str,
+    prefix: str,
+    write_text,
+    write_png: bool,
+    debug,
+    render_queue,
+    render_cache,
+):
+    """Write the dot file for write_dot() or write_module_dot(), whose
+    text `write_text` writes to the sink it is called with, and render
+    it if `write_png` is True: in the output format of `render_queue`,
+    or else to PNG, in which case a failure is reported on stderr."""
+    import sys
+    from subprocess import CalledProcessError
+
+    from python_control_flow.render import render_dot, unshare
 
     path_safe = name.translate(name.maketrans(" <>", "_[]"))
     dot_path = f"{prefix}-{path_safe}.dot"
-    open(dot_path, "w").write(graph.to_dot(exit_node, is_dominator_format))
+    output_format = "png" if render_queue is None else render_queue.output_format
+    out_suffix = f".{output_format}"
+    out_path = f"{prefix}-{path_safe}{out_suffix}"
+
+    if render_cache is None:
+        digest = None
+        unshare(dot_path)
+        with open(dot_path, "w") as dot_file:
+            write_text(dot_file)
+    else:
+        # The text is hashed as it is written into the cache, and the
+        # cached files for it are linked into place.
+        digest = render_cache.write(".dot", write_text)
+        render_cache.place(digest, ".dot", dot_path)
+        if write_png and render_cache.place(digest, out_suffix, out_path):
+            if debug:
+                print(f"{dot_path} and {out_path} taken from cache")
+            if render_queue is not None:
+                from concurrent.futures import Future
+
+                future = Future()
+                future.set_result(out_path)
+                return future
+            return None
     if debug:
         print(f"{dot_path} written")
-    if write_png:
-        import os
 
-        png_path = f"{prefix}-{path_safe}.png"
-        os.system(f"dot -Tpng {dot_path} > {png_path}")
+    if write_png:
+        unshare(out_path)
+        if render_queue is not None:
+
+            def rendered(out_path: str):
+                if digest is not None:
+                    render_cache.store(digest, out_suffix, out_path)
+                if debug:
+                    print(f"{out_path} written")
+
+            return render_queue.submit(dot_path, out_path, after=rendered)
+
+        try:
+            render_dot(dot_path, out_path)
+        except CalledProcessError as e:
+            print(f"Rendering {dot_path} failed:\n{e.stderr}", file=sys.stderr)
+            return None
+        except OSError as e:
+            print(f"Rendering {dot_path} failed: {e}", file=sys.stderr)
+            return None
+        if digest is not None:
+            render_cache.store(digest, out_suffix, out_path)
         if debug:
-            print(f"{png_path} written")
+            print(f"{out_path} written")
+    return None
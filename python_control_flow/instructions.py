@@ -0,0 +1,73 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+A single decoded instruction store for a code object.
+
+Every stage of the analysis: basic-block creation, control-flow
+graph construction and instruction augmentation, needs the
+instructions of a code object and where jumps go. Decoding bytecode is
+the most expensive part of analyzing a code object, so we do it once
+here and share the result.
+"""
+
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from xdis.bytecode import get_instructions_bytes
+from xdis.instruction import Instruction
+
+
+class InstructionStore:
+    """Decoded instructions of a code object, along with indices
+    into these that are used by more than one stage of analysis.
+
+    It contains:
+      * the tuple of instructions in offset order,
+      * a mapping from an instruction offset to its index in the tuple,
+      * a jump-target index mapping a jump-target offset to the list of
+        offsets of instructions that jump there,
+      * the frozenset of jump-target offsets,
+      * the set of jump-target offsets that are loop targets, that is,
+        some instruction at the same or a later offset jumps there.
+    """
+
+    def __init__(self, code, opc):
+        self.code = code
+        self.opc = opc
+        self.instructions: Tuple[Instruction, ...] = tuple(
+            get_instructions_bytes(code, opc)
+        )
+
+        # Opcodes which have an explicit jump target in their operand.
+        self.jump_opcodes: Set[int] = set(opc.hasjabs) | set(opc.hasjrel)
+
+        self.offset2inst_index: Dict[int, int] = {}
+        jump_target2offsets: Dict[int, List[int]] = defaultdict(list)
+        self.loop_targets: Set[int] = set()
+
+        for i, inst in enumerate(self.instructions):
+            offset = inst.offset
+            self.offset2inst_index[offset] = i
+            if inst.opcode in self.jump_opcodes:
+                jump_target = inst.argval
+                jump_target2offsets[jump_target].append(offset)
+                # For Python so far, a loop jump always goes from a
+                # larger offset to a smaller one
+                if jump_target <= offset:
+                    self.loop_targets.add(jump_target)
+
+        # A plain dict, so that looking up an offset which is not a
+        # jump target does not make it one.
+        self.jump_target2offsets: Dict[int, List[int]] = dict(jump_target2offsets)
+        self.jump_targets: FrozenSet[int] = frozenset(jump_target2offsets)
+
+        self._linestarts: Optional[Dict[int, int]] = None
+
+    @property
+    def linestarts(self) -> Dict[int, int]:
+        """Mapping from offset to the line number started at that offset."""
+        if self._linestarts is None:
+            self._linestarts = dict(self.opc.findlinestarts(self.code, dup_lines=True))
+        return self._linestarts
+
+    def __len__(self) -> int:
+        return len(self.instructions)
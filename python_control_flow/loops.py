@@ -0,0 +1,311 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+Loop nesting forest of a control-flow graph.
+
+Loops are found with Havlak's algorithm, "Nesting of Reducible and
+Irreducible Loops", with Ramalingam's correction for irreducible
+loops, "Identifying Loops In Almost Linear Time". It works on dense
+integer block ids over the CFG's CSR adjacency and uses the
+depth-first preorder and postorder which the CFG caches. With
+union-find to collapse inner loops, this takes near-linear time.
+
+For reducible loops, like all loops written in Python, the header of
+a loop is the block that the loop's back edges go to. An irreducible
+loop, which has more than one entry, is headed by its entry that
+comes first in depth-first order.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Optional
+
+from python_control_flow.bitset import BlockSet
+
+# Kinds of block, as in Havlak's paper.
+NONHEADER = 0
+SELF_LOOP = 1
+REDUCIBLE = 2
+IRREDUCIBLE = 3
+
+NO_LOOP = -1
+
+
+class Loop:
+    """A loop in a loop nesting forest.
+
+    `header` is the loop's header basic block and `body` is a
+    ``BlockSet`` of the basic blocks in the loop, including the header
+    and the blocks of any nested loops. `latches` lists the blocks with
+    a back edge to the header, and `exits` lists the blocks outside
+    the loop that a block in the loop goes to, both in block-number
+    order.
+    `depth` is 1 for an outermost loop, and one more than the depth of
+    its `parent` loop otherwise. `children` are the loops directly
+    nested inside this one.
+
+    `start_offset` and `end_offset` are the smallest and largest
+    instruction offsets in the loop's blocks. Blocks which lie in
+    between but are not in the loop, like a block ending in "break",
+    still belong to the loop as written in the source.
+    """
+
+    __slots__ = (
+        "number",
+        "header",
+        "body",
+        "latches",
+        "exits",
+        "depth",
+        "parent",
+        "children",
+        "is_reducible",
+        "start_offset",
+        "end_offset",
+    )
+
+    def __init__(self, number: int, header, body: BlockSet, is_reducible: bool):
+        self.number = number
+        self.header = header
+        self.body = body
+        self.is_reducible = is_reducible
+        self.latches: list = []
+        self.exits: list = []
+        self.depth: int = 1
+        self.parent: Optional[Loop] = None
+        self.children: List[Loop] = []
+        self.start_offset: int = header.start_offset
+        self.end_offset: int = header.end_offset
+
+    def __contains__(self, block) -> bool:
+        return block in self.body
+
+    def __repr__(self) -> str:
+        return (
+            f"Loop{self.number}(header={self.header.number}, "
+            f"body={sorted(block.number for block in self.body)}, "
+            f"depth={self.depth})"
+        )
+
+
+class LoopForest:
+    """The loop nesting forest of control-flow graph `cfg`.
+
+    `loops` lists the loops, outer loops before the loops nested in
+    them, and `roots` lists the outermost loops. `loop_of[i]` is the
+    index in `loops` of the innermost loop containing block number `i`,
+    or NO_LOOP. `extent_of[i]` is the same for the innermost loop whose
+    offset range contains block `i`; see Loop.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.loops: List[Loop] = []
+        self.roots: List[Loop] = []
+        self.loop_of = array("i", [NO_LOOP]) * len(cfg.blocks)
+        self.extent_of = array("i", [NO_LOOP]) * len(cfg.blocks)
+        self.build()
+
+    def build(self):
+        cfg = self.cfg
+        blocks = cfg.blocks
+        csr = cfg.csr
+        successors, predecessors = csr.forward, csr.reverse
+        preorder = cfg.preorder
+        pre_number = cfg.preorder_number
+        post_number = cfg.postorder_number
+
+        def is_ancestor(w: int, v: int) -> bool:
+            # Is w an ancestor of v in the depth-first spanning tree?
+            return pre_number[w] <= pre_number[v] and post_number[v] <= post_number[w]
+
+        # Predecessors split into those along back edges, from
+        # descendants, and the others. Unreachable blocks are left out.
+        back_preds = {}
+        non_back_preds = {}
+        for w in preorder:
+            back = []
+            non_back = []
+            for v in predecessors[w]:
+                if pre_number[v] < 0:
+                    # Not reachable from the entry
+                    continue
+                if is_ancestor(w, v):
+                    back.append(v)
+                else:
+                    non_back.append(v)
+            back_preds[w] = back
+            non_back_preds[w] = non_back
+
+        # Union-find over block numbers, used to collapse loops found
+        # so far into their headers.
+        union_parent = list(range(len(blocks)))
+
+        def find(v: int) -> int:
+            while union_parent[v] != v:
+                union_parent[v] = union_parent[union_parent[v]]
+                v = union_parent[v]
+            return v
+
+        # header[v] is the header of the innermost loop that directly
+        # contains v, that is, not through a nested loop.
+        header = [NO_LOOP] * len(blocks)
+        kind = [NONHEADER] * len(blocks)
+
+        for w in reversed(preorder):
+            body = []
+            in_body = set()
+            for v in back_preds[w]:
+                if v == w:
+                    kind[w] = SELF_LOOP
+                else:
+                    v = find(v)
+                    if v not in in_body:
+                        in_body.add(v)
+                        body.append(v)
+            if body:
+                kind[w] = REDUCIBLE
+            worklist = list(body)
+            while worklist:
+                x = worklist.pop()
+                for y in non_back_preds[x]:
+                    y = find(y)
+                    if not is_ancestor(w, y):
+                        # An entry into the loop other than through w.
+                        kind[w] = IRREDUCIBLE
+                        non_back_preds[w].append(y)
+                    elif y not in in_body and y != w:
+                        in_body.add(y)
+                        body.append(y)
+                        worklist.append(y)
+            for x in body:
+                header[x] = w
+                union_parent[x] = w
+
+        # Make the loops, outer loops first, which is preorder of the
+        # headers.
+        loop_index = {}
+        loops = self.loops
+        for w in preorder:
+            if kind[w] != NONHEADER:
+                loop = Loop(
+                    len(loops), blocks[w], BlockSet(blocks), kind[w] != IRREDUCIBLE
+                )
+                loop.latches = [blocks[v] for v in sorted(back_preds[w])]
+                loop_index[w] = loop.number
+                loops.append(loop)
+                parent_header = header[w]
+                if parent_header == NO_LOOP:
+                    self.roots.append(loop)
+                else:
+                    loop.parent = parent = loops[loop_index[parent_header]]
+                    loop.depth = parent.depth + 1
+                    parent.children.append(loop)
+
+        # Fill in loop_of and the loop bodies, inner loops first so
+        # that their bodies can be added to their parents'.
+        loop_of = self.loop_of
+        members: List[List[int]] = [[] for _ in loops]
+        for w in preorder:
+            if w in loop_index:
+                loop_of[w] = loop_index[w]
+            elif header[w] != NO_LOOP:
+                loop_of[w] = loop_index[header[w]]
+            if loop_of[w] != NO_LOOP:
+                members[loop_of[w]].append(w)
+        num_bytes = (len(blocks) + 7) // 8
+        for loop in reversed(loops):
+            loop.body.bits |= _bits_of(members[loop.number], num_bytes)
+            if loop.parent is not None:
+                loop.parent.body.bits |= loop.body.bits
+
+        # Number the loops in preorder of the loop nesting forest, so
+        # that loop A contains loop B exactly when B's number lies in
+        # [loop_in[A], loop_out[A]].
+        loop_in = [0] * len(loops)
+        loop_out = [0] * len(loops)
+        count = 0
+        for root in self.roots:
+            loop_in[root.number] = count
+            count += 1
+            stack = [(root, iter(root.children))]
+            while stack:
+                loop, children = stack[-1]
+                for child in children:
+                    loop_in[child.number] = count
+                    count += 1
+                    stack.append((child, iter(child.children)))
+                    break
+                else:
+                    stack.pop()
+                    loop_out[loop.number] = count - 1
+
+        # The exits of a loop are the successors of its blocks that
+        # are not in it. A successor of block w may leave several of
+        # the loops that w is in, innermost first.
+        exits = [set() for _ in loops]
+        for w in preorder:
+            for s in successors[w]:
+                i = loop_of[w]
+                s_loop = loop_of[s]
+                while i != NO_LOOP and not (
+                    s_loop != NO_LOOP and loop_in[i] <= loop_in[s_loop] <= loop_out[i]
+                ):
+                    exits[i].add(s)
+                    parent = loops[i].parent
+                    i = NO_LOOP if parent is None else parent.number
+        for loop in loops:
+            loop.exits = [blocks[s] for s in sorted(exits[loop.number])]
+
+        for w in preorder:
+            i = loop_of[w]
+            while i != NO_LOOP:
+                loop = loops[i]
+                block = blocks[w]
+                if loop.start_offset > block.start_offset:
+                    loop.start_offset = block.start_offset
+                if loop.end_offset < block.end_offset:
+                    loop.end_offset = block.end_offset
+                i = NO_LOOP if loop.parent is None else loop.parent.number
+
+        # Outer loops come first, so inner loops overwrite them below.
+        extent_of = self.extent_of
+        starts = cfg.block_starts
+        start_nodes = cfg.block_start_nodes
+        for loop in loops:
+            first = bisect_left(starts, loop.start_offset)
+            last = bisect_right(starts, loop.end_offset)
+            for node in start_nodes[first:last]:
+                extent_of[node.bb.number] = loop.number
+        return
+
+    def innermost(self, block) -> Optional[Loop]:
+        """Return the innermost loop containing basic block `block`, or
+        None if it is not in a loop."""
+        i = self.loop_of[block.number]
+        return None if i == NO_LOOP else self.loops[i]
+
+    def enclosing(self, block) -> Optional[Loop]:
+        """Return the innermost loop whose offset range contains basic
+        block `block`, or None."""
+        i = self.extent_of[block.number]
+        return None if i == NO_LOOP else self.loops[i]
+
+    def depth(self, block) -> int:
+        """Return the number of loops that basic block `block` is in."""
+        i = self.loop_of[block.number]
+        return 0 if i == NO_LOOP else self.loops[i].depth
+
+    def is_header(self, block) -> bool:
+        """Return True if basic block `block` is a loop header."""
+        i = self.loop_of[block.number]
+        return i != NO_LOOP and self.loops[i].header is block
+
+
+def _bits_of(numbers: List[int], num_bytes: int) -> int:
+    """Return the int with bit `n` set for each `n` in `numbers`. This
+    is built a byte at a time, rather than with an int operation per
+    number, which would take quadratic time for big ints."""
+    buffer = bytearray(num_bytes)
+    for n in numbers:
+        buffer[n >> 3] |= 1 << (n & 7)
+    return int.from_bytes(buffer, "little")
@@ -0,0 +1,188 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+Rendering of dot files with Graphviz, off the analysis thread.
+
+Laying out a graph with ``dot`` usually takes much longer than
+analyzing the function the graph is for. A RenderQueue runs ``dot``
+processes from a bounded pool of worker threads, so analysis can go on
+while graphs are rendered. Each request gives back a future.
+
+A RenderCache keeps dot files and their renderings by the hash of
+their text, so that a graph seen before is neither written nor
+rendered again.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_for
+from threading import Lock, get_ident
+from typing import Callable, List, Optional
+
+DOT_PROGRAM = "dot"
+
+
+def render_dot(
+    dot_path: str, out_path: str, output_format: str = "png", program=DOT_PROGRAM
+) -> str:
+    """Render dot file `dot_path` to `out_path` in `output_format` and
+    return `out_path`. A failure of the dot program raises
+    subprocess.CalledProcessError, whose `stderr` has dot's messages.
+    """
+    subprocess.run(
+        [program, f"-T{output_format}", dot_path, "-o", out_path],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return out_path
+
+
+class RenderQueue:
+    """A queue of dot files to render, run by at most `max_workers`
+    dot processes at a time; by default, one per CPU.
+
+    submit() returns a future for the rendered file's path. wait()
+    waits for everything submitted so far. A RenderQueue can be used as
+    a context manager, which waits for all renders on exit.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        output_format: str = "png",
+        program=DOT_PROGRAM,
+    ):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers < 1:
+            raise ValueError(f"max_workers should be at least 1; got {max_workers}")
+        self.output_format = output_format
+        self.program = program
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="render"
+        )
+        self.pending: List[Future] = []
+        self.lock = Lock()
+
+    def submit(
+        self, dot_path: str, out_path: str, after: Optional[Callable] = None
+    ) -> Future:
+        """Queue rendering dot file `dot_path` to `out_path`. If `after`
+        is given, it is called with `out_path` once rendering has
+        succeeded, before the future is done."""
+
+        def render() -> str:
+            render_dot(dot_path, out_path, self.output_format, self.program)
+            if after is not None:
+                after(out_path)
+            return out_path
+
+        future = self.executor.submit(render)
+        with self.lock:
+            self.pending.append(future)
+        return future
+
+    def wait(self) -> List[Future]:
+        """Wait for all renders submitted so far, and return their
+        futures in the order they were submitted. Failures are not
+        raised here; they are in the futures."""
+        with self.lock:
+            futures, self.pending = self.pending, []
+        wait_for(futures)
+        return futures
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "RenderQueue":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wait()
+        self.shutdown()
+
+
+def unshare(path: str):
+    """Remove file `path` if it is one of several hard links to the
+    same file, as files placed from a RenderCache can be, so that
+    writing `path` afterwards does not change the other links."""
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class RenderCache:
+    """A store of dot files, and of the images rendered from them, in
+    `directory`, named by the SHA-256 digest of the dot text. Batch
+    runs see the same graphs again and again, for unchanged functions
+    or the same helper compiled into many modules, and with a cache
+    these are written and rendered only once.
+
+    Files are placed where they are wanted as hard links into the
+    cache, or as copies where linking is not possible.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, digest + suffix)
+
+    def place(self, digest: str, suffix: str, dest_path: str) -> bool:
+        """Put the cached file for `digest` with `suffix` at
+        `dest_path`, and return True, if there is one. Otherwise
+        return False."""
+        cache_path = self.path(digest, suffix)
+        if not os.path.exists(cache_path):
+            return False
+        _link_or_copy(cache_path, dest_path)
+        return True
+
+    def store(self, digest: str, suffix: str, path: str):
+        """Add file `path` to the cache for `digest` with `suffix`."""
+        _link_or_copy(path, self.path(digest, suffix))
+
+    def write(self, suffix: str, write_text: Callable) -> str:
+        """Add a text file with `suffix` to the cache, and return the
+        digest of its text. The text is written by calling `write_text`
+        with a function to send each chunk to; it is hashed as it is
+        written to a temporary file, which then becomes the cached
+        file, unless the cache has that text already."""
+        hasher = hashlib.sha256()
+        temp_path = self.path(f"{os.getpid()}.{get_ident()}.tmp", suffix)
+        with open(temp_path, "w") as temp_file:
+
+            def sink(chunk: str):
+                temp_file.write(chunk)
+                hasher.update(chunk.encode())
+
+            write_text(sink)
+        digest = hasher.hexdigest()
+        cache_path = self.path(digest, suffix)
+        if os.path.exists(cache_path):
+            os.unlink(temp_path)
+        else:
+            os.replace(temp_path, cache_path)
+        return digest
+
+
+def _link_or_copy(source_path: str, dest_path: str):
+    """Make `dest_path` a hard link to `source_path`, or a copy of it
+    where a link can't be made. A temporary name is used, so that
+    `dest_path` is replaced all at once."""
+    if os.path.exists(dest_path) and os.path.samefile(source_path, dest_path):
+        # Already in place. Renaming a link onto another link to the
+        # same file would do nothing, leaving the temporary behind.
+        return
+    temp_path = f"{dest_path}.{os.getpid()}.{get_ident()}.tmp"
+    try:
+        os.link(source_path, temp_path)
+    except OSError:
+        shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, dest_path)
@@ -0,0 +1,226 @@
+# Copyright (c) 2026 by Rocky Bernstein <rb@dustyfeet.com>
+"""
+Strongly-connected components of a control-flow graph, the condensed
+graph of those components, and irreducibility detection.
+
+Components are found with Pearce's space-efficient, iterative variant
+of Tarjan's algorithm, "A Space-Efficient Algorithm for Finding
+Strongly Connected Components". Nodes are dense integer ids, and
+successors come from CSR rows, or anything else that maps a node id
+to its successors.
+
+A flow graph is irreducible when some cycle can be entered at more
+than one node. To find that, each cyclic component reachable from
+the entry should have a single entry node, its header. The edges into
+the header from inside the component are then removed, and the same
+check is made on the components of what remains, and so on.
+"""
+
+from array import array
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from python_control_flow.csr import CSRGraph
+
+UNDEFINED = -1
+
+
+def strongly_connected_components(
+    num_nodes: int, successors: Callable, nodes: Optional[Sequence[int]] = None
+) -> Tuple[array, int]:
+    """Find the strongly-connected components of the graph on nodes
+    0..`num_nodes`-1, where `successors(v)` gives the successors of
+    node `v`. If `nodes` is given, the search starts from those nodes
+    in that order and only the nodes reachable from them are
+    assigned a component; otherwise all nodes are.
+
+    The return value is an array giving the component number of each
+    node, UNDEFINED for nodes not searched, and the number of
+    components. Components are numbered in topological order: an
+    edge between two components goes from a smaller number to a larger
+    one.
+    """
+    # rindex[v] is 0 for a node not yet visited, v's depth-first
+    # index, lowered as smaller-indexed nodes reachable from it are
+    # found, while v is being visited, and then a component number
+    # counting down from num_nodes. Indices stay below the component
+    # numbers given out so far, and both are above 0.
+    rindex = array("i", [0]) * num_nodes
+    index = 1
+    component = num_nodes
+    scc_stack: List[int] = []
+
+    if nodes is None:
+        nodes = range(num_nodes)
+    for start in nodes:
+        if rindex[start] != 0:
+            continue
+        rindex[start] = index
+        index += 1
+        # Each entry is (node, successor iterator, is root).
+        stack = [[start, iter(successors(start)), True]]
+        while stack:
+            frame = stack[-1]
+            v = frame[0]
+            for w in frame[1]:
+                if rindex[w] == 0:
+                    rindex[w] = index
+                    index += 1
+                    stack.append([w, iter(successors(w)), True])
+                    break
+                if rindex[w] < rindex[v]:
+                    rindex[v] = rindex[w]
+                    frame[2] = False
+            else:
+                stack.pop()
+                if frame[2]:
+                    # v is the root of a component: v and the nodes above
+                    # it on scc_stack.
+                    index -= 1
+                    while scc_stack and rindex[v] <= rindex[scc_stack[-1]]:
+                        w = scc_stack.pop()
+                        rindex[w] = component
+                        index -= 1
+                    rindex[v] = component
+                    component -= 1
+                else:
+                    scc_stack.append(v)
+                if stack:
+                    # Back in the parent: pass on the lowest index seen.
+                    parent = stack[-1]
+                    if rindex[v] < rindex[parent[0]]:
+                        rindex[parent[0]] = rindex[v]
+                        parent[2] = False
+
+    # Components were numbered as they were completed, which is
+    # reverse topological order, counting down. Renumber from 0 in
+    # topological order.
+    first = component + 1
+    component_of = array("i", [UNDEFINED]) * num_nodes
+    for v in range(num_nodes):
+        if rindex[v] != 0:
+            component_of[v] = rindex[v] - first
+    return component_of, num_nodes + 1 - first
+
+
+class Condensation:
+    """The strongly-connected components of the graph in CSR graph
+    `csr`, from entry node `entry`.
+
+    `component_of[v]` is the component number of node `v`, and
+    `components[c]` lists the nodes of component `c` in increasing
+    order. Components are numbered in topological order. `dag` is the
+    condensed graph, a CSRGraph on component numbers whose edge kinds
+    are the kinds of the first edge found between two components.
+
+    `irreducible_regions` lists, for each cycle that can be entered at
+    more than one node, the sorted list of those entry nodes. The
+    graph is reducible when this is empty.
+    """
+
+    def __init__(self, csr: CSRGraph, entry: int):
+        self.csr = csr
+        self.entry = entry
+        successors = csr.forward
+        num_nodes = csr.num_nodes
+
+        # Start from the entry, so that the components reachable from
+        # it come first.
+        nodes = [entry] + [v for v in range(num_nodes) if v != entry]
+        self.component_of, count = strongly_connected_components(
+            num_nodes, successors.__getitem__, nodes
+        )
+        component_of = self.component_of
+        self.components: List[List[int]] = [[] for _ in range(count)]
+        for v in range(num_nodes):
+            self.components[component_of[v]].append(v)
+
+        dag_edges = {}
+        targets, kinds = successors.targets, successors.kinds
+        for v in range(num_nodes):
+            c = component_of[v]
+            for j in range(successors.index[v], successors.index[v + 1]):
+                d = component_of[targets[j]]
+                if c != d:
+                    dag_edges.setdefault((c, d), kinds[j])
+        self.dag = CSRGraph(
+            count, ((c, d, kind) for (c, d), kind in dag_edges.items())
+        )
+
+        self.irreducible_regions: List[List[int]] = []
+        self.find_irreducible_regions()
+
+    @property
+    def num_components(self) -> int:
+        return len(self.components)
+
+    @property
+    def is_irreducible(self) -> bool:
+        return len(self.irreducible_regions) > 0
+
+    def is_cyclic(self, c: int) -> bool:
+        """Return True if component `c` has a cycle: it has more than
+        one node, or its node has an edge to itself."""
+        nodes = self.components[c]
+        if len(nodes) > 1:
+            return True
+        v = nodes[0]
+        return v in self.csr.successors(v)
+
+    def find_irreducible_regions(self):
+        """Fill in `self.irreducible_regions`, looking at the cyclic
+        components reachable from the entry, then at the components
+        inside each of those once its header's incoming edges are
+        removed, and so on."""
+        successors = self.csr.forward
+        predecessors = self.csr.reverse
+        entry = self.entry
+
+        reachable = bytearray(self.csr.num_nodes)
+        reachable[entry] = 1
+        stack = [entry]
+        while stack:
+            for w in successors[stack.pop()]:
+                if not reachable[w]:
+                    reachable[w] = 1
+                    stack.append(w)
+
+        regions = [
+            nodes
+            for c, nodes in enumerate(self.components)
+            if reachable[nodes[0]] and len(nodes) > 1
+        ]
+        # Which region each node is in, while looking at that region.
+        in_region = bytearray(self.csr.num_nodes)
+        while regions:
+            region = regions.pop()
+            for v in region:
+                in_region[v] = 1
+            entries = [
+                v
+                for v in region
+                if v == entry
+                or any(reachable[p] and not in_region[p] for p in predecessors[v])
+            ]
+            for v in region:
+                in_region[v] = 0
+            if len(entries) != 1:
+                self.irreducible_regions.append(entries)
+                continue
+
+            # Number the region's nodes locally, leaving out the edges
+            # into the header, and look for cycles in what is left.
+            header = entries[0]
+            local = {v: i for i, v in enumerate(region)}
+            local_successors = [
+                [local[w] for w in successors[v] if w != header and w in local]
+                for v in region
+            ]
+            component_of, count = strongly_connected_components(
+                len(region), local_successors.__getitem__
+            )
+            sub_regions: List[List[int]] = [[] for _ in range(count)]
+            for i, v in enumerate(region):
+                sub_regions[component_of[i]].append(v)
+            regions.extend(nodes for nodes in sub_regions if len(nodes) > 1)
+        self.irreducible_regions.sort()
+        return
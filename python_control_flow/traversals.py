@@ -10,10 +10,31 @@
   :license: Apache 2, see LICENSE for more details.
 """
 
+from collections import deque
+from typing import Callable, Optional, Tuple
+
 from python_control_flow.graph import Edge
 
+# Values a visitor's visit() method can return to steer a Walker.
+# Returning None, or anything else, continues the walk.
+
+# Don't walk out of the destination of the edge just visited, unless
+# the destination is reached again through another edge.
+PRUNE = 1
+# End the walk.
+STOP = 2
+
+# Walk orders
+BFS = "bfs"
+DFS = "dfs"
+RPO = "rpo"
+WALK_ORDERS = (BFS, DFS, RPO)
+
 
 class EdgeVisitor:
+    """Base class for visitors used with Walker. visit() is called
+    once for each edge walked; it can return PRUNE or STOP."""
+
     def __init__(self):
         pass
 
@@ -23,13 +44,31 @@ class EdgeVisitor:
 
 class Walker:
     """
-    Traverses edges in the graph in DFS.
+    Traverses the edges of a graph reachable from a node, calling the
+    visitor on each edge once.
+
+    `order` is one of:
+
+    * DFS: depth first; edges go out of the node most recently reached,
+    * BFS: breadth first; edges go out of nodes in the order reached,
+    * RPO: edges are walked by their source node in reverse postorder,
+      so for a control-flow graph, an edge is walked after all of the
+      forward edges into its source. Here a node reached only through
+      a back edge from a later node is not walked out of.
+
+    Edges out of a node are walked in the order they were made. They
+    are taken from DiGraph.out_edge_lists(), which is kept until the
+    graph changes. A node is walked out of at most once, so a
+    traversal takes time linear in the number of edges it walks.
     """
 
-    def __init__(self, graph, visitor):
+    def __init__(self, graph, visitor, order: str = DFS):
+        if order not in WALK_ORDERS:
+            raise ValueError(f"walk order should be one of {WALK_ORDERS}; got {order}")
         self._graph = graph
         self._visitor = visitor
-        self.worklist: list = []
+        self.order = order
+        self.worklist: deque = deque()
 
     @property
     def graph(self):
@@ -49,57 +88,151 @@ class Walker:
         return
 
     def traverse(self, root):
-        self.worklist: list = []
-        self.__run(root)
+        """Walk the edges reachable from `root`, which is a node or an
+        edge. When it is an edge, that edge is visited first."""
+        self.worklist = deque()
+        self.__out_edges = self._graph.out_edge_lists()
+        try:
+            if self.order == RPO:
+                self.__run_rpo(root)
+            else:
+                self.__run(root)
+        finally:
+            self.__out_edges = None
         return
 
-    def __run(self, root=None):
-        visited = set()
-        if root is not None:
-            self.__process(root)
-        while self.worklist:
-            current = self.worklist.pop(0)
-            if current in visited:
+    def __start(self, root):
+        """Visit `root` if it is an edge, and return the node to walk
+        out of first, or None if the walk should not go on."""
+        if isinstance(root, Edge):
+            result = self.visitor.visit(root)
+            if result == STOP or result == PRUNE:
+                return None
+            return root.dest
+        return root
+
+    def __run(self, root):
+        node = self.__start(root)
+        if node is None:
+            return
+        out_edges = self.__out_edges
+        worklist = self.worklist
+        depth_first = self.order == DFS
+        visit = self.visitor.visit
+        expanded = {node}
+
+        def push(node):
+            node_edges = out_edges.get(node, ())
+            if depth_first:
+                # Reversed, so that the first edge is popped first.
+                worklist.extend(reversed(node_edges))
+            else:
+                worklist.extend(node_edges)
+
+        push(node)
+        pop = worklist.pop if depth_first else worklist.popleft
+        while worklist:
+            edge = pop()
+            result = visit(edge)
+            if result == STOP:
+                return
+            if result == PRUNE:
                 continue
-            self.__process(current)
-            visited.add(current)
-
-    def __process(self, current):
-        cur_node = None
-        if isinstance(current, Edge):
-            cur_node = current.dest
-            self.visitor.visit(current)
-        else:
-            cur_node = current
-
-        list_edges = cur_node.successors
-        for edge in list_edges:
-            self.worklist.insert(0, edge)
+            dest = edge.dest
+            if dest not in expanded:
+                expanded.add(dest)
+                push(dest)
+
+    def __run_rpo(self, root):
+        node = self.__start(root)
+        if node is None:
+            return
+        out_edges = self.__out_edges
+
+        def successors(node):
+            return [edge.dest for edge in out_edges.get(node, ())]
+
+        visit = self.visitor.visit
+        reached = {node}
+        self.worklist.extend(reverse_postorder_nodes(node, successors))
+        for node in self.worklist:
+            if node not in reached:
+                continue
+            for edge in out_edges.get(node, ()):
+                result = visit(edge)
+                if result == STOP:
+                    return
+                if result != PRUNE:
+                    reached.add(edge.dest)
 
 
-# Recursive version of the post-order DFS, should only be used
-# when computing dominators on smallish CFGs
+def node_successors(node):
+    """Default successor function used in the depth-first traversals
+    below. It works for basic blocks."""
+    return node.successors
 
 
-# FIXME: This assumes the graph is strongly connected.
-# handle if it is a not.
-def dfs_postorder_nodes(root):
-    import sys
+# The depth-first traversals below use an explicit stack rather than
+# recursion, so they work on graphs of any size and never need to
+# change the interpreter's recursion limit. Successors are visited in
+# the order given by `successors`, so the results are the same as a
+# recursive depth-first traversal would give.
 
-    sys.setrecursionlimit(5000)
-    visited = set()
 
-    def _dfs(node, _visited):
-        _visited.add(node)
-        successors = node.successors
-        for dest_node in successors:
-            if dest_node not in _visited:
-                for child in _dfs(dest_node, _visited):
-                    yield child
-                    pass
-                pass
-            pass
-        yield node
-        return
+def depth_first_orders(
+    root, successors: Callable = node_successors, visited: Optional[set] = None
+) -> Tuple[list, list]:
+    """Return the preorder and the postorder lists of the nodes
+    reachable from `root`, computed in one depth-first traversal.
 
-    return [n for n in _dfs(root, visited)]
+    `successors` is a function which, given a node, returns
+    an iterable of its successor nodes. Nodes in `visited` are
+    not traversed; `visited` is updated with the nodes that are.
+    """
+    if visited is None:
+        visited = set()
+    preorder = []
+    postorder = []
+    if root in visited:
+        return preorder, postorder
+
+    visited.add(root)
+    preorder.append(root)
+    stack = [(root, iter(successors(root)))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if child not in visited:
+                visited.add(child)
+                preorder.append(child)
+                stack.append((child, iter(successors(child))))
+                break
+        else:
+            stack.pop()
+            postorder.append(node)
+    return preorder, postorder
+
+
+def dfs_preorder_nodes(
+    root, successors: Callable = node_successors, visited: Optional[set] = None
+) -> list:
+    """Return the list of nodes reachable from `root` in depth-first preorder."""
+    return depth_first_orders(root, successors, visited)[0]
+
+
+def dfs_postorder_nodes(
+    root, successors: Callable = node_successors, visited: Optional[set] = None
+) -> list:
+    """Return the list of nodes reachable from `root` in depth-first postorder."""
+    return depth_first_orders(root, successors, visited)[1]
+
+
+def reverse_postorder_nodes(
+    root, successors: Callable = node_successors, visited: Optional[set] = None
+) -> list:
+    """Return the list of nodes reachable from `root` in reverse
+    postorder. For a control-flow graph, this is a topological order
+    of the graph with its back edges removed."""
+    postorder = depth_first_orders(root, successors, visited)[1]
+    postorder.reverse()
+    return postorder
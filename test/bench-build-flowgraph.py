@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Time building control-flow graphs, ControlFlowGraph(bb_mgr), from
+synthetic lists of roughly 1,000 to 50,000 basic blocks.
+
+The blocks are made directly with BBMgr.add_bb(), rather than by
+decoding bytecode, so that only graph construction is timed. They
+model a loop around a sequence of "if/else" statements, so there are
+conditional, unconditional and looping jumps.
+
+As timeit does, the garbage collector is turned off while timing,
+so that collections triggered by the many objects created don't
+swamp the measurement.
+
+Usage: bench-build-flowgraph.py [repeat]
+"""
+import gc
+import sys
+from timeit import default_timer as timer
+
+from python_control_flow.bb import BBMgr
+from python_control_flow.cfg import ControlFlowGraph
+from python_control_flow.graph import (
+    BB_ENTRY,
+    BB_EXIT,
+    BB_JUMP_BACKWARD_IF_FALSE,
+    BB_JUMP_FORWARD_IF_FALSE,
+    BB_JUMP_UNCONDITIONAL,
+    BB_NOFOLLOW,
+    BB_RETURN,
+)
+
+
+def make_blocks(statements: int) -> BBMgr:
+    """Return a BBMgr with the basic blocks of a loop around
+    `statements` "if/else" statements. Each statement is four
+    blocks, a test, a "then" part, an "else" part and a join, each
+    a single two-byte instruction.
+    """
+    bb_mgr = BBMgr()
+    loop_end = statements * 8
+    exit_offset = loop_end + 4
+    bb_mgr.add_bb(exit_offset, exit_offset, None, None, {BB_EXIT}, set())
+    for i in range(statements):
+        test = i * 8
+        then_part, else_part, join = test + 2, test + 4, test + 6
+        flags = {BB_JUMP_FORWARD_IF_FALSE}
+        if i == 0:
+            flags.add(BB_ENTRY)
+        bb_mgr.add_bb(test, test, None, then_part, flags, {else_part})
+        bb_mgr.add_bb(
+            then_part,
+            then_part,
+            None,
+            else_part,
+            {BB_JUMP_UNCONDITIONAL, BB_NOFOLLOW},
+            {join},
+        )
+        bb_mgr.add_bb(else_part, else_part, None, join, set(), set())
+        bb_mgr.add_bb(join, join, None, join + 2, set(), set())
+    bb_mgr.add_bb(
+        loop_end, loop_end, None, loop_end + 2, {BB_JUMP_BACKWARD_IF_FALSE}, {0}
+    )
+    bb_mgr.add_bb(
+        loop_end + 2, loop_end + 2, None, None, {BB_NOFOLLOW, BB_RETURN}, set()
+    )
+    return bb_mgr
+
+
+repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+print(f"{'blocks':>8} {'edges':>8} {'msec':>10} {'usec/block':>11}")
+for statements in (250, 1_000, 2_500, 5_000, 12_500):
+    best = None
+    for _ in range(repeat):
+        # Building a graph fills in the blocks, so start from fresh ones.
+        bb_mgr = make_blocks(statements)
+        gc.disable()
+        start = timer()
+        cfg = ControlFlowGraph(bb_mgr)
+        elapsed = timer() - start
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    n = len(cfg.blocks)
+    print(
+        f"{n:>8} {len(cfg.graph.edges):>8} {best * 1e3:>10.1f} {best * 1e6 / n:>11.2f}"
+    )
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Time depth-first traversals on synthetic control-flow graphs of
+increasing size. The time per block should stay roughly the same
+as the number of blocks grows, since the traversals are linear.
+
+Usage: bench-traversals.py [max-blocks]
+"""
+import sys
+from timeit import default_timer as timer
+
+from python_control_flow.traversals import (
+    dfs_postorder_nodes,
+    dfs_preorder_nodes,
+    reverse_postorder_nodes,
+)
+
+
+class FakeBlock:
+    __slots__ = ("number", "successors")
+
+    def __init__(self, number: int):
+        self.number = number
+        self.successors = []
+
+
+def make_cfg(n: int) -> list:
+    """A chain of "if/else" diamonds inside one big loop.
+    Each diamond is four blocks: test, then, else, join."""
+    blocks = [FakeBlock(i) for i in range(n)]
+    for i in range(0, n - 3, 4):
+        test, then_block, else_block, join = blocks[i : i + 4]
+        test.successors = [then_block, else_block]
+        then_block.successors = [join]
+        else_block.successors = [join]
+        if i + 4 < n:
+            join.successors = [blocks[i + 4]]
+    # Loop back to the top.
+    blocks[-1].successors.append(blocks[0])
+    return blocks
+
+
+max_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+n = 1_000
+print(f"{'blocks':>8} {'preorder':>10} {'postorder':>10} {'rpo':>10}  (usec/block)")
+while n <= max_blocks:
+    blocks = make_cfg(n)
+    times = []
+    for fn in (dfs_preorder_nodes, dfs_postorder_nodes, reverse_postorder_nodes):
+        start = timer()
+        result = fn(blocks[0])
+        times.append((timer() - start) * 1e6 / n)
+        assert len(result) == n
+    print(f"{n:>8} {times[0]:>10.3f} {times[1]:>10.3f} {times[2]:>10.3f}")
+    n *= 10